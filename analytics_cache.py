@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, List, Optional
+
+import pandas as pd
+
+from data_analyzer import NFTAnalyzer
+from rollups import get_rollups
+from sketches import get_sketches
+from storage import get_storage, storage_key
+from text_index import get_text_index
+from trends import get_trend_engine
+
+
+class LRUCache:
+    """Small thread-safe mapping that evicts the least recently used entry"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Hashable, value) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CachedAnalyzer:
+    """NFTAnalyzer whose public get_* results are memoized for one dataset version
+
+    Results are returned as copies so callers can rename or modify them freely.
+    Methods answered by storage followers are not memoized: followers follow
+    every append, so these results stay current while the loaded data ages.
+    """
+
+    def __init__(self, analyzer: NFTAnalyzer, fingerprint: Hashable, max_results: int = 64):
+        self.analyzer = analyzer
+        self.fingerprint = fingerprint
+        self._results = LRUCache(max_results)
+        self._uncached = analyzer.follower_methods()
+
+    @property
+    def data(self) -> pd.DataFrame:
+        return self.analyzer.data
+
+    def __getattr__(self, name):
+        method = getattr(self.analyzer, name)
+        if not name.startswith('get_') or not callable(method) or name in self._uncached:
+            return method
+
+        def cached(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            missing = object()
+            result = self._results.get(key, missing)
+            if result is missing:
+                result = method(*args, **kwargs)
+                self._results.put(key, result)
+            return result.copy() if isinstance(result, (pd.DataFrame, pd.Series)) else result
+
+        return cached
+
+
+class AnalyticsCache:
+    """Loaded datasets and their analyzers, keyed by storage fingerprint"""
+
+    def __init__(self, max_datasets: int = 4, max_results: int = 64):
+        self.max_results = max_results
+        self._analyzers = LRUCache(max_datasets)
+        # Последний построенный анализатор для каждого набора колонок и время его построения
+        self._latest = {}
+
+    def get_analyzer(self, columns: Optional[List[str]] = None, storage=None,
+                     approximate: bool = False, min_age: float = 0.0) -> Optional[CachedAnalyzer]:
+        """Return a cached analyzer for the current dataset, reloading only when it changed
+
+        With ``approximate=True`` distinct counts and top gift receivers are
+        estimated from fixed-memory sketches instead of exact scans, and only
+        messages with a project are loaded: the remaining per-message queries
+        (project details, search) work on those rows. With
+        ``min_age`` an analyzer built less than ``min_age`` seconds ago is
+        returned even if the data changed since, so a storage that is written
+        continuously (real-time mode) is not re-read on every page refresh;
+        only the queries that need the loaded messages lag behind then.
+        """
+        storage = storage or get_storage()
+        kind = (storage_key(storage), tuple(columns) if columns else None, approximate)
+        latest = self._latest.get(kind)
+        if min_age and latest is not None and time.monotonic() - latest[0] < min_age:
+            return latest[1]
+
+        fingerprint = (type(storage).__name__, storage.fingerprint(), tuple(columns) if columns else None, approximate)
+        analyzer = self._analyzers.get(fingerprint)
+        if analyzer is not None:
+            return analyzer
+
+        try:
+            data = storage.read(columns=columns, with_project=approximate)
+        except Exception as e:
+            print(f"Ошибка загрузки данных: {str(e)}")
+            return None
+        if data is None or data.empty:
+            return None
+
+        # Временная шкала и популярность проектов считаются по агрегатам хранилища
+        try:
+            rollups = get_rollups(storage)
+        except Exception as e:
+            print(f"Ошибка построения агрегатов: {str(e)}")
+            rollups = None
+        try:
+            trends = get_trend_engine(storage)
+        except Exception as e:
+            print(f"Ошибка построения трендов: {str(e)}")
+            trends = None
+        sketches = None
+        if approximate:
+            try:
+                sketches = get_sketches(storage)
+            except Exception as e:
+                print(f"Ошибка построения скетчей: {str(e)}")
+        # Подарки, сентимент и поиск используют текстовый индекс вместо сканирования текстов
+        try:
+            index = get_text_index(storage)
+        except Exception as e:
+            print(f"Ошибка построения текстового индекса: {str(e)}")
+            index = None
+        analyzer = CachedAnalyzer(NFTAnalyzer(data, rollups=rollups, trends=trends, sketches=sketches, index=index),
+                                  fingerprint, self.max_results)
+        self._analyzers.put(fingerprint, analyzer)
+        self._latest[kind] = (time.monotonic(), analyzer)
+        return analyzer
+
+    def clear(self) -> None:
+        self._analyzers.clear()
+        self._latest.clear()
+
+
+# Общий кэш процесса: модуль не перезагружается между перезапусками скрипта Streamlit
+analytics_cache = AnalyticsCache()
+
+
+def get_analyzer(columns: Optional[List[str]] = None, approximate: bool = False,
+                 min_age: float = 0.0) -> Optional[CachedAnalyzer]:
+    """Cached analyzer for the configured storage"""
+    return analytics_cache.get_analyzer(columns=columns, approximate=approximate, min_age=min_age)
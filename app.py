@@ -1,17 +1,21 @@
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import pandas as pd
-import asyncio
+import time
 
-from telegram_parser import TelegramParser
-from data_analyzer import NFTAnalyzer
-from utils import load_channels, save_data, load_data
+# Telethon, Plotly и модули анализа импортируются там, где они нужны:
+# страница авторизации и боковая панель рисуются без них
+from telegram_client import client_manager, run_sync
 from auth import show_auth_page
 
 st.set_page_config(page_title="NFT Analytics", layout="wide")
 
+# Интервал обновления панели в режиме реального времени
+LIVE_REFRESH_SECONDS = 0.5
+# Метрики, тренды и временная шкала обновляются с каждой пачкой сообщений; сообщения
+# для деталей проектов и поиска перечитываются из хранилища не чаще, чем раз в столько секунд
+LIVE_ANALYZER_RELOAD_SECONDS = 10
+
 # Initialize session state
 if 'is_authenticated' not in st.session_state:
     st.session_state.is_authenticated = False
@@ -20,16 +24,18 @@ if 'data_updated' not in st.session_state:
 if 'found_channels' not in st.session_state:
     st.session_state.found_channels = None
 
+@st.cache_resource
+def get_parser():
+    """Один парсер на процесс: работает через общий клиент Telegram"""
+    from telegram_parser import TelegramParser
+    return TelegramParser()
+
 def search_channels():
     with st.spinner("Поиск NFT каналов и групп..."):
-        parser = TelegramParser()
-        # Create new event loop for async operations
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        parser = get_parser()
         
         try:
-            channels = loop.run_until_complete(parser.search_nft_groups())
-            loop.close()
+            channels = run_sync(parser.search_nft_groups())
             
             if channels and len(channels) > 0:
                 st.session_state.found_channels = channels
@@ -46,7 +52,6 @@ def search_channels():
         except Exception as e:
             st.error(f"Ошибка при поиске каналов: {str(e)}")
             st.session_state.found_channels = []
-            loop.close()
             return []
 
 def main():
@@ -71,21 +76,20 @@ def main():
     with col_search1:
         if st.button("Найти NFT каналы", use_container_width=True):
             with st.spinner("Поиск NFT каналов и групп..."):
-                parser = TelegramParser()
-                # Create new event loop for async operations
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
+                parser = get_parser()
                 
                 try:
                     # Используем фильтр по имени если указан
-                    channels = loop.run_until_complete(parser.search_nft_groups(
+                    channels = run_sync(parser.search_nft_groups(
                         name_filter=channel_name_filter if channel_name_filter else None
                     ))
-                    loop.close()
                     
                     if channels and len(channels) > 0:
                         st.session_state.found_channels = channels
+                        st.session_state.channels_source = 'search'
                         st.success(f"Найдено {len(channels)} каналов и групп")
+                        if parser.join_queue.pending:
+                            st.info(f"Подписка на найденные каналы выполняется в фоне (в очереди: {parser.join_queue.pending})")
                     else:
                         st.warning("Не найдено каналов и групп. Попробуйте другие ключевые слова или проверьте подключение.")
                         # Если нет результатов, проверим хотя бы пустой список
@@ -96,26 +100,20 @@ def main():
                 except Exception as e:
                     st.error(f"Ошибка при поиске каналов: {str(e)}")
                     st.session_state.found_channels = []
-                    loop.close()
     
     with col_search2:
         if st.button("Мои подписки", use_container_width=True):
             with st.spinner("Получение списка ваших каналов..."):
-                parser = TelegramParser()
-                # Create new event loop for async operations
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
+                parser = get_parser()
                 
                 try:
-                    channels = loop.run_until_complete(parser.get_user_channels())
-                    loop.close()
+                    channels = run_sync(parser.get_user_channels(
+                        name_filter=channel_name_filter if channel_name_filter else None
+                    ))
                     
                     if channels and len(channels) > 0:
-                        # Применяем фильтр по имени, если указан
-                        if channel_name_filter:
-                            channels = [ch for ch in channels if channel_name_filter.lower() in ch['title'].lower()]
-                            
                         st.session_state.found_channels = channels
+                        st.session_state.channels_source = 'subscriptions'
                         st.success(f"Найдено {len(channels)} ваших каналов и групп")
                     else:
                         st.warning("У вас нет подписок на каналы и группы")
@@ -123,31 +121,45 @@ def main():
                 except Exception as e:
                     st.error(f"Ошибка при получении списка каналов: {str(e)}")
                     st.session_state.found_channels = []
-                    loop.close()
                     
     # Кнопка для выхода из всех каналов
     if st.sidebar.button("Отписаться от всех каналов"):
         with st.spinner("Выход из каналов Telegram..."):
-            parser = TelegramParser()
-            # Create new event loop for async operations
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+            from telegram_parser import LeaveProgress
+            parser = get_parser()
             
             try:
-                result = loop.run_until_complete(parser.leave_all_chats())
-                loop.close()
+                # Выход идёт параллельно с адаптивным ограничением скорости
+                progress = LeaveProgress()
+                progress_bar = st.progress(0.0)
+                future = client_manager.submit(parser.leave_all_chats(progress=progress))
+                while not future.done():
+                    progress_bar.progress(
+                        progress.fraction,
+                        text=f"Покинуто: {progress.left}/{progress.total}, с ошибками: {progress.failed}"
+                    )
+                    time.sleep(0.2)
+                progress_bar.empty()
+                result = future.result()
                 
                 if result:
                     # Также очищаем список найденных каналов
                     if 'found_channels' in st.session_state:
                         st.session_state.found_channels = []
+                    st.session_state.channels_source = None
                     st.success("Успешно выполнен выход из всех каналов Telegram")
                     st.rerun()
+                elif progress.failed:
+                    st.warning(f"Покинуто каналов: {progress.left} из {progress.total}, "
+                               f"не удалось выйти из {progress.failed}. Нажмите кнопку ещё раз, чтобы повторить.")
                 else:
                     st.error("Не удалось выйти из каналов. Проверьте подключение к Telegram API.")
             except Exception as e:
                 st.error(f"Ошибка при выходе из каналов: {str(e)}")
-                loop.close()
+
+    # Список подписок фильтруется по локальному индексу без запросов к Telegram
+    if st.session_state.get('channels_source') == 'subscriptions':
+        st.session_state.found_channels = get_parser().subscriptions.filter(channel_name_filter or None)
 
     # Display found channels if available
     channels = []
@@ -202,19 +214,80 @@ def main():
     with col2:
         end_date = st.date_input("Дата окончания", datetime.now())
 
+    # Загружать только новые сообщения с момента прошлого обновления
+    incremental = st.sidebar.checkbox("Только новые сообщения", value=True)
+
+    # Режим реального времени: новые сообщения приходят через обработчики обновлений Telegram
+    live = st.sidebar.checkbox(
+        "Режим реального времени",
+        key='live_mode',
+        help="Новые и изменённые сообщения выбранных каналов сохраняются сразу, без повторной загрузки истории"
+    )
+    # Парсер (и Telethon) создаётся, только если режим включали
+    live_ingestor = get_parser().live if live or st.session_state.get('live_started') else None
+    # Сравниваем с запрошенным списком: ненайденные каналы не запрашиваются заново на каждой перерисовке
+    if live and (not live_ingestor.running or live_ingestor.requested != channels):
+        if not channels:
+            st.sidebar.error("Необходимо выбрать хотя бы один канал для анализа!")
+        else:
+            from storage import get_storage
+            run_sync(live_ingestor.start(channels, storage=get_storage()))
+            st.session_state.live_started = True
+    elif not live and live_ingestor is not None:
+        run_sync(live_ingestor.stop())
+        st.session_state.live_started = False
+        if live_ingestor.dropped:
+            st.sidebar.warning(f"Режим реального времени остановлен, не сохранено сообщений: {live_ingestor.dropped}")
+    live_running = live_ingestor is not None and live_ingestor.running
+    if live_running:
+        st.sidebar.caption(
+            f"Получено в реальном времени: {live_ingestor.received}, сохранено: {live_ingestor.written}"
+            + (f", последнее: {live_ingestor.last_written_at:%H:%M:%S}" if live_ingestor.last_written_at else "")
+        )
+        if live_ingestor.unresolved:
+            st.sidebar.warning("Не удалось найти каналы: " + ", ".join(live_ingestor.unresolved))
+        if live_ingestor.last_error:
+            st.sidebar.error(
+                f"Ошибка записи сообщений: {live_ingestor.last_error}. "
+                f"Ожидают повторной записи: {live_ingestor.pending}"
+            )
+        if live_ingestor.dropped:
+            st.sidebar.warning(f"Не сохранено сообщений (очередь переполнена или режим остановлен): {live_ingestor.dropped}")
+
     # Update data button
     if st.sidebar.button("Обновить данные"):
         if not channels:
             st.sidebar.error("Необходимо выбрать хотя бы один канал для анализа!")
         else:
             with st.spinner(f"Получение данных из {len(channels)} Telegram каналов..."):
-                parser = TelegramParser()
-                messages = parser.fetch_messages(channels, start_date, end_date)
+                from telegram_parser import FetchProgress
+                from utils import load_fetch_state
+                parser = get_parser()
+
+                # Сообщения пишутся в хранилище пачками по мере загрузки; полная перезагрузка
+                # заменяет сохранённые данные только после успешной загрузки
+                progress = FetchProgress(len(channels))
+                progress_bar = st.progress(0.0)
+                future = client_manager.submit(parser.update_storage(
+                    channels, start_date, end_date,
+                    incremental=incremental, progress=progress
+                ))
+                while not future.done():
+                    progress_bar.progress(
+                        progress.fraction,
+                        text=f"Каналов обработано: {progress.channels_done}/{progress.total_channels}, "
+                             f"сообщений сохранено: {progress.written}"
+                    )
+                    time.sleep(0.2)
+                progress_bar.empty()
+                written = future.result()
 
-                if not messages.empty:
-                    save_data(messages)
+                if written:
+                    st.session_state.data_updated = datetime.now()
+                    st.success(f"Данные успешно обновлены! Получено {written} сообщений из {len(channels)} каналов.")
+                elif incremental and load_fetch_state():
                     st.session_state.data_updated = datetime.now()
-                    st.success(f"Данные успешно обновлены! Получено {len(messages)} сообщений из {messages['channel'].nunique()} каналов.")
+                    st.info("Новых сообщений нет, данные актуальны.")
                 else:
                     st.error("Данные не получены. Это может быть вызвано следующими причинами:\n" +
                             "1. Выбранные каналы не содержат NFT-сообщений\n" +
@@ -225,10 +298,24 @@ def main():
                     if st.sidebar.button("Найти больше NFT-каналов"):
                         search_channels()
 
-    # Load and analyze data
-    data = load_data()
-    if data is not None and not data.empty:
-        analyzer = NFTAnalyzer(data)
+    # Load and analyze data (результаты кэшируются, пока данные не изменились)
+    approximate = st.sidebar.checkbox(
+        "Приближённый подсчёт",
+        value=False,
+        help="Оценки уникальных проектов, каналов и получателей подарков по скетчам с фиксированной памятью - для очень больших объёмов данных. "
+             "Загружаются только сообщения с проектами, поиск идёт по ним"
+    )
+    from analytics_cache import get_analyzer
+    analyzer = get_analyzer(
+        columns=['channel', 'channel_id', 'message_id', 'date', 'text', 'project_name', 'price'],
+        approximate=approximate,
+        # В режиме реального времени хранилище меняется с каждой пачкой сообщений
+        min_age=LIVE_ANALYZER_RELOAD_SECONDS if live_running else 0.0
+    )
+    if analyzer is not None:
+        # Plotly загружается только при отрисовке графиков
+        import plotly.express as px
+        import plotly.graph_objects as go
 
         # Display metrics
         col1, col2, col3 = st.columns(3)
@@ -260,6 +347,22 @@ def main():
             3. **Тренды рынка**: График отражает текущие тенденции на рынке NFT
             """)
 
+        # Rising projects
+        st.subheader("Набирающие популярность проекты")
+        trend_metric = st.radio(
+            "Сортировать по",
+            ["Скорость упоминаний", "Ускорение"],
+            horizontal=True
+        )
+        rising = analyzer.get_rising_projects(by='velocity' if trend_metric == "Скорость упоминаний" else 'acceleration')
+        rising = rising.rename(columns={
+            'project': 'Проект',
+            'mentions': 'Упоминания (6 ч)',
+            'velocity': 'Упоминаний в час',
+            'acceleration': 'Ускорение'
+        })
+        st.dataframe(rising.round(2), use_container_width=True, hide_index=True)
+
         # Activity Timeline
         st.subheader("Временная шкала активности проектов")
         timeline = analyzer.get_activity_timeline()
@@ -299,6 +402,8 @@ def main():
             })
             
         st.dataframe(project_details, use_container_width=True)
+        if live_running:
+            st.caption(f"В режиме реального времени детали проектов и поиск обновляются раз в {LIVE_ANALYZER_RELOAD_SECONDS} с")
         
         st.info("""
         **Как интерпретировать эту таблицу?**
@@ -310,6 +415,25 @@ def main():
         6. **Настроение**: Общее эмоциональное отношение к проекту в сообществе
         """)
 
+        # Поиск по текстам сообщений (по текстовому индексу хранилища)
+        st.subheader("Поиск по сообщениям")
+        query = st.text_input(
+            "Запрос",
+            key='message_query',
+            help='Слова ищутся вместе; "фраза в кавычках" - точная фраза, слово* - по началу слова'
+        )
+        if query.strip():
+            found = analyzer.search_messages(query)
+            if found.empty:
+                st.info("Сообщения не найдены")
+            else:
+                st.dataframe(found.rename(columns={
+                    'date': 'Дата',
+                    'channel': 'Канал',
+                    'text': 'Сообщение',
+                    'project_name': 'Проект'
+                }), use_container_width=True, hide_index=True)
+
     else:
         st.info("Данные отсутствуют. Пожалуйста, обновите данные с помощью кнопки в боковой панели.")
 
@@ -323,5 +447,11 @@ def main():
         st.session_state.is_authenticated = False
         st.rerun()
 
+    # В режиме реального времени страница перерисовывается, пока идёт приём сообщений;
+    # анализ пересчитывается только при изменении хранилища
+    if live_running:
+        time.sleep(LIVE_REFRESH_SECONDS)
+        st.rerun()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
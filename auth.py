@@ -1,38 +1,25 @@
 import streamlit as st
-from telethon import TelegramClient, functions, types, errors
 import os
 import asyncio
-from typing import Optional, Tuple
+from typing import TYPE_CHECKING, Optional, Tuple
+
+from telegram_client import client_manager, run_sync
+
+if TYPE_CHECKING:
+    from telethon import TelegramClient
 
 class TelegramAuth:
     def __init__(self):
-        # API ключи встроены напрямую в код
-        # Замените эти значения на свои реальные ключи
-        self.api_id = "27578030"  # Предоставляю свой API ID и надеюсь на то что вы не плохие люди <3
-        self.api_hash = "41174379fa369fe72db4d97fcbe3d1c6"  # Предоставляю свой API Hash и надеюсь на то что вы не плохие люди <3
+        # API ключи задаются один раз для всего процесса в telegram_client.py
         self.client = None
+        self.phone_code_hash = None
 
-    async def _connect(self) -> TelegramClient:
-        """Initialize Telegram client connection"""
+    async def _connect(self) -> 'TelegramClient':
+        """Get the shared Telegram client connection"""
         if not self.client:
-            # Проверка наличия API ключей
-            if not self.api_id or not self.api_hash:
-                print("Ошибка: API ключи отсутствуют!")
-                print(f"API ID присутствует: {'Да' if self.api_id else 'Нет'}")
-                print(f"API Hash присутствует: {'Да' if self.api_hash else 'Нет'}")
-                return None
-            
             try:
-                # Инициализация клиента с параметрами для user-режима
-                self.client = TelegramClient(
-                    'nft_analyzer_session',
-                    api_id=int(self.api_id),  # Преобразуем в int
-                    api_hash=self.api_hash,
-                    device_model="NFT Analyzer",
-                    system_version="1.0",
-                    app_version="1.0",
-                    lang_code="ru"
-                )
+                # Тот же клиент, что использует парсер: одна сессия и одно соединение на процесс
+                self.client = await client_manager.get_client()
             except Exception as e:
                 print(f"Ошибка инициализации клиента: {str(e)}")
                 return None
@@ -44,6 +31,9 @@ class TelegramAuth:
 
     async def send_code(self, phone: str) -> Tuple[bool, str]:
         """Send authentication code to phone number"""
+        # Telethon загружается только при входе, страница авторизации рисуется без него
+        from telethon import errors, functions, types
+
         try:
             client = await self._connect()
             if not client:
@@ -62,8 +52,8 @@ class TelegramAuth:
             try:
                 result = await client(functions.auth.SendCodeRequest(
                     phone_number=phone,
-                    api_id=int(self.api_id),
-                    api_hash=self.api_hash,
+                    api_id=int(client_manager.api_id),
+                    api_hash=client_manager.api_hash,
                     settings=types.CodeSettings(
                         allow_flashcall=False,
                         current_number=True,
@@ -71,10 +61,8 @@ class TelegramAuth:
                     )
                 ))
                 # Сохраняем phone_code_hash для последующей авторизации
-                if not hasattr(st.session_state, 'phone_code_hash'):
-                    st.session_state.phone_code_hash = result.phone_code_hash
-                else:
-                    st.session_state.phone_code_hash = result.phone_code_hash
+                # (корутина выполняется в фоновом потоке, session_state заполняет вызывающий код)
+                self.phone_code_hash = result.phone_code_hash
                 
                 print(f"Получен phone_code_hash: {result.phone_code_hash}")
                 return True, "Код подтверждения отправлен"
@@ -90,13 +78,15 @@ class TelegramAuth:
             print(f"Общая ошибка в методе send_code: {str(e)}")
             return False, f"Ошибка отправки кода: {str(e)}"
 
-    async def sign_in(self, phone: str, code: str, password: Optional[str] = None) -> Tuple[bool, str]:
+    async def sign_in(self, phone: str, code: str, password: Optional[str] = None,
+                      phone_code_hash: Optional[str] = None) -> Tuple[bool, str]:
         """Sign in with code and optional 2FA password"""
+        from telethon import errors
+
         try:
             client = await self._connect()
             try:
-                # Проверяем наличие phone_code_hash в сессии
-                phone_code_hash = getattr(st.session_state, 'phone_code_hash', None)
+                # Проверяем наличие phone_code_hash, полученного при отправке кода
                 if not phone_code_hash:
                     return False, "Отсутствует код подтверждения (phone_code_hash). Пожалуйста, запросите код заново."
                 
@@ -146,12 +136,10 @@ def show_auth_page():
             if phone:
                 st.session_state.phone = phone
                 # Send code
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                success, message = loop.run_until_complete(auth.send_code(phone))
-                loop.close()
+                success, message = run_sync(auth.send_code(phone))
 
                 if success:
+                    st.session_state.phone_code_hash = auth.phone_code_hash
                     st.session_state.auth_stage = 'code'
                     st.session_state.auth_message = message
                     st.rerun()
@@ -175,12 +163,10 @@ def show_auth_page():
             if st.button("Подтвердить"):
                 if code:
                     # Verify code
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    success, message = loop.run_until_complete(
-                        auth.sign_in(st.session_state.phone, code)
-                    )
-                    loop.close()
+                    success, message = run_sync(auth.sign_in(
+                        st.session_state.phone, code,
+                        phone_code_hash=st.session_state.get('phone_code_hash')
+                    ))
 
                     if success:
                         st.session_state.is_authenticated = True
@@ -202,12 +188,10 @@ def show_auth_page():
         if st.button("Подтвердить"):
             if password:
                 # Verify 2FA
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                success, message = loop.run_until_complete(
-                    auth.sign_in(st.session_state.phone, None, password)
-                )
-                loop.close()
+                success, message = run_sync(auth.sign_in(
+                    st.session_state.phone, None, password,
+                    phone_code_hash=st.session_state.get('phone_code_hash')
+                ))
 
                 if success:
                     st.session_state.is_authenticated = True
@@ -0,0 +1,141 @@
+"""Import-time benchmark of the app entry points.
+
+Usage: python benchmarks/bench_imports.py [--repeat 5] [--top 10]
+                                          [--baseline benchmarks/imports_baseline.json]
+                                          [--save-baseline] [--tolerance 1.3]
+
+Every target is imported in a fresh interpreter under ``python -X importtime``
+``--repeat`` times. The median wall time of the interpreter and the total
+import time are reported, together with the modules with the largest
+cumulative import time and whether the heavy dependencies (Telethon, Plotly,
+Streamlit) were loaded at all. Importing ``app`` runs the Streamlit script
+module level in bare mode, which is the cold start of a new session.
+
+Results are compared with the baseline file like benchmarks/run_benchmarks.py:
+a target slower than ``tolerance`` times the baseline makes the exit code 1.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'imports_baseline.json')
+TARGETS = ['main', 'app', 'collector', 'telegram_parser', 'analytics_cache']
+HEAVY_MODULES = ['telethon', 'plotly', 'streamlit', 'pyarrow']
+# Замедление меньше этого порога (в секундах) считается шумом
+NOISE_SECONDS = 0.02
+
+
+def import_once(target: str) -> Tuple[float, float, Dict[str, int], List[str]]:
+    """One cold import of ``target``
+
+    Returns the interpreter wall time, the total import time, cumulative
+    import time (us) of the modules imported directly by top-level modules,
+    and the names of all imported modules.
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {target}"], cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import {target} завершился с ошибкой:\n{result.stderr[-2000:]}")
+
+    total_us = 0
+    direct = {}
+    modules = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package (вложенность - отступ по 2 пробела)
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name[1:]
+        module = name.strip()
+        level = (len(name) - len(module)) // 2
+        modules.append(module)
+        if level == 0:
+            total_us += int(cumulative_us)
+        elif level == 1:
+            direct[module] = int(cumulative_us)
+    return seconds, total_us / 1e6, direct, modules
+
+
+def measure(target: str, repeat: int) -> Dict:
+    runs = sorted((import_once(target) for _ in range(repeat)), key=lambda run: run[0])
+    seconds, import_seconds, direct, modules = runs[len(runs) // 2]
+    loaded = [name for name in HEAVY_MODULES if name in {module.split('.')[0] for module in modules}]
+    return {
+        'seconds': round(seconds, 4),
+        'import_seconds': round(import_seconds, 4),
+        'heavy': loaded,
+        'top': sorted(direct.items(), key=lambda item: -item[1]),
+    }
+
+
+def compare(measured: Dict, expected: Dict, tolerance: float) -> List[str]:
+    problems = []
+    seconds, base_seconds = measured['seconds'], expected.get('seconds')
+    if base_seconds and seconds > base_seconds * tolerance and seconds - base_seconds > NOISE_SECONDS:
+        problems.append(f'время x{seconds / base_seconds:.2f}')
+    added = sorted(set(measured['heavy']) - set(expected.get('heavy', measured['heavy'])))
+    if added:
+        problems.append('загружаются ' + ', '.join(added))
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('targets', nargs='*', default=TARGETS, help='modules to import')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='slowest modules to list per target')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=1.3, help='allowed slowdown factor')
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.baseline, 'r') as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        stored = {}
+    baseline = {} if args.save_baseline else stored.get('results', {})
+
+    results = {}
+    regressions = 0
+    for target in args.targets:
+        measured = measure(target, args.repeat)
+        expected = baseline.get(target, {})
+        problems = compare(measured, expected, args.tolerance)
+        regressions += bool(problems)
+        status = '; '.join(problems) or ('ok' if expected else 'нет базы')
+        base = f"{expected['seconds']:.3f}" if expected.get('seconds') else '-'
+        print(f"{target:<18} {measured['seconds']:>7.3f} s  (импорт {measured['import_seconds']:.3f} s, "
+              f"база {base})  тяжёлые: {', '.join(measured['heavy']) or 'нет'}  {status}")
+        for module, us in measured['top'][:args.top]:
+            print(f"    {us / 1000:>9.1f} ms  {module}")
+        results[target] = {key: measured[key] for key in ('seconds', 'import_seconds', 'heavy')}
+
+    if args.save_baseline:
+        merged = stored.get('results', {})
+        merged.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'environment': {'python': platform.python_version(), 'machine': platform.platform()},
+                'results': merged,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"Базовые результаты сохранены в {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"Обнаружено регрессий: {regressions}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Benchmark NFTAnalyzer.get_project_details against the per-project loop.
+
+Usage: python benchmarks/bench_project_details.py [scale ...]
+
+nft_data.csv is replicated ``scale`` times; every copy gets its own project
+name suffix, so the number of distinct projects grows with the scale.
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_analyzer import NFTAnalyzer  # noqa: E402
+from sentiment import NEGATIVE_WORDS, POSITIVE_WORDS  # noqa: E402
+
+
+def legacy_project_details(analyzer):
+    """The original implementation: one boolean mask and keyword scan per project"""
+    data = analyzer.data
+    projects = []
+    for project in data['project_name'].dropna().unique():
+        project_data = data[data['project_name'] == project]
+
+        channels = project_data['channel'].nunique() if 'channel' in data.columns else 0
+        mentions = len(project_data)
+        first_seen = project_data['date'].min() if 'date' in data.columns else None
+
+        avg_price = None
+        if 'price' in data.columns:
+            prices = project_data['price'].dropna()
+            if len(prices) > 0:
+                avg_price = prices.mean()
+
+        all_text = ' '.join(project_data['text'].dropna()).lower()
+        positive_count = sum(1 for word in POSITIVE_WORDS if word in all_text)
+        negative_count = sum(1 for word in NEGATIVE_WORDS if word in all_text)
+        if positive_count > negative_count * 1.5:
+            sentiment = "Позитивное"
+        elif negative_count > positive_count * 1.2:
+            sentiment = "Негативное"
+        else:
+            sentiment = "Нейтральное"
+
+        projects.append({
+            'project': project,
+            'mentions': mentions,
+            'channels': channels,
+            'first_seen': first_seen,
+            'avg_price': avg_price,
+            'sentiment': sentiment
+        })
+
+    return pd.DataFrame(projects).sort_values('mentions', ascending=False)
+
+
+def scaled_dataset(scale):
+    data = pd.read_csv(os.path.join(ROOT, 'nft_data.csv'))
+    data['date'] = pd.to_datetime(data['date'], utc=True)
+    copies = []
+    for i in range(scale):
+        copy = data.copy()
+        copy['project_name'] = copy['project_name'] + f" {i}"
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main(scales):
+    print(f"{'rows':>10} {'projects':>10} {'legacy, s':>12} {'groupby, s':>12} {'speedup':>9}")
+    for scale in scales:
+        analyzer = NFTAnalyzer(scaled_dataset(scale))
+        expected, legacy_time = timed(lambda: legacy_project_details(analyzer))
+        actual, new_time = timed(analyzer.get_project_details)
+        pd.testing.assert_frame_equal(
+            actual.reset_index(drop=True), expected.reset_index(drop=True)
+        )
+        print(f"{len(analyzer.data):>10} {len(actual):>10} {legacy_time:>12.3f} "
+              f"{new_time:>12.3f} {legacy_time / new_time:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1, 10, 50])
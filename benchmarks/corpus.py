@@ -0,0 +1,166 @@
+"""Synthetic Telegram message corpus modelled on nft_data.csv.
+
+Usage: python benchmarks/corpus.py ROWS [output.csv]
+
+Messages mix English, Russian and Hinglish chatter with caps project names,
+ETH/SOL/$ prices, ISO dates, @mentions and giveaway/winner phrasing. Channel,
+project and user popularity follow Zipf-like distributions, message IDs grow
+per channel and about 60% of messages have no view/forward counters, like
+group chats in the real export. Generation is vectorised and chunked, so 10M
+rows are produced without building them row by row.
+"""
+import os
+import string
+import sys
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+CHANNEL_WORDS = ['Crypto', 'NFT', 'Blockchain', 'Drops', 'Alpha', 'Moon', 'Gems', 'Calendar',
+                 'Малайзия', 'Крипта', 'Лутаем', 'Signals', 'Official', 'Squad', 'Club']
+PROJECT_WORDS = ['APE', 'MOON', 'PIXEL', 'PUNKS', 'DOGE', 'META', 'LAND', 'BORED', 'CATS', 'TET',
+                 'SOL', 'ORBIT', 'NOVA', 'ZEN', 'KAI', 'RUNE', 'VOX', 'LUNA', 'FROG', 'DRAGON']
+
+# (шаблон, есть ли в сообщении проект, есть ли цена, относительная частота)
+TEMPLATES = [
+    ("{project} NFT mint is live! Price {price} ETH 🚀", True, True, 8),
+    ("🔥 {project} — новый дроп, цена {price} SOL. Старт {day}", True, True, 6),
+    ("Поздравляем @{user} с выигрышем {project} NFT! 🎉", True, False, 3),
+    ("giveaway winner: @{user} получил NFT {project}", True, False, 2),
+    ("Airdrop для подписчиков {project}, забирайте бесплатно 🎁", True, False, 3),
+    ("Free NFT giveaway 🎁 follow @{user} and retweet, {project} whitelist", True, False, 2),
+    ("Победитель розыгрыша: @{user}! Приз — {project} NFT", True, False, 2),
+    ("**{number}👉🏻 Big Lagao (Period:- 3 Minute)\n\n◻️⭐⭐ 10 Rs Lagao ⭐**", False, False, 10),
+    ("**__8 Level kaa Fund Maintain Karke Rakhna Tabhi Profit Kmaye Ge ✌🏻__**", False, False, 6),
+    ("Скам или нет? {project} упал на {number}%, похоже на dump", True, False, 3),
+    ("Another {number} tets in the bag, to the moon 🚀", False, False, 5),
+    ("floor is {price} ETH now, bear market is brutal 📉", False, True, 4),
+    ("gm gm, who is minting {project} today? only {price}$ per piece", True, True, 4),
+    ("Common issue 😅", False, False, 8),
+    ("When there is blood in the street...", False, False, 6),
+    ("Отличный проект, сильная команда и хороший потенциал роста", False, False, 4),
+    ("@{user} check DM please", False, False, 4),
+]
+COLUMNS = ['channel', 'channel_id', 'message_id', 'date', 'text', 'project_name', 'price', 'views', 'forwards']
+
+
+def _zipf_choice(rng: np.random.Generator, size: int, n: int, exponent: float = 1.1) -> np.ndarray:
+    """Indices 0..n-1 where lower indices are much more frequent"""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return rng.choice(n, size=size, p=weights / weights.sum())
+
+
+def _names(rng: np.random.Generator, count: int, words, separator: str, parts: int) -> np.ndarray:
+    names = set()
+    while len(names) < count:
+        names.add(separator.join(rng.choice(words, size=rng.integers(1, parts + 1), replace=False)))
+    return np.array(sorted(names), dtype=object)
+
+
+def _fill(template: str, values: dict) -> pd.Series:
+    """Vectorised str.format: split the template on its fields and concatenate columns"""
+    result = None
+    for literal, field, _, _ in string.Formatter().parse(template):
+        pieces = [pd.Series(literal, index=next(iter(values.values())).index)] if literal else []
+        if field:
+            pieces.append(values[field])
+        for piece in pieces:
+            result = piece if result is None else result + piece
+    return result
+
+
+class Corpus:
+    """Deterministic synthetic corpus; identical ``seed`` gives identical messages"""
+
+    def __init__(self, seed: int = 0, channels: int = 200, projects: int = 2000, users: int = 50000,
+                 start: str = '2025-01-01', days: int = 90):
+        rng = np.random.default_rng(seed)
+        self.seed = seed
+        self.start = pd.Timestamp(start, tz='UTC')
+        self.days = days
+        titles = _names(rng, channels, CHANNEL_WORDS, ' ', 3)
+        self.channel_titles = titles
+        self.channel_ids = np.array([f"{title.lower().replace(' ', '_')}_{i}" for i, title in enumerate(titles)],
+                                    dtype=object)
+        self.projects = _names(rng, projects, PROJECT_WORDS, ' ', 3)
+        rng.shuffle(self.projects)
+        self.users = np.array([f"user_{i}" for i in range(users)], dtype=object)
+
+        weights = np.array([template[3] for template in TEMPLATES], dtype=float)
+        self._template_weights = weights / weights.sum()
+
+    def chunks(self, rows: int, chunk_size: int = 500_000) -> Iterator[pd.DataFrame]:
+        """Yield the corpus in date order as DataFrames of at most ``chunk_size`` rows"""
+        rng = np.random.default_rng(self.seed + 1)
+        span = self.days * 86400
+        next_ids = np.zeros(len(self.channel_ids), dtype=np.int64)
+        for offset in range(0, rows, chunk_size):
+            size = min(chunk_size, rows - offset)
+            # Время растёт от чанка к чанку, внутри чанка сообщения отсортированы
+            seconds = np.sort(rng.uniform(offset / rows, (offset + size) / rows, size)) * span
+            channel = _zipf_choice(rng, size, len(self.channel_ids))
+            template = rng.choice(len(TEMPLATES), size=size, p=self._template_weights)
+
+            # Номера сообщений растут внутри каждого канала
+            order = pd.Series(channel).groupby(channel).cumcount().to_numpy()
+            counts = np.bincount(channel, minlength=len(self.channel_ids))
+            message_id = next_ids[channel] + order + 1
+            next_ids += counts
+
+            index = pd.RangeIndex(size)
+            project = pd.Series(self.projects[_zipf_choice(rng, size, len(self.projects), 1.05)], index=index)
+            price = np.round(rng.lognormal(0, 1.2, size), 2)
+            dates = self.start + pd.to_timedelta(seconds.astype(np.int64), unit='s')
+            values = {
+                'project': project,
+                'price': pd.Series(price.astype(str), index=index),
+                'user': pd.Series(self.users[_zipf_choice(rng, size, len(self.users), 1.2)], index=index),
+                'number': pd.Series(rng.integers(10, 999, size).astype(str), index=index),
+                'day': pd.Series(np.asarray(dates.strftime('%Y-%m-%d'), dtype=object), index=index),
+            }
+
+            text = pd.Series(None, index=index, dtype=object)
+            has_project = np.zeros(size, dtype=bool)
+            has_price = np.zeros(size, dtype=bool)
+            for number, (pattern, with_project, with_price, _) in enumerate(TEMPLATES):
+                rows_mask = template == number
+                if not rows_mask.any():
+                    continue
+                subset = {name: column[rows_mask] for name, column in values.items()}
+                text[rows_mask] = _fill(pattern, subset)
+                has_project[rows_mask] = with_project
+                has_price[rows_mask] = with_price
+
+            broadcast = rng.random(size) < 0.4
+            views = np.where(broadcast, rng.integers(80, 15000, size), -1)
+            forwards = np.where(broadcast, rng.integers(0, 50, size), -1)
+            yield pd.DataFrame({
+                'channel': self.channel_titles[channel],
+                'channel_id': self.channel_ids[channel],
+                'message_id': message_id,
+                'date': dates,
+                'text': text,
+                'project_name': project.where(has_project, None).to_numpy(),
+                'price': np.where(has_price, price, np.nan),
+                'views': pd.Series(views).mask(views < 0).astype('Int64'),
+                'forwards': pd.Series(forwards).mask(forwards < 0).astype('Int64'),
+            }, columns=COLUMNS)
+
+    def frame(self, rows: int) -> pd.DataFrame:
+        return pd.concat(self.chunks(rows), ignore_index=True)
+
+
+def generate_messages(rows: int, seed: int = 0, **kwargs) -> pd.DataFrame:
+    """``rows`` synthetic messages with the columns of the message storage"""
+    return Corpus(seed, **kwargs).frame(rows)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    corpus = generate_messages(int(float(sys.argv[1])))
+    output = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus.csv')
+    corpus.to_csv(output, index=False)
+    print(f"{len(corpus)} сообщений сохранено в {output}")
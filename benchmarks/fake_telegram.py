@@ -0,0 +1,303 @@
+"""In-process stand-in for the Telethon client, serving a synthetic corpus.
+
+Covers the client surface used by ``TelegramParser`` and ``SubscriptionStore``:
+
+* ``get_entity``/``get_input_entity`` resolve channel usernames (the corpus
+  ``channel_id``) or IDs;
+* ``iter_messages`` pages through a channel's messages with Telethon's
+  ``offset_date``/``reverse``/``min_id``/``limit`` semantics;
+* ``iter_dialogs`` lists the channels the account has joined;
+* calling the client with ``contacts.SearchRequest``,
+  ``channels.JoinChannelRequest``/``LeaveChannelRequest``,
+  ``messages.DeleteChatUserRequest``, ``folders.EditPeerFoldersRequest``,
+  ``account.UpdateNotifySettingsRequest`` and ``updates.GetStateRequest``/
+  ``GetDifferenceRequest`` behaves like the server for these channels.
+
+Every request waits ``latency`` seconds and may fail with FloodWaitError,
+either at random (``flood_wait_probability``) or when a request kind exceeds
+its per-second limit in ``rate_limits``, so concurrency, throughput and
+backoff of the parser can be measured reproducibly without a network.
+"""
+import asyncio
+import math
+import random
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set, Union
+
+import numpy as np
+import pandas as pd
+from telethon import errors, functions, types, utils
+
+# Telethon запрашивает историю страницами по 100 сообщений, диалоги тоже
+PAGE_SIZE = 100
+FIRST_CHANNEL_ID = 1_000_000
+
+
+class FakeMessage:
+    __slots__ = ('id', 'date', 'text', 'views', 'forwards')
+
+    def __init__(self, id: int, date: datetime, text: str, views=None, forwards=None):
+        self.id = id
+        self.date = date
+        self.text = text
+        self.views = views
+        self.forwards = forwards
+
+
+class FakeDialog:
+    """The attributes of ``telethon.custom.Dialog`` read by the parser"""
+    __slots__ = ('entity', 'id', 'is_channel', 'is_group')
+
+    def __init__(self, entity):
+        self.entity = entity
+        self.id = utils.get_peer_id(entity)
+        self.is_channel = isinstance(entity, types.Channel)
+        self.is_group = isinstance(entity, types.Chat) or bool(getattr(entity, 'megagroup', False))
+
+
+class FakeChannelHistory:
+    """Messages of one channel as sorted columns, materialised page by page"""
+
+    def __init__(self, messages: pd.DataFrame):
+        messages = messages.sort_values('message_id', kind='stable')
+        self.ids = messages['message_id'].to_numpy(dtype=np.int64)
+        self.dates = pd.to_datetime(messages['date'], utc=True).dt.tz_convert(None).to_numpy()
+        self.texts = messages['text'].astype(object).where(messages['text'].notna(), None).to_numpy()
+        self.views = messages['views'].astype(object).where(messages['views'].notna(), None).to_numpy()
+        self.forwards = messages['forwards'].astype(object).where(messages['forwards'].notna(), None).to_numpy()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def message(self, position: int) -> FakeMessage:
+        date = pd.Timestamp(self.dates[position], tz='UTC').to_pydatetime()
+        return FakeMessage(int(self.ids[position]), date, self.texts[position],
+                           self.views[position], self.forwards[position])
+
+
+class FakeTelegramClient:
+    """Serves ``corpus`` (columns of ``benchmarks.corpus``) like a Telegram account
+
+    ``latency`` seconds are awaited before every request and every history or
+    dialog page. A request fails with FloodWaitError of ``flood_wait_seconds``
+    with probability ``flood_wait_probability``, and whenever more than
+    ``rate_limits[kind]`` requests of that kind (request class name, or
+    ``iter_messages``/``iter_dialogs``/``get_entity``) arrive within a second;
+    the reported wait is then the time until the window frees up. Injected
+    errors are drawn from a ``seed``-ed generator.
+
+    The account starts as a member of the first ``joined`` corpus channels
+    (all of them by default); extra ``search_only`` channels without messages
+    exist only to be found by search and joined.
+    """
+
+    def __init__(self, corpus: pd.DataFrame, latency: float = 0.0, flood_wait_probability: float = 0.0,
+                 flood_wait_seconds: int = 1, rate_limits: Optional[Dict[str, int]] = None,
+                 joined: Optional[int] = None, search_only: int = 0, seed: int = 0):
+        self.latency = latency
+        self.flood_wait_probability = flood_wait_probability
+        self.flood_wait_seconds = flood_wait_seconds
+        self.rate_limits = dict(rate_limits or {})
+        self.requests: Counter = Counter()
+        self.flood_waits: Counter = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._random = random.Random(seed)
+        self._recent: Dict[str, deque] = defaultdict(deque)
+
+        self.channels: Dict[str, types.Channel] = {}
+        self._history: Dict[int, FakeChannelHistory] = {}
+        groups = corpus.groupby('channel_id', sort=True, observed=True)
+        for number, (username, messages) in enumerate(groups):
+            channel = self._channel(number, str(username), str(messages['channel'].iloc[0]))
+            self._history[channel.id] = FakeChannelHistory(messages)
+        for number in range(len(self.channels), len(self.channels) + search_only):
+            self._channel(number, f'nft_search_{number}', f'NFT Search Result {number}')
+        self._by_id = {channel.id: channel for channel in self.channels.values()}
+
+        # Состояние аккаунта: подписки, архив, отключённые уведомления
+        corpus_ids = list(self._history)
+        self.joined: Set[int] = set(corpus_ids if joined is None else corpus_ids[:joined])
+        self.archived: Set[int] = set()
+        self.muted: Set[int] = set()
+        self._pts = 1
+
+    def _channel(self, number: int, username: str, title: str) -> types.Channel:
+        channel_id = FIRST_CHANNEL_ID + number
+        channel = types.Channel(
+            id=channel_id, title=title, photo=types.ChatPhotoEmpty(), date=None,
+            broadcast=number % 3 != 0, megagroup=number % 3 == 0,
+            access_hash=channel_id * 7919, username=username
+        )
+        self.channels[username.lower()] = channel
+        return channel
+
+    def is_connected(self) -> bool:
+        return True
+
+    async def connect(self) -> None:
+        pass
+
+    async def _request(self, kind: str, request=None) -> None:
+        """Account for one request of ``kind``: latency, concurrency and injected FloodWait"""
+        self.requests[kind] += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+        seconds = None
+        limit = self.rate_limits.get(kind)
+        if limit:
+            now = time.monotonic()
+            recent = self._recent[kind]
+            while recent and now - recent[0] >= 1:
+                recent.popleft()
+            if len(recent) >= limit:
+                seconds = max(1, math.ceil(1 - (now - recent[0])))
+            else:
+                recent.append(now)
+        if seconds is None and self.flood_wait_probability and self._random.random() < self.flood_wait_probability:
+            seconds = self.flood_wait_seconds
+        if seconds is not None:
+            self.flood_waits[kind] += 1
+            raise errors.FloodWaitError(request=request, capture=seconds)
+
+    def _resolve(self, entity) -> Optional[types.Channel]:
+        """Channel for a Channel, InputChannel, InputPeerChannel, cached entity or ID"""
+        if isinstance(entity, int):
+            return self._by_id.get(utils.resolve_id(entity)[0])
+        channel_id = getattr(entity, 'channel_id', None) or getattr(entity, 'id', None)
+        return self._by_id.get(channel_id)
+
+    async def get_entity(self, key: Union[str, int]):
+        await self._request('get_entity')
+        if isinstance(key, int) or str(key).lstrip('-').isdigit():
+            entity = self._resolve(int(key))
+        else:
+            entity = self.channels.get(str(key).lower().lstrip('@').rsplit('/', 1)[-1])
+        if entity is None:
+            raise ValueError(f'Cannot find any entity corresponding to "{key}"')
+        return entity
+
+    async def get_input_entity(self, entity):
+        """Input peer of an entity; cached locally, so no request is made"""
+        channel = self._resolve(entity)
+        if channel is None:
+            raise ValueError(f'Cannot find any entity corresponding to "{entity}"')
+        return types.InputPeerChannel(channel.id, channel.access_hash)
+
+    async def iter_messages(self, entity, limit: Optional[int] = None, offset_date: datetime = None,
+                            min_id: int = 0, reverse: bool = False):
+        """Messages of ``entity``; newest first unless ``reverse``
+
+        As in Telethon, ``offset_date`` is exclusive: with ``reverse`` only
+        later messages are returned, otherwise only earlier ones.
+        """
+        channel = self._resolve(entity)
+        history = self._history.get(channel.id) if channel is not None else None
+        if history is None:
+            raise ValueError(f'Cannot find any entity corresponding to "{entity}"')
+
+        positions = np.arange(len(history))
+        positions = positions[history.ids[positions] > min_id]
+        if offset_date is not None:
+            offset = pd.Timestamp(offset_date)
+            offset = (offset.tz_localize('UTC') if offset.tzinfo is None else offset).tz_convert(None).to_datetime64()
+            dates = history.dates[positions]
+            positions = positions[dates > offset] if reverse else positions[dates < offset]
+        if not reverse:
+            positions = positions[::-1]
+        if limit is not None:
+            positions = positions[:limit]
+
+        for start in range(0, len(positions), PAGE_SIZE):
+            await self._request('iter_messages')
+            for position in positions[start:start + PAGE_SIZE]:
+                yield history.message(position)
+
+    async def iter_dialogs(self, limit: Optional[int] = None):
+        """Dialogs of the joined channels, in channel ID order"""
+        joined = sorted(self.joined)[:limit]
+        for start in range(0, len(joined), PAGE_SIZE):
+            await self._request('iter_dialogs')
+            for channel_id in joined[start:start + PAGE_SIZE]:
+                yield FakeDialog(self._by_id[channel_id])
+
+    async def __call__(self, request):
+        kind = type(request).__name__
+        handler = getattr(self, f'_handle_{kind}', None)
+        if handler is None:
+            raise NotImplementedError(f'{kind} не поддерживается FakeTelegramClient')
+        await self._request(kind, request)
+        return handler(request)
+
+    def _require_channel(self, entity, request) -> types.Channel:
+        channel = self._resolve(entity)
+        if channel is None:
+            raise errors.ChannelInvalidError(request=request)
+        return channel
+
+    def _changed(self) -> None:
+        self._pts += 1
+
+    def _handle_SearchRequest(self, request):
+        query = request.q.lower()
+        chats = [channel for channel in self._by_id.values() if query in channel.title.lower()]
+        return types.contacts.Found(my_results=[], results=[], chats=chats[:request.limit], users=[])
+
+    def _handle_JoinChannelRequest(self, request):
+        channel = self._require_channel(request.channel, request)
+        if channel.id in self.joined:
+            raise errors.UserAlreadyParticipantError(request=request)
+        self.joined.add(channel.id)
+        self._changed()
+        return types.Updates(updates=[], users=[], chats=[channel], date=datetime.now(timezone.utc), seq=0)
+
+    def _handle_LeaveChannelRequest(self, request):
+        channel = self._require_channel(request.channel, request)
+        if channel.id not in self.joined:
+            raise errors.UserNotParticipantError(request=request)
+        self.joined.discard(channel.id)
+        self.archived.discard(channel.id)
+        self.muted.discard(channel.id)
+        self._changed()
+        return types.Updates(updates=[], users=[], chats=[channel], date=datetime.now(timezone.utc), seq=0)
+
+    def _handle_DeleteChatUserRequest(self, request):
+        # В корпусе нет обычных групп, только каналы и супергруппы
+        raise errors.ChatIdInvalidError(request=request)
+
+    def _handle_EditPeerFoldersRequest(self, request):
+        for folder_peer in request.folder_peers:
+            channel = self._require_channel(folder_peer.peer, request)
+            (self.archived.add if folder_peer.folder_id == 1 else self.archived.discard)(channel.id)
+        return types.Updates(updates=[], users=[], chats=[], date=datetime.now(timezone.utc), seq=0)
+
+    def _handle_UpdateNotifySettingsRequest(self, request):
+        channel = self._require_channel(request.peer, request)
+        if request.settings.mute_until:
+            self.muted.add(channel.id)
+        else:
+            self.muted.discard(channel.id)
+        return True
+
+    def _handle_GetStateRequest(self, request):
+        return types.updates.State(pts=self._pts, qts=0, date=datetime.now(timezone.utc), seq=0, unread_count=0)
+
+    def _handle_GetDifferenceRequest(self, request):
+        # Изменения подписок не воспроизводятся: клиенту предлагается полное обновление
+        if request.pts != self._pts:
+            return types.updates.DifferenceTooLong(pts=self._pts)
+        return types.updates.DifferenceEmpty(date=datetime.now(timezone.utc), seq=0)
+
+    def reset_stats(self) -> None:
+        """Zero the request, FloodWait and concurrency counters"""
+        self.requests.clear()
+        self.flood_waits.clear()
+        self.max_in_flight = 0
+        self._recent.clear()
@@ -0,0 +1,153 @@
+"""Offline load test of TelegramParser I/O against the fake Telegram client.
+
+Usage: python benchmarks/load_test.py [--rows 100k] [--latency 0.05]
+                                      [--flood-probability 0.01] [--flood-seconds 1]
+                                      [--rate-limit JoinChannelRequest=5 ...]
+                                      [--concurrency 1,4,8,16] [--search-only 200]
+                                      [--join-rate 10] [--leave-concurrency 4]
+
+Scenarios run on the shared client loop exactly as in the app:
+
+* fetch_messages and stream_to_storage over every corpus channel for each
+  ``--concurrency`` value, to show how throughput scales with parallelism;
+* search_nft_groups followed by the background join queue;
+* leave_all_chats from every joined channel.
+
+For each scenario the wall time, throughput, number of requests, injected
+FloodWait errors and the peak number of requests in flight are printed.
+Latency, FloodWait injection and corpus size are reproducible (seeded), so
+runs can be compared before and after a change.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from corpus import generate_messages  # noqa: E402
+from fake_telegram import FakeTelegramClient  # noqa: E402
+from run_benchmarks import fetch_parser, parse_size  # noqa: E402
+from storage import get_storage  # noqa: E402
+from telegram_client import run_sync  # noqa: E402
+from telegram_parser import LeaveProgress, TelegramParser  # noqa: E402
+
+
+def parse_rate_limits(values: List[str]) -> Dict[str, int]:
+    limits = {}
+    for value in values:
+        kind, _, limit = value.partition('=')
+        limits[kind.strip()] = int(limit)
+    return limits
+
+
+def new_parser(client: FakeTelegramClient) -> TelegramParser:
+    """Parser on ``client`` with an empty entity cache, so every scenario resolves entities itself"""
+    parser = fetch_parser(client)
+    parser.entity_cache.clear()
+    return parser
+
+
+def measure(name: str, client: FakeTelegramClient, scenario: Callable, unit: str) -> None:
+    """Run ``scenario`` (returning the number of processed ``unit``) and print its statistics"""
+    client.reset_stats()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        processed = scenario()
+    seconds = time.perf_counter() - start
+    requests = sum(client.requests.values())
+    flood_waits = sum(client.flood_waits.values())
+    rate = processed / seconds if seconds else 0.0
+    print(f"{name:<28} {seconds:>9.3f} {processed:>9} {rate:>11.1f} {unit:<9}"
+          f" {requests:>9} {flood_waits:>6} {client.max_in_flight:>9}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', default='100k', help='corpus size served by the fake client')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per request')
+    parser.add_argument('--flood-probability', type=float, default=0.0,
+                        help='chance of a FloodWait error on any request')
+    parser.add_argument('--flood-seconds', type=int, default=1, help='wait reported by injected FloodWait errors')
+    parser.add_argument('--rate-limit', action='append', default=[], metavar='KIND=N',
+                        help='FloodWait when more than N requests of KIND arrive per second')
+    parser.add_argument('--concurrency', default='1,4,8,16', help='max_concurrency values for fetching')
+    parser.add_argument('--search-only', type=int, default=200, help='extra channels found only by search')
+    parser.add_argument('--join-rate', type=float, default=10.0, help='join queue requests per second')
+    parser.add_argument('--leave-concurrency', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    corpus = generate_messages(parse_size(args.rows), seed=args.seed)
+    start_date = corpus['date'].min().date()
+    options = dict(latency=args.latency, flood_wait_probability=args.flood_probability,
+                   flood_wait_seconds=args.flood_seconds, rate_limits=parse_rate_limits(args.rate_limit),
+                   seed=args.seed)
+
+    print(f"{'scenario':<28} {'seconds':>9} {'items':>9} {'items/s':>11} {'':<9}"
+          f" {'requests':>9} {'flood':>6} {'in flight':>9}")
+    workdir = os.getcwd()
+    # Хранилище, кэш сущностей и состояние выхода создаются во временном каталоге
+    with tempfile.TemporaryDirectory(prefix='nft_load_') as tmp:
+        os.chdir(tmp)
+        try:
+            client = FakeTelegramClient(corpus, **options)
+            channels = list(client.channels)
+            for concurrency in [int(value) for value in args.concurrency.split(',') if value.strip()]:
+                def fetch():
+                    parser = new_parser(client)
+                    try:
+                        return len(parser.fetch_messages(channels, start_date, None, max_concurrency=concurrency))
+                    finally:
+                        parser.close()
+
+                def stream():
+                    parser = new_parser(client)
+                    storage = get_storage()
+                    storage.clear()
+                    try:
+                        return parser.fetch_to_storage(channels, start_date, None, storage=storage,
+                                                       max_concurrency=concurrency)
+                    finally:
+                        parser.close()
+
+                measure(f'fetch_messages[{concurrency}]', client, fetch, 'messages')
+                measure(f'stream_to_storage[{concurrency}]', client, stream, 'messages')
+
+            # Поиск и присоединение начинаются с аккаунта без подписок
+            client = FakeTelegramClient(corpus, joined=0, search_only=args.search_only, **options)
+
+            def search_and_join():
+                parser = new_parser(client)
+                parser.join_queue.limiter.rate = args.join_rate
+
+                async def run():
+                    await parser.search_nft_groups(limit=len(client.channels))
+                    await parser.join_queue.wait()
+                    return parser.join_queue.joined
+
+                return run_sync(run())
+
+            measure('search_and_join', client, search_and_join, 'chats')
+
+            def leave():
+                parser = new_parser(client)
+                progress = LeaveProgress()
+                run_sync(parser.leave_all_chats(concurrency=args.leave_concurrency, progress=progress))
+                return progress.left
+
+            measure('leave_all_chats', client, leave, 'chats')
+        finally:
+            os.chdir(workdir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""Benchmark suite on the synthetic corpus, with regression checks.
+
+Usage: python benchmarks/run_benchmarks.py [--sizes 10k,100k,1M,10M]
+                                           [--baseline benchmarks/baseline.json]
+                                           [--save-baseline] [--tolerance 1.3]
+                                           [--no-memory] [--max-fetch-rows 100k]
+
+For every corpus size the suite times each NFTAnalyzer method, NFT info
+extraction, save_data/load_data on both storage backends and a full fetch
+through TelegramParser against the in-process fake client. A second pass
+under tracemalloc records peak Python memory (skip it with --no-memory, it
+is several times slower than the timed pass).
+
+Results are compared with the baseline file: a step is flagged when it is
+slower or uses more memory than ``tolerance`` times the baseline, or when its
+result digest differs (analytics output changed). Flags make the exit code
+1. --save-baseline stores the current run instead; timings are machine
+specific, so keep the baseline out of the repository or regenerate it on the
+machine that runs the comparison.
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from corpus import generate_messages  # noqa: E402
+from data_analyzer import NFTAnalyzer  # noqa: E402
+from entity_cache import EntityCache  # noqa: E402
+from extraction import extract_nft_info  # noqa: E402
+from fake_telegram import FakeTelegramClient  # noqa: E402
+from schema import apply_schema  # noqa: E402
+from sentiment import load_sentiment_engine  # noqa: E402
+from storage import get_storage  # noqa: E402
+from telegram_parser import TelegramParser  # noqa: E402
+from utils import load_data, save_data  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+# Замедление меньше этого порога (в секундах) считается шумом
+NOISE_SECONDS = 0.05
+NOISE_MB = 1.0
+SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    if text[-1:] in SUFFIXES:
+        return int(float(text[:-1]) * SUFFIXES[text[-1]])
+    return int(float(text))
+
+
+def digest(result) -> str:
+    """Short fingerprint of a step result; equal results give equal digests"""
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        text = result.to_csv()
+    else:
+        text = repr(result)
+    return hashlib.md5(text.encode('utf-8')).hexdigest()[:12]
+
+
+def extraction_summary(records: List[Dict]) -> Tuple:
+    projects = sum(1 for info in records if info['project_name'])
+    prices = [info['price'] for info in records if info['price'] is not None]
+    return len(records), projects, len(prices), round(sum(prices), 2)
+
+
+@contextlib.contextmanager
+def storage_backend(name: str):
+    previous = os.environ.get('NFT_STORAGE')
+    os.environ['NFT_STORAGE'] = name
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop('NFT_STORAGE', None)
+        else:
+            os.environ['NFT_STORAGE'] = previous
+
+
+def backends() -> List[str]:
+    try:
+        import pyarrow  # noqa: F401
+        return ['parquet', 'csv']
+    except ImportError:
+        return ['csv']
+
+
+def fetch_parser(client: FakeTelegramClient) -> TelegramParser:
+    parser = TelegramParser()
+    parser.client = client
+    parser.entity_cache = EntityCache('bench_entity_cache.json')
+    parser.message_limit = 10 ** 9
+    return parser
+
+
+def build_steps(corpus: pd.DataFrame, max_fetch_rows: int) -> List[Tuple[str, Callable, Callable]]:
+    """(name, step, summary) triples; ``summary`` turns the result into something to digest"""
+    data = apply_schema(corpus)
+    sentiment = load_sentiment_engine()
+    texts = corpus['text'].tolist()
+
+    def analyzer():
+        return NFTAnalyzer(data, sentiment=sentiment)
+
+    steps = [
+        ('get_total_projects', lambda: analyzer().get_total_projects(), None),
+        ('get_trending_projects', lambda: analyzer().get_trending_projects(), None),
+        ('get_trending_count', lambda: analyzer().get_trending_count(), None),
+        ('get_activity_timeline', lambda: analyzer().get_activity_timeline(), None),
+        ('get_rising_projects', lambda: analyzer().get_rising_projects(), None),
+        ('get_gift_givers', lambda: analyzer().get_gift_givers(), None),
+        ('get_project_details', lambda: analyzer().get_project_details(), None),
+        ('extract_nft_info', lambda: [extract_nft_info(text) for text in texts], extraction_summary),
+    ]
+
+    for backend in backends():
+        def save(backend=backend):
+            with storage_backend(backend):
+                get_storage().clear()
+                save_data(data)
+
+        def load(backend=backend):
+            with storage_backend(backend):
+                return load_data()
+
+        steps.append((f'save_data[{backend}]', save, None))
+        steps.append((f'load_data[{backend}]', load, len))
+
+    # Загрузка через парсер: сообщения создаются по одному, поэтому объём ограничен
+    fetched = corpus.head(max_fetch_rows)
+    client = FakeTelegramClient(fetched)
+    channels = list(client.channels)
+    start_date = fetched['date'].min().date()
+
+    def fetch():
+        parser = fetch_parser(client)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                return parser.fetch_messages(channels, start_date, None)
+        finally:
+            parser.close()
+
+    def stream():
+        parser = fetch_parser(client)
+        storage = get_storage()
+        storage.clear()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                return parser.fetch_to_storage(channels, start_date, None, storage=storage)
+        finally:
+            parser.close()
+
+    steps.append((f'fetch_messages[{len(fetched)}]', fetch, len))
+    steps.append((f'stream_to_storage[{len(fetched)}]', stream, None))
+    return steps
+
+
+def run_step(step: Callable, memory: bool) -> Tuple[object, float, float]:
+    start = time.perf_counter()
+    result = step()
+    seconds = time.perf_counter() - start
+    peak_mb = None
+    if memory:
+        del result
+        tracemalloc.start()
+        try:
+            result = step()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return result, seconds, peak_mb
+
+
+def compare(measured: Dict, expected: Dict, tolerance: float) -> List[str]:
+    """Reasons why ``measured`` is a regression against ``expected``"""
+    problems = []
+    if expected.get('digest') and measured['digest'] != expected['digest']:
+        problems.append('результат изменился')
+    seconds, base_seconds = measured['seconds'], expected.get('seconds')
+    if base_seconds and seconds > base_seconds * tolerance and seconds - base_seconds > NOISE_SECONDS:
+        problems.append(f'время x{seconds / base_seconds:.2f}')
+    peak, base_peak = measured.get('peak_mb'), expected.get('peak_mb')
+    if peak is not None and base_peak and peak > base_peak * tolerance and peak - base_peak > NOISE_MB:
+        problems.append(f'память x{peak / base_peak:.2f}')
+    return problems
+
+
+def run(sizes: List[int], baseline: Dict, tolerance: float, memory: bool, max_fetch_rows: int) -> Tuple[Dict, int]:
+    results = {}
+    regressions = 0
+    print(f"{'rows':>10} {'step':<32} {'seconds':>9} {'peak MB':>9} {'baseline':>9}  status")
+    for rows in sizes:
+        start = time.perf_counter()
+        corpus = generate_messages(rows)
+        print(f"{rows:>10} {'generate corpus':<32} {time.perf_counter() - start:>9.3f}")
+        expected_steps = baseline.get(str(rows), {})
+        measured_steps = results[str(rows)] = {}
+        for name, step, summary in build_steps(corpus, max_fetch_rows):
+            result, seconds, peak_mb = run_step(step, memory)
+            measured = {
+                'seconds': round(seconds, 4),
+                'peak_mb': round(peak_mb, 1) if peak_mb is not None else None,
+                'digest': digest(summary(result) if summary else result),
+            }
+            measured_steps[name] = measured
+            expected = expected_steps.get(name, {})
+            problems = compare(measured, expected, tolerance)
+            regressions += bool(problems)
+            status = '; '.join(problems) or ('ok' if expected else 'нет базы')
+            base = f"{expected['seconds']:>9.3f}" if expected.get('seconds') else f"{'-':>9}"
+            peak = f"{peak_mb:>9.1f}" if peak_mb is not None else f"{'-':>9}"
+            print(f"{rows:>10} {name:<32} {seconds:>9.3f} {peak} {base}  {status}")
+    return results, regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', default='10k,100k', help='corpus sizes, e.g. 10k,100k,1M,10M')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=1.3, help='allowed slowdown/memory growth factor')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--max-fetch-rows', default='100k', help='corpus rows served by the fake client')
+    args = parser.parse_args(argv)
+
+    baseline_path = os.path.abspath(args.baseline)
+    try:
+        with open(baseline_path, 'r') as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        stored = {}
+
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    workdir = os.getcwd()
+    # Хранилище, кэш сущностей и состояние парсера создаются во временном каталоге
+    with tempfile.TemporaryDirectory(prefix='nft_bench_') as tmp:
+        os.chdir(tmp)
+        try:
+            results, regressions = run(sizes, {} if args.save_baseline else stored.get('results', {}),
+                                       args.tolerance, not args.no_memory, parse_size(args.max_fetch_rows))
+        finally:
+            os.chdir(workdir)
+
+    if args.save_baseline:
+        merged = stored.get('results', {})
+        merged.update(results)
+        with open(baseline_path, 'w') as f:
+            json.dump({
+                'environment': {
+                    'python': platform.python_version(),
+                    'pandas': pd.__version__,
+                    'machine': platform.platform(),
+                },
+                'results': merged,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"Базовые результаты сохранены в {baseline_path}")
+        return 0
+
+    if regressions:
+        print(f"Обнаружено регрессий: {regressions}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""Headless data collection without Streamlit.
+
+Usage:
+    python collector.py fetch  [--channels channels.json] [--days 7] [--full] [--every SECONDS]
+    python collector.py search [--limit 50] [--filter NAME] [--no-join] [--save-channels]
+    python collector.py leave  [--leave-concurrency 4]
+    python collector.py live   [--channels channels.json]
+
+Channels are read from the same channels.json as the app (a JSON list of
+usernames or IDs). Jobs run once by default, which suits cron; with
+``--every`` the job repeats on a fixed interval until SIGTERM/SIGINT, which
+suits a systemd service. A lock file prevents two collectors (or a collector
+started by cron while the previous run is still going) from using the
+Telegram session and the storage at the same time.
+
+The Telegram session must already be authorized, e.g. by signing in once
+through the app on the same machine.
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from typing import Callable, List
+
+from storage import get_storage
+from telegram_client import client_manager, run_sync
+from telegram_parser import TelegramParser
+from utils import CHANNELS_FILE, load_channels
+
+LOCK_FILE = 'collector.lock'
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class CollectorLock:
+    """Exclusive lock on a file, released automatically if the process dies"""
+
+    def __init__(self, path: str = LOCK_FILE):
+        self.path = path
+        self._file = None
+
+    def acquire(self) -> bool:
+        self._file = open(self.path, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            self._file.close()
+            self._file = None
+            return False
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(str(os.getpid()))
+        self._file.flush()
+        return True
+
+    def release(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def connect(parser: TelegramParser) -> bool:
+    """Connect the shared client and check that the session is authorized"""
+    async def _connect():
+        await parser._connect()
+        return parser.client is not None and await parser.client.is_user_authorized()
+
+    if not run_sync(_connect()):
+        print("Сессия Telegram не авторизована: войдите один раз через приложение (python main.py)")
+        return False
+    return True
+
+
+def fetch_job(parser: TelegramParser, args) -> Callable[[], None]:
+    def job():
+        channels = load_channels(args.channels)
+        end_date = date.today()
+        start_date = end_date - timedelta(days=args.days)
+        # Полная перезагрузка пишется во временную копию хранилища и заменяет данные
+        # и курсоры только после успешной загрузки
+        written = run_sync(parser.update_storage(
+            channels, start_date, end_date, storage=get_storage(), incremental=not args.full,
+            batch_size=args.batch_size
+        ))
+        if args.full and not written:
+            raise RuntimeError("Полная перезагрузка не получила сообщений, сохранённые данные не изменены")
+        print(f"Загрузка завершена: {written} сообщений из {len(channels)} каналов")
+    return job
+
+
+def search_job(parser: TelegramParser, args) -> Callable[[], None]:
+    def job():
+        async def search():
+            found = await parser.search_nft_groups(limit=args.limit, name_filter=args.filter, join=not args.no_join)
+            await parser.join_queue.wait()
+            return found
+
+        found = run_sync(search())
+        print(f"Найдено {len(found)} каналов и групп, присоединение: "
+              f"успешно {parser.join_queue.joined}, с ошибками {parser.join_queue.failed}")
+        if args.save_channels:
+            save_channels(args.channels, [chat['username'] or str(chat['id']) for chat in found])
+    return job
+
+
+def leave_job(parser: TelegramParser, args) -> Callable[[], None]:
+    def job():
+        if not run_sync(parser.leave_all_chats(concurrency=args.leave_concurrency)):
+            raise RuntimeError("Не удалось выйти из всех каналов, неудачные будут повторены при следующем запуске")
+    return job
+
+
+def save_channels(path: str, channels: List[str]) -> None:
+    """Add ``channels`` to the channel list file, keeping the existing order"""
+    known = load_channels(path) if os.path.exists(path) else []
+    seen = set(known)
+    merged = known + [channel for channel in channels if channel not in seen and not seen.add(channel)]
+    with open(path, 'w') as f:
+        json.dump(merged, f, ensure_ascii=False, indent=2)
+    print(f"В {path} добавлено каналов: {len(merged) - len(known)}")
+
+
+def run_live(parser: TelegramParser, args, stop: threading.Event) -> int:
+    channels = load_channels(args.channels)
+    if not run_sync(parser.live.start(channels, storage=get_storage())):
+        return 1
+    try:
+        while not stop.wait(10):
+            print(f"Получено: {parser.live.received}, сохранено: {parser.live.written}")
+    finally:
+        run_sync(parser.live.stop())
+    return 0
+
+
+def run_scheduled(job: Callable[[], None], every: float, stop: threading.Event) -> int:
+    """Run ``job`` once, or every ``every`` seconds until ``stop`` is set"""
+    failed = False
+    while True:
+        started = time.monotonic()
+        try:
+            job()
+            failed = False
+        except Exception as e:
+            print(f"Ошибка задания: {str(e)}")
+            failed = True
+        if not every or stop.wait(max(every - (time.monotonic() - started), 0)):
+            return 1 if failed else 0
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    arg_parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    arg_parser.add_argument('job', choices=['fetch', 'search', 'leave', 'live'])
+    arg_parser.add_argument('--channels', default=CHANNELS_FILE, help='JSON list of channels to collect')
+    arg_parser.add_argument('--every', type=float, default=0, help='repeat the job every N seconds')
+    arg_parser.add_argument('--lock', default=LOCK_FILE, help='lock file against concurrent runs')
+    arg_parser.add_argument('--concurrency', type=int, help='channels fetched in parallel')
+    arg_parser.add_argument('--extraction-workers', type=int, default=os.cpu_count() or 1,
+                            help='processes for NFT info extraction (1: in the collector process)')
+    arg_parser.add_argument('--message-limit', type=int, help='messages per channel and run')
+    arg_parser.add_argument('--days', type=int, default=7, help='fetch: how many days back to start')
+    arg_parser.add_argument('--full', action='store_true', help='fetch: fetch everything again and replace the storage if it succeeds')
+    arg_parser.add_argument('--batch-size', type=int, default=500, help='fetch: messages per storage write')
+    arg_parser.add_argument('--limit', type=int, default=50, help='search: results per search term')
+    arg_parser.add_argument('--filter', help='search: keep chats whose title contains this text')
+    arg_parser.add_argument('--no-join', action='store_true', help='search: do not join found chats')
+    arg_parser.add_argument('--save-channels', action='store_true', help='search: add found chats to --channels')
+    arg_parser.add_argument('--leave-concurrency', type=int, default=4, help='leave: parallel workers')
+    return arg_parser
+
+
+def main(argv=None) -> int:
+    args = build_arg_parser().parse_args(argv)
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    lock = CollectorLock(args.lock)
+    if not lock.acquire():
+        print(f"Сборщик уже запущен (блокировка {args.lock}), запуск пропущен")
+        return 1
+
+    parser = TelegramParser()
+    if args.concurrency:
+        parser.max_concurrency = args.concurrency
+    if args.extraction_workers:
+        parser.extraction_workers = args.extraction_workers
+    if args.message_limit:
+        parser.message_limit = args.message_limit
+    try:
+        if not connect(parser):
+            return 1
+        if args.job == 'live':
+            return run_live(parser, args, stop)
+        jobs = {'fetch': fetch_job, 'search': search_job, 'leave': leave_job}
+        return run_scheduled(jobs[args.job](parser, args), args.every, stop)
+    finally:
+        parser.close()
+        client_manager.shutdown()
+        lock.release()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
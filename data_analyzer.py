@@ -1,26 +1,116 @@
+import re
+
+import numpy as np
 import pandas as pd
 
+from sentiment import load_sentiment_engine
+from text_index import TextIndex
+from trends import TrendEngine
+
+# Шаблоны для поиска информации о получении NFT
+GIFT_PATTERN = re.compile('|'.join([
+    r'получи[а-я]+ NFT',
+    r'выигра[а-я]+ NFT',
+    r'won NFT',
+    r'получател[а-я]+ NFT',
+    r'airdrop',
+    r'giveaway winner',
+    r'получи[а-я]+ бесплатн[а-я]+',
+    r'congratulations to @\w+',
+    r'поздравля[а-я]+ @\w+',
+    r'winner[а-я]*: @\w+',
+    r'побед[а-я]+ @\w+'
+]), re.IGNORECASE)
+
+# Общие шаблоны сообщений о подарках, если сообщений о победителях нет
+GIFT_PATTERN_GENERAL = re.compile('|'.join([
+    r'подар[а-я]+ NFT',
+    r'дар[а-я]+ NFT',
+    r'airdrop',
+    r'giveaway',
+    r'gift[а-я]* NFT',
+    r'бесплатн[а-я]+ NFT',
+    r'free NFT',
+    r'win[а-я]* NFT'
+]), re.IGNORECASE)
+
+# Упоминания пользователей в контексте получения подарков
+WINNER_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
+    r'победител[а-я]*\W+@(\w+)',
+    r'winner[a-z]*\W+@(\w+)',
+    r'congratulations to @(\w+)',
+    r'поздравля[а-я]+ @(\w+)',
+    r'получател[а-я]*\W+@(\w+)'
+]]
+USER_PATTERN = re.compile(r'@(\w+)')
+
+# Части слов, без которых сообщение не подходит под вариант шаблона (в том же порядке):
+# по текстовому индексу отбираются кандидаты, шаблон проверяется только на них
+GIFT_FRAGMENTS = [('получи', 'nft'), ('выигра', 'nft'), ('won', 'nft'), ('получател', 'nft'), ('airdrop',),
+                  ('giveaway', 'winner'), ('получи', 'бесплатн'), ('congratulations',), ('поздравля',),
+                  ('winner',), ('побед',)]
+GIFT_FRAGMENTS_GENERAL = [('подар', 'nft'), ('дар', 'nft'), ('airdrop',), ('giveaway',), ('gift', 'nft'),
+                          ('бесплатн', 'nft'), ('free', 'nft'), ('win', 'nft')]
+
 class NFTAnalyzer:
-    def __init__(self, data):
+    def __init__(self, data, sentiment=None, rollups=None, trends=None, sketches=None, index=None):
         self.data = data
+        self.sentiment = sentiment or load_sentiment_engine()
+        # Почасовые агрегаты хранилища (rollups.MessageRollups), если данные загружены целиком
+        self.rollups = rollups
+        # Потоковый движок трендов (trends.TrendEngine), обновляемый по мере загрузки
+        self.trends = trends
+        # Приближённый режим: оценки по скетчам (sketches.MessageSketches) с фиксированной памятью
+        self.sketches = sketches
+        # Инвертированный индекс текстов хранилища (text_index.TextIndex) вместо сканирования текстов
+        self.index = index
+        self._doc_rows = None
+        self._local_index = None
+        # Ключевые слова сентимента по каждому сообщению, считаются один раз
+        self._keyword_hits = None
+
+    def follower_methods(self):
+        """Names of the get_* methods answered from storage followers instead of ``data``
+
+        Followers are updated with every append, so these answers are current
+        even when ``data`` was loaded earlier.
+        """
+        methods = set()
+        if self.rollups is not None:
+            methods |= {'get_total_projects', 'get_trending_projects', 'get_trending_count', 'get_activity_timeline'}
+        if self.sketches is not None:
+            methods |= {'get_total_projects', 'get_gift_givers'}
+        if self.trends is not None:
+            methods.add('get_rising_projects')
+        return methods
 
     def get_total_projects(self):
         """Get total number of unique projects"""
+        if self.sketches is not None:
+            return self.sketches.total_projects()
+        if self.rollups is not None:
+            return self.rollups.total_projects()
         if 'project_name' in self.data.columns:
             return self.data['project_name'].dropna().nunique()
         return 0
 
     def get_trending_projects(self, limit=10):
         """Get trending projects by mention count"""
+        if self.rollups is not None:
+            return self.rollups.trending_projects(limit)
         if 'project_name' in self.data.columns:
             projects = self.data.dropna(subset=['project_name'])
-            counts = projects['project_name'].value_counts().reset_index()
+            counts = projects['project_name'].value_counts()
+            # Категории без упоминаний в выборке не считаются
+            counts = counts[counts > 0].reset_index()
             counts.columns = ['project', 'mentions']
             return counts.head(limit)
         return pd.DataFrame(columns=['project', 'mentions'])
 
     def get_trending_count(self):
         """Get count of trending projects (mentioned > 3 times)"""
+        if self.rollups is not None:
+            return self.rollups.trending_count()
         if 'project_name' in self.data.columns:
             projects = self.data.dropna(subset=['project_name'])
             counts = projects['project_name'].value_counts()
@@ -29,178 +119,200 @@ class NFTAnalyzer:
 
     def get_activity_timeline(self):
         """Get project mention activity over time"""
+        if self.rollups is not None:
+            return self.rollups.activity_timeline()
         if 'date' in self.data.columns:
             return self.data.groupby(self.data['date'].dt.date).size()
         return pd.Series()
 
+    def get_rising_projects(self, limit=10, by='velocity'):
+        """Проекты с наибольшей скоростью (velocity) или ускорением (acceleration) упоминаний"""
+        trends = self.trends
+        if trends is None:
+            trends = TrendEngine()
+            trends.observe_frame(self.data)
+        return trends.ranking(limit, by=by)
+
     def get_gift_givers(self, limit=20):
         """Анализ пользователей, которые получают больше всего NFT подарков"""
-        import re
-
         # Создаем пустой DataFrame для результата
         gift_receivers = pd.DataFrame(columns=['Пользователь', 'Получено подарков', 'Проекты', 'Последнее получение'])
+        if self.sketches is not None:
+            return self.sketches.gift_givers(limit)
 
         if 'text' not in self.data.columns:
             return gift_receivers
 
-        # Шаблоны для поиска информации о получении NFT
-        gift_patterns = [
-            r'получи[а-я]+ NFT',
-            r'выигра[а-я]+ NFT',
-            r'won NFT',
-            r'получател[а-я]+ NFT',
-            r'airdrop',
-            r'giveaway winner',
-            r'получи[а-я]+ бесплатн[а-я]+',
-            r'congratulations to @\w+',
-            r'поздравля[а-я]+ @\w+',
-            r'winner[а-я]*: @\w+',
-            r'побед[а-я]+ @\w+'
-        ]
-
-        # Объединим все шаблоны в один с помощью ИЛИ (|)
-        combined_pattern = '|'.join(gift_patterns)
-
         # Выбираем сообщения, содержащие информацию о получении подарков
-        gift_messages = self.data[self.data['text'].str.contains(combined_pattern, case=False, na=False, regex=True)]
+        gift_messages = self._select_messages(GIFT_PATTERN, GIFT_FRAGMENTS)
 
         if gift_messages.empty:
             # Если сообщений о победителях нет, используем все сообщения о подарках и извлекаем упоминания
-            gift_patterns_general = [
-                r'подар[а-я]+ NFT',
-                r'дар[а-я]+ NFT',
-                r'airdrop',
-                r'giveaway',
-                r'gift[а-я]* NFT',
-                r'бесплатн[а-я]+ NFT',
-                r'free NFT',
-                r'win[а-я]* NFT'
-            ]
-            combined_pattern_general = '|'.join(gift_patterns_general)
-            gift_messages = self.data[self.data['text'].str.contains(combined_pattern_general, case=False, na=False, regex=True)]
-            
+            gift_messages = self._select_messages(GIFT_PATTERN_GENERAL, GIFT_FRAGMENTS_GENERAL)
+
             if gift_messages.empty:
                 return gift_receivers
 
-        # Извлекаем информацию о пользователях (получателях)
-        # Ищем упоминания пользователей в контексте получения подарков
-        user_pattern = r'@(\w+)'
-        winner_patterns = [
-            r'победител[а-я]*\W+@(\w+)',
-            r'winner[a-z]*\W+@(\w+)',
-            r'congratulations to @(\w+)',
-            r'поздравля[а-я]+ @(\w+)',
-            r'получател[а-я]*\W+@(\w+)'
-        ]
-
-        gift_data = []
-
-        for _, message in gift_messages.iterrows():
-            text = message['text'].lower()
-            project = message['project_name'] if pd.notna(message['project_name']) else "Неизвестно"
-            
-            # Сначала ищем упоминания в контексте победителей
-            winners = []
-            for pattern in winner_patterns:
-                winners.extend(re.findall(pattern, text, re.IGNORECASE))
-            
-            # Если не нашли упоминания в контексте победителей, берем все упоминания
-            if not winners:
-                winners = re.findall(user_pattern, message['text'])
-            
-            for user in winners:
-                # Проверяем, есть ли уже этот пользователь в нашем списке
-                found = False
-                for i, (existing_user, gifts, projects, _) in enumerate(gift_data):
-                    if existing_user == user:
-                        gift_data[i] = (user, gifts + 1, 
-                                        projects + [project] if project not in projects else projects, 
-                                        message['date'])
-                        found = True
-                        break
-
-                if not found:
-                    gift_data.append((user, 1, [project] if pd.notna(project) else [], message['date']))
+        gift_messages = gift_messages.reset_index(drop=True)
+        winners = self.find_winners(gift_messages['text'])
+        if winners.empty:
+            return gift_receivers
+        positions = winners['position'].to_numpy()
+
+        if 'project_name' in gift_messages.columns:
+            projects = gift_messages['project_name'].astype(object).where(gift_messages['project_name'].notna(), "Неизвестно")
+        else:
+            projects = pd.Series("Неизвестно", index=gift_messages.index)
+        winners['project'] = projects.iloc[positions].reset_index(drop=True)
+        winners['date'] = gift_messages['date'].iloc[positions].reset_index(drop=True) if 'date' in gift_messages.columns else None
+
+        # Агрегация по пользователю: число подарков и последнее получение
+        result = pd.DataFrame({'Получено подарков': winners.groupby('user', sort=False).size()})
+        result['Последнее получение'] = winners.drop_duplicates('user', keep='last').set_index('user')['date']
 
         # Сортируем по количеству полученных подарков (по убыванию)
-        gift_data.sort(key=lambda x: x[1], reverse=True)
+        result = result.sort_values('Получено подарков', ascending=False, kind='stable').head(limit)
 
-        # Создаем и возвращаем DataFrame
-        if gift_data:
-            result = pd.DataFrame(gift_data[:limit], 
-                                 columns=['Пользователь', 'Получено подарков', 'Проекты', 'Последнее получение'])
+        # Проекты (в порядке появления) собираем только для попавших в топ пользователей
+        top = winners[winners['user'].isin(result.index)].drop_duplicates(['user', 'project'])
+        result['Проекты'] = top.groupby('user', sort=False)['project'].agg(', '.join)
 
-            # Преобразуем списки проектов в строки
-            result['Проекты'] = result['Проекты'].apply(lambda x: ', '.join(set(x)) if x else "Неизвестно")
+        result = result.rename_axis('Пользователь').reset_index()
+        return result[['Пользователь', 'Получено подарков', 'Проекты', 'Последнее получение']]
 
-            return result
+    def search_messages(self, query, limit=100):
+        """Поиск сообщений: слова, "фразы" и префиксы* (все части запроса должны встретиться)"""
+        columns = [column for column in ['date', 'channel', 'text', 'project_name'] if column in self.data.columns]
+        if 'text' not in self.data.columns:
+            return pd.DataFrame(columns=columns)
 
-        return gift_receivers
+        doc_rows = self._index_rows()
+        if doc_rows is not None:
+            positions = doc_rows[self.index.search(query)]
+            positions = np.sort(positions[positions >= 0])
+        else:
+            # Без индекса хранилища строим временный индекс по загруженным данным:
+            # каждая строка - отдельный документ, номер документа совпадает с позицией строки
+            if self._local_index is None:
+                self._local_index = TextIndex()
+                self._local_index.observe_frame(self.data[['text']])
+            positions = self._local_index.search(query)
+
+        found = self.data.iloc[positions]
+        if 'date' in found.columns:
+            found = found.sort_values('date', ascending=False, kind='stable')
+        return found[columns].head(limit).reset_index(drop=True)
+
+    def _index_rows(self):
+        """Строка данных для каждого документа индекса или None, если индекс не покрывает данные"""
+        if self.index is None or 'text' not in self.data.columns:
+            return None
+        if self._doc_rows is None:
+            rows = self.index.doc_rows(self.data)
+            covered = np.zeros(len(self.data), dtype=bool)
+            covered[rows[rows >= 0]] = True
+            # Сообщения без channel_id/message_id с индексом не сопоставить - тогда сканируем тексты
+            self._doc_rows = rows if covered.all() else False
+        return self._doc_rows if self._doc_rows is not False else None
+
+    def _rows_containing(self, fragment):
+        """Позиции сообщений со словом, содержащим ``fragment`` (None, если индекс не может ответить)"""
+        docs = self.index.contains(fragment)
+        if docs is None:
+            return None
+        rows = self._index_rows()[docs]
+        return np.unique(rows[rows >= 0])
+
+    def _select_messages(self, pattern, fragments):
+        """Сообщения, подходящие под шаблон; с индексом шаблон проверяется только на кандидатах"""
+        if self._index_rows() is None:
+            return self.data[self.data['text'].str.contains(pattern, na=False)]
+
+        candidates = []
+        for required in fragments:
+            rows = None
+            for fragment in required:
+                found = self._rows_containing(fragment)
+                rows = found if rows is None else np.intersect1d(rows, found)
+            candidates.append(rows)
+        candidates = np.unique(np.concatenate(candidates))
+        matches = self.data['text'].iloc[candidates].str.contains(pattern, na=False).to_numpy(dtype=bool)
+        return self.data.iloc[candidates[matches]]
+
+    @classmethod
+    def find_winners(cls, texts):
+        """Получатели подарков в сообщениях: позиция сообщения, номер шаблона и пользователь
+
+        ``texts`` должны иметь индекс 0..n-1 (позиции сообщений).
+        """
+        # Сначала ищем упоминания в контексте победителей (в порядке шаблонов),
+        # для остальных сообщений берем все упоминания пользователей
+        lowered = texts.str.lower()
+        mentions = [cls._extract_users(lowered, pattern, order)
+                    for order, pattern in enumerate(WINNER_PATTERNS)]
+        with_winners = pd.concat(mentions)['position'].unique()
+        remaining = texts[~texts.index.isin(with_winners)]
+        mentions.append(cls._extract_users(remaining, USER_PATTERN, len(WINNER_PATTERNS)))
+
+        winners = pd.concat(mentions, ignore_index=True)
+        return winners.sort_values(['position', 'order'], kind='stable').reset_index(drop=True)
+
+    @staticmethod
+    def _extract_users(texts, pattern, order):
+        """Извлечь упоминания пользователей по шаблону: позиция сообщения, номер шаблона и пользователь"""
+        found = texts.str.findall(pattern).explode().dropna()
+        return pd.DataFrame({
+            'position': found.index.to_numpy(dtype='int64'),
+            'order': order,
+            'user': found.to_numpy(dtype=object),
+        })
 
     def get_project_details(self):
         """Get detailed information about projects"""
         if 'project_name' not in self.data.columns:
             return pd.DataFrame()
 
-        projects = []
-        for project in self.data['project_name'].dropna().unique():
-            project_data = self.data[self.data['project_name'] == project]
-
-            channels = project_data['channel'].nunique() if 'channel' in self.data.columns else 0
-            mentions = len(project_data)
-            first_seen = project_data['date'].min() if 'date' in self.data.columns else None
-
-            # Calculate average price if price data is available
-            avg_price = None
-            if 'price' in self.data.columns:
-                prices = project_data['price'].dropna()
-                if len(prices) > 0:
-                    avg_price = prices.mean()
+        # Один проход groupby вместо отдельной выборки для каждого проекта;
+        # sort=False сохраняет порядок первого появления, как у unique()
+        project_data = self.data.dropna(subset=['project_name'])
+        if project_data.empty:
+            return pd.DataFrame(columns=['project', 'mentions', 'channels', 'first_seen', 'avg_price', 'sentiment'])
+        grouped = project_data.groupby('project_name', sort=False, observed=True)
 
-            # Определение настроения (сентимента) на основе текстов сообщений
-            sentiment = self._analyze_sentiment(project_data)
+        projects = pd.DataFrame({'mentions': grouped.size()})
+        if self.sketches is not None:
+            projects['channels'] = [self.sketches.project_channel_count(project) for project in projects.index]
+        else:
+            projects['channels'] = grouped['channel'].nunique() if 'channel' in self.data.columns else 0
+        projects['first_seen'] = grouped['date'].min() if 'date' in self.data.columns else None
+
+        # Calculate average price if price data is available
+        projects['avg_price'] = grouped['price'].mean() if 'price' in self.data.columns else None
+
+        # Определение настроения (сентимента) на основе текстов сообщений
+        if 'text' in self.data.columns:
+            scores = self.sentiment.score_groups(
+                self._message_keywords(), self.data['project_name'].reset_index(drop=True)
+            ).reindex(projects.index, fill_value=0)
+            projects['sentiment'] = self.sentiment.label(scores['positive'].to_numpy(), scores['negative'].to_numpy())
+        else:
+            projects['sentiment'] = "Нейтральное"
 
-            projects.append({
-                'project': project,
-                'mentions': mentions,
-                'channels': channels,
-                'first_seen': first_seen,
-                'avg_price': avg_price,
-                'sentiment': sentiment
-            })
+        projects = projects.rename_axis('project').reset_index()
+        return projects.sort_values('mentions', ascending=False)
 
-        return pd.DataFrame(projects).sort_values('mentions', ascending=False)
+    def _message_keywords(self):
+        """Ключевые слова сентимента, найденные в каждом сообщении (по позиции строки)"""
+        if self._keyword_hits is None:
+            texts = self.data['text'].reset_index(drop=True)
+            if self._index_rows() is not None:
+                self._keyword_hits = self.sentiment.indexed_keywords(texts, self._rows_containing)
+            else:
+                self._keyword_hits = self.sentiment.message_keywords(texts)
+        return self._keyword_hits
 
     def _analyze_sentiment(self, project_data):
         """Анализ настроения в сообщениях о проекте"""
         if 'text' not in project_data.columns or project_data.empty:
             return "Нейтральное"
-
-        # Простые ключевые слова для определения настроения
-        positive_words = [
-            'отличн', 'круто', 'супер', 'классн', 'amazing', 'great', 'awesome',
-            'крипто-луна', 'moon', 'pump', 'рост', 'выгодн', 'успешн', 'халяв',
-            'бесплатн', 'airdrop', 'giveaway', 'выигр', 'win', 'перспектив',
-            'потенциал', 'прибыль', 'доход', 'сильн', 'лучш', 'up'
-        ]
-
-        negative_words = [
-            'плох', 'ужасн', 'bad', 'terrible', 'scam', 'скам', 'обман', 'развод',
-            'хуже', 'потер', 'dump', 'падени', 'упад', 'опасн', 'рискован', 'потер', 
-            'ошибк', 'проблем', 'down', 'медвеж', 'bear'
-        ]
-
-        # Объединяем все тексты
-        all_text = ' '.join(project_data['text'].dropna()).lower()
-
-        # Подсчитываем количество позитивных и негативных слов
-        positive_count = sum(1 for word in positive_words if word in all_text)
-        negative_count = sum(1 for word in negative_words if word in all_text)
-
-        # Определяем преобладающее настроение
-        if positive_count > negative_count * 1.5:
-            return "Позитивное"
-        elif negative_count > positive_count * 1.2:
-            return "Негативное"
-        else:
-            return "Нейтральное"
+        return self.sentiment.analyze(project_data['text'])
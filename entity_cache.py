@@ -0,0 +1,161 @@
+import json
+import os
+import time
+from typing import Dict, Iterable, Optional, Union
+
+from telethon import types
+
+ENTITY_CACHE_FILE = 'entity_cache.json'
+# Access hash канала не меняется, но username и название могут смениться
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+class CachedEntity:
+    """Channel, group or user restored from the entity cache
+
+    Has the attributes the parser reads from Telethon entities (``id``,
+    ``title``, ``username``) and an ``input_entity`` that Telethon accepts
+    wherever an entity is expected, so no resolution request is needed.
+    """
+
+    def __init__(self, entry: Dict):
+        self.id = entry['id']
+        self.access_hash = entry.get('access_hash')
+        self.kind = entry['kind']
+        self.title = entry.get('title')
+        self.username = entry.get('username')
+
+    @property
+    def input_entity(self):
+        if self.kind == 'channel':
+            return types.InputPeerChannel(self.id, self.access_hash)
+        if self.kind == 'chat':
+            return types.InputPeerChat(self.id)
+        return types.InputPeerUser(self.id, self.access_hash)
+
+
+def normalize_key(key: Union[str, int]) -> str:
+    """Cache key for a username, t.me link or numeric ID"""
+    if isinstance(key, int):
+        return str(key)
+    key = key.strip()
+    for prefix in ('https://', 'http://'):
+        if key.startswith(prefix):
+            key = key[len(prefix):]
+    if key.startswith('t.me/'):
+        key = key[len('t.me/'):]
+    return key.lstrip('@').lower()
+
+
+class EntityCache:
+    """Persistent username/ID -> access hash and title mapping with TTL eviction
+
+    Shared by message fetching, joining and subscription listing: an entry
+    saved once (for example while listing dialogs) lets later calls skip the
+    ResolveUsernameRequest round-trip until it expires.
+    """
+
+    def __init__(self, path: str = ENTITY_CACHE_FILE, ttl: float = DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: Optional[Dict[str, Dict]] = None
+
+    @property
+    def entries(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            self._entries = self._load()
+        return self._entries
+
+    def _load(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Ошибка чтения кэша сущностей: {str(e)}")
+            return {}
+
+    def save(self) -> None:
+        """Write the cache to disk, dropping expired entries"""
+        self.evict_expired()
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Ошибка сохранения кэша сущностей: {str(e)}")
+
+    def get(self, key: Union[str, int]) -> Optional[CachedEntity]:
+        """Cached entity for a username or ID, or None if missing or expired"""
+        key = normalize_key(key)
+        entry = self.entries.get(key)
+        if entry is None or time.time() - entry['cached_at'] > self.ttl:
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.hits += 1
+        return CachedEntity(entry)
+
+    def put(self, entity) -> bool:
+        """Remember a Telethon Channel/Chat/User; returns False for unusable entities"""
+        if isinstance(entity, types.Channel):
+            kind = 'channel'
+        elif isinstance(entity, types.Chat):
+            kind = 'chat'
+        elif isinstance(entity, types.User):
+            kind = 'user'
+        else:
+            return False
+        access_hash = getattr(entity, 'access_hash', None)
+        # min-сущности содержат хэш, непригодный для обычных запросов
+        if kind != 'chat' and (access_hash is None or getattr(entity, 'min', False)):
+            return False
+
+        username = getattr(entity, 'username', None)
+        entry = {
+            'id': entity.id,
+            'access_hash': access_hash,
+            'kind': kind,
+            'title': getattr(entity, 'title', None) or username,
+            'username': username,
+            'cached_at': time.time()
+        }
+        self.entries[str(entity.id)] = entry
+        if username:
+            self.entries[normalize_key(username)] = entry
+        return True
+
+    def put_many(self, entities: Iterable) -> int:
+        """Remember many entities at once (e.g. all dialogs); returns how many were stored"""
+        return sum(self.put(entity) for entity in entities)
+
+    def evict_expired(self) -> int:
+        now = time.time()
+        expired = [key for key, entry in self.entries.items() if now - entry['cached_at'] > self.ttl]
+        for key in expired:
+            del self.entries[key]
+        return len(expired)
+
+    def clear(self) -> None:
+        self._entries = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def resolve(self, client, key: Union[str, int]):
+        """Entity for a username or ID, asking Telegram only on a cache miss"""
+        entity = self.get(key)
+        if entity is not None:
+            return entity
+        entity = await client.get_entity(key)
+        if self.put(entity):
+            self.save()
+        return entity
+
+
+# Общий кэш процесса для загрузки сообщений, присоединения и списка подписок
+entity_cache = EntityCache()
@@ -0,0 +1,76 @@
+import multiprocessing
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from projects import canonical_project_name
+
+# Extract project name (assuming it's in caps or followed by NFT)
+PROJECT_PATTERN = re.compile(r'([A-Z]{2,}(?:\s+[A-Z]{2,})*\s*(?:NFT)?)')
+# Extract price (looking for ETH/SOL/USD amounts)
+PRICE_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(?:ETH|SOL|\$)')
+# Дата разбирается только в формате ISO: другие форматы ('Jan 5', '1/5/2025')
+# никогда не проходили strptime('%Y-%m-%d'), поэтому их не ищем
+DATE_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2})')
+
+
+def extract_nft_info(message: str) -> Dict:
+    """Extract NFT project information from message text"""
+    info = {
+        'project_name': None,
+        'price': None,
+        'date': None
+    }
+
+    project_match = PROJECT_PATTERN.search(message)
+    if project_match:
+        # Варианты одного проекта ('BORED APE NFT', 'BAYC') сохраняются под одним названием
+        info['project_name'] = canonical_project_name(project_match.group(1))
+
+    price_match = PRICE_PATTERN.search(message)
+    if price_match:
+        info['price'] = float(price_match.group(1))
+
+    date_match = DATE_PATTERN.search(message)
+    if date_match:
+        try:
+            info['date'] = datetime.strptime(date_match.group(1), '%Y-%m-%d')
+        except ValueError:
+            pass
+
+    return info
+
+
+def extract_records(texts: Sequence[str]) -> List[Dict]:
+    """Extract NFT info for many messages at once (picklable for worker processes)"""
+    return [extract_nft_info(text) for text in texts]
+
+
+def extract_batch(texts: Sequence[str]) -> 'pd.DataFrame':
+    """Extract project_name, price and date for many messages into a DataFrame"""
+    import pandas as pd
+
+    return pd.DataFrame(extract_records(texts), columns=['project_name', 'price', 'date'])
+
+
+def create_process_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Process pool for extraction; spawn keeps workers independent of the event loop thread"""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def extract_batch_parallel(texts: Sequence[str], executor: Optional[Executor] = None,
+                           chunk_size: int = 10000) -> List[Dict]:
+    """Split texts into chunks and extract them across worker processes"""
+    texts = list(texts)
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    if len(chunks) <= 1 and executor is None:
+        return extract_records(texts)
+
+    own_executor = executor is None
+    executor = executor or create_process_pool()
+    try:
+        return [info for chunk in executor.map(extract_records, chunks) for info in chunk]
+    finally:
+        if own_executor:
+            executor.shutdown()
@@ -1,7 +1,5 @@
 
-import streamlit.web.cli as stcli
 import sys
-import os
 
 def print_startup_message():
     """Выводит сообщение с информацией по запуску приложения"""
@@ -14,6 +12,8 @@ def print_startup_message():
 
 if __name__ == "__main__":
     print_startup_message()
+    # Streamlit импортируется после вывода сообщения, чтобы оно появлялось сразу
+    import streamlit.web.cli as stcli
     sys.argv = [
         "streamlit", 
         "run", 
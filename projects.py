@@ -0,0 +1,147 @@
+import json
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Optional
+
+ALIASES_FILE = 'project_aliases.json'
+
+# Известные коллекции и их сокращения: варианты сводятся к одному названию проекта
+PROJECT_ALIASES = {
+    'BORED APE YACHT CLUB': ['BAYC', 'BORED APE', 'BORED APES', 'BORED APE YC'],
+    'MUTANT APE YACHT CLUB': ['MAYC', 'MUTANT APE', 'MUTANT APES'],
+    'CRYPTOPUNKS': ['CRYPTO PUNKS', 'CRYPTOPUNK', 'CRYPTO PUNK'],
+    'PUDGY PENGUINS': ['PUDGY PENGUIN', 'PUDGY'],
+    'TON DIAMONDS': ['TON DIAMOND'],
+    'AZUKI': ['AZUKI ELEMENTALS'],
+    'DOODLES': ['DOODLE'],
+    'CLONE X': ['CLONEX', 'RTFKT CLONE X'],
+}
+
+# Слова в конце названия, которые не отличают один проект от другого ('BORED APE NFT')
+GENERIC_SUFFIXES = {'NFT', 'NFTS'}
+# Нечёткое сравнение (по триграммам) только для достаточно длинных названий:
+# короткие сокращения вроде BAYC и MAYC различаются одной буквой
+MIN_FUZZY_LENGTH = 6
+FUZZY_THRESHOLD = 0.85
+# Слова, которыми названия различаются, должны быть опечатками друг друга: одна правка
+# на каждые 4 буквы ('DIAMONDS' - 'DIAMOND'); лишние слова ('V1', '2', 'MAYC') - другой проект
+LETTERS_PER_EDIT = 4
+MAX_CACHED_NAMES = 100000
+
+_SPACES = re.compile(r'\s+')
+
+
+def project_key(name: str) -> str:
+    """Upper-case name with single spaces and without the trailing NFT"""
+    words = _SPACES.sub(' ', name).strip().upper().split(' ')
+    while words and words[-1] in GENERIC_SUFFIXES:
+        words.pop()
+    return ' '.join(words)
+
+
+def trigrams(key: str) -> set:
+    padded = f' {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance (insertions, deletions and substitutions)"""
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        previous = current
+    return previous[-1]
+
+
+def same_words(key: str, other: str) -> bool:
+    """Whether two keys differ only by small edits of their words, not by extra words"""
+    words, other_words = key.split(' '), other.split(' ')
+    rest = ''.join(word for word in words if word not in other_words)
+    other_rest = ''.join(word for word in other_words if word not in words)
+    if not rest or not other_rest:
+        # Одно название - другое плюс слова: 'CRYPTO PUNKS V1' и 'CRYPTO PUNKS'
+        return rest == other_rest
+    return edit_distance(rest, other_rest) <= max(1, min(len(rest), len(other_rest)) // LETTERS_PER_EDIT)
+
+
+class ProjectNormalizer:
+    """Maps extracted project names to one canonical name per project
+
+    A name is reduced to its key (case, spacing and the trailing NFT do not
+    matter), then looked up in the alias dictionary; keys missing there are
+    matched against the dictionary by trigram similarity (Dice coefficient),
+    which catches plurals and typos; a similar name that adds words ("TON
+    DIAMONDS 2") is a different project and is not matched. Names that
+    match nothing keep their key, so "FOO NFT" and "FOO" still become one
+    project. Results are cached per key: extraction sees the same few names
+    over and over.
+    """
+
+    def __init__(self, aliases: Optional[Dict[str, Iterable[str]]] = None,
+                 threshold: float = FUZZY_THRESHOLD):
+        self.threshold = threshold
+        self._canonical = {}
+        for canonical, variants in (PROJECT_ALIASES if aliases is None else aliases).items():
+            name = project_key(canonical)
+            for variant in [canonical, *variants]:
+                self._canonical[project_key(variant)] = name
+
+        self._keys = list(self._canonical)
+        self._sizes = []
+        self._index = defaultdict(list)
+        for number, key in enumerate(self._keys):
+            grams = trigrams(key)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                self._index[gram].append(number)
+        self._cache = {}
+
+    def canonical(self, name: Optional[str]) -> Optional[str]:
+        """Canonical project name for an extracted ``name``"""
+        if name is None:
+            return None
+        key = project_key(name)
+        if not key:
+            # Название состоит только из "NFT" - сокращать нечего
+            return name.strip()
+        canonical = self._cache.get(key)
+        if canonical is None:
+            canonical = self._canonical.get(key) or self._fuzzy(key) or key
+            if len(self._cache) < MAX_CACHED_NAMES:
+                self._cache[key] = canonical
+        return canonical
+
+    def _fuzzy(self, key: str) -> Optional[str]:
+        if len(key) < MIN_FUZZY_LENGTH:
+            return None
+        grams = trigrams(key)
+        shared = Counter(number for gram in grams for number in self._index.get(gram, ()))
+        scores = ((2 * count / (len(grams) + self._sizes[number]), number) for number, count in shared.items())
+        for score, number in sorted(scores, reverse=True):
+            if score < self.threshold:
+                break
+            if same_words(key, self._keys[number]):
+                return self._canonical[self._keys[number]]
+        return None
+
+
+def load_project_normalizer(path: str = ALIASES_FILE) -> ProjectNormalizer:
+    """Build the normalizer from a JSON dictionary {"CANONICAL NAME": ["ALIAS", ...]}"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return ProjectNormalizer(json.load(f))
+    except:
+        return ProjectNormalizer()
+
+
+_normalizer = None
+
+
+def canonical_project_name(name: Optional[str]) -> Optional[str]:
+    """Canonical name using the process-wide normalizer (loaded on first use)"""
+    global _normalizer
+    if _normalizer is None:
+        _normalizer = load_project_normalizer()
+    return _normalizer.canonical(name)
@@ -0,0 +1,71 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` requests per second with bursts up to ``capacity``
+
+    ``pause`` blocks every caller for a fixed time, which is how a FloodWait
+    reported by Telegram is honoured for all requests sharing the bucket.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for ``seconds`` (e.g. after FloodWaitError)"""
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0
+        self._updated = max(self._updated, self._paused_until)
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """Token bucket that probes for the server's limit (additive increase,
+    multiplicative decrease)
+
+    Every successful request raises the rate by ``increase`` up to
+    ``max_rate``. A FloodWait pauses all callers for exactly the requested time
+    and halves the rate, so the bucket settles just below the observed limit.
+    """
+
+    def __init__(self, rate: float, max_rate: float, min_rate: float = 0.1,
+                 increase: float = 0.1, decrease: float = 0.5, capacity: float = 1):
+        super().__init__(rate, capacity)
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+
+    def record_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def record_flood_wait(self, seconds: float) -> None:
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self.pause(seconds)
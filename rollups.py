@@ -0,0 +1,199 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from schema import utc_dates
+from storage import FollowerRegistry, StorageFollower
+
+ROLLUP_KEYS = ['bucket', 'channel', 'project_name']
+# Колонки хранилища, из которых строятся агрегаты
+SOURCE_COLUMNS = ['date', 'channel', 'project_name', 'channel_id', 'message_id']
+NS_PER_HOUR = 3600 * 10 ** 9
+# Час сообщения без даты
+NO_BUCKET = np.iinfo(np.int32).min
+NAT = np.iinfo(np.int64).min
+
+
+def _as_objects(values: pd.Series) -> pd.Series:
+    """Object column with None for missing values (hashable keys for dicts and groupby)"""
+    return values.astype(object).where(values.notna(), None)
+
+
+class MessageRollups(StorageFollower):
+    """Message counts per hour, channel and project, kept in step with a storage
+
+    Appends reported by the storage are added incrementally; a message stored
+    again (re-fetched or edited) replaces its previous contribution, matching
+    the de-duplication done on read. To find that contribution the message
+    IDs are kept per channel in sorted 32-bit arrays, next to the hour,
+    channel and project code of each message (16 bytes per message). If the
+    storage was changed elsewhere the rollups are rebuilt from it on next
+    use. Queries cost time proportional to the number of buckets, not messages.
+    """
+
+    source_columns = SOURCE_COLUMNS
+
+    def __init__(self):
+        super().__init__()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.hourly = pd.DataFrame(columns=ROLLUP_KEYS + ['messages'])
+            # channel_id -> (message_id, час, код канала, код проекта) последних копий,
+            # отсортированные по message_id
+            self._seen: Dict[str, Tuple[np.ndarray, ...]] = {}
+            self._labels: Dict[str, List] = {'channel': [], 'project_name': []}
+            self._label_codes: Dict[str, Dict] = {'channel': {}, 'project_name': {}}
+            self._changed()
+
+    def observe_frame(self, data: pd.DataFrame) -> None:
+        """Add a batch of stored messages to the rollups"""
+        with self._lock:
+            self._add(data)
+
+    def _add(self, data: pd.DataFrame) -> None:
+        dates = utc_dates(data['date']) if 'date' in data.columns else pd.Series(pd.NaT, index=data.index)
+        batch = pd.DataFrame({
+            'bucket': dates.dt.floor('h').to_numpy(),
+            'channel': _as_objects(data['channel']).to_numpy() if 'channel' in data.columns else None,
+            'project_name': _as_objects(data['project_name']).to_numpy() if 'project_name' in data.columns else None,
+        })
+        batch['bucket'] = pd.to_datetime(batch['bucket'], utc=True)
+        batch['messages'] = 1
+
+        if 'channel_id' in data.columns and 'message_id' in data.columns:
+            removed = self._replace(data, batch)
+            if not removed.empty:
+                batch = pd.concat([batch, removed], ignore_index=True)
+
+        combined = pd.concat([self.hourly, batch], ignore_index=True) if not self.hourly.empty else batch
+        hourly = combined.groupby(ROLLUP_KEYS, dropna=False, sort=False)['messages'].sum().reset_index()
+        self.hourly = hourly[hourly['messages'] != 0].reset_index(drop=True)
+        self._changed()
+
+    def _replace(self, data: pd.DataFrame, batch: pd.DataFrame) -> pd.DataFrame:
+        """Remember the batch as the latest copies of its messages
+
+        Returns the contributions (with -1 messages) of the copies it
+        replaces; earlier copies within the batch itself get 0 messages.
+        """
+        message_ids = pd.to_numeric(data['message_id'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        positions = np.flatnonzero(~np.isnan(message_ids))
+        if not len(positions):
+            return pd.DataFrame()
+        buckets = batch['bucket'].array.as_unit('ns').asi8[positions]
+        hours = np.where(buckets == NAT, NO_BUCKET, buckets // NS_PER_HOUR).astype(np.int32)
+        channels = self._codes('channel', batch['channel'].to_numpy()[positions])
+        projects = self._codes('project_name', batch['project_name'].to_numpy()[positions])
+
+        weights = batch['messages'].to_numpy().copy()
+        removed = []
+        channel_ids = data['channel_id'].astype(str).to_numpy()[positions]
+        for channel_id, local in pd.Series(channel_ids).groupby(channel_ids).indices.items():
+            ids = message_ids[positions[local]].astype(np.int32)
+            # Из нескольких копий в пакете остаётся последняя
+            ids, last = np.unique(ids[::-1], return_index=True)
+            rows = local[len(local) - 1 - last]
+            weights[positions[np.setdiff1d(local, rows)]] = 0
+
+            seen = self._seen.get(channel_id)
+            if seen is None:
+                self._seen[channel_id] = (ids, hours[rows], channels[rows], projects[rows])
+                continue
+            seen_ids, seen_hours, seen_channels, seen_projects = seen
+            at = np.minimum(np.searchsorted(seen_ids, ids), len(seen_ids) - 1)
+            found = seen_ids[at] == ids
+            old = at[found]
+            removed.append((seen_hours[old], seen_channels[old], seen_projects[old]))
+            seen_hours[old] = hours[rows[found]]
+            seen_channels[old] = channels[rows[found]]
+            seen_projects[old] = projects[rows[found]]
+            new = rows[~found]
+            if len(new):
+                merged_ids = np.concatenate([seen_ids, ids[~found]])
+                order = np.argsort(merged_ids, kind='stable')
+                self._seen[channel_id] = (merged_ids[order],
+                                          np.concatenate([seen_hours, hours[new]])[order],
+                                          np.concatenate([seen_channels, channels[new]])[order],
+                                          np.concatenate([seen_projects, projects[new]])[order])
+        batch['messages'] = weights
+
+        if not removed:
+            return pd.DataFrame()
+        removed_hours, removed_channels, removed_projects = (np.concatenate(parts) for parts in zip(*removed))
+        nanoseconds = np.where(removed_hours == NO_BUCKET, NAT, removed_hours.astype(np.int64) * NS_PER_HOUR)
+        replaced = pd.DataFrame({
+            'bucket': pd.to_datetime(nanoseconds.view('datetime64[ns]'), utc=True),
+            'channel': self._decode('channel', removed_channels),
+            'project_name': self._decode('project_name', removed_projects),
+        })
+        replaced['bucket'] = replaced['bucket'].astype(batch['bucket'].dtype)
+        replaced['messages'] = -1
+        return replaced
+
+    def _codes(self, column: str, values: np.ndarray) -> np.ndarray:
+        """32-bit codes of channel or project names, -1 for None; codes never change"""
+        labels, label_codes = self._labels[column], self._label_codes[column]
+        codes, uniques = pd.factorize(values)
+        mapping = np.empty(len(uniques) + 1, dtype=np.int32)
+        mapping[-1] = -1
+        for number, value in enumerate(uniques):
+            code = label_codes.get(value)
+            if code is None:
+                code = label_codes[value] = len(labels)
+                labels.append(value)
+            mapping[number] = code
+        return mapping[codes]
+
+    def _decode(self, column: str, codes: np.ndarray) -> np.ndarray:
+        return np.array(self._labels[column] + [None], dtype=object)[codes]
+
+    def _changed(self) -> None:
+        self._daily = None
+        self._projects = None
+
+    @property
+    def daily(self) -> pd.Series:
+        """Messages per UTC day (NaT dates excluded)"""
+        with self._lock:
+            if self._daily is None:
+                dated = self.hourly.dropna(subset=['bucket'])
+                self._daily = dated.groupby(dated['bucket'].dt.floor('D'))['messages'].sum().astype('int64')
+            return self._daily
+
+    @property
+    def project_mentions(self) -> pd.Series:
+        """Mentions per project over the whole dataset"""
+        with self._lock:
+            if self._projects is None:
+                projects = self.hourly.dropna(subset=['project_name'])
+                self._projects = projects.groupby('project_name')['messages'].sum().astype('int64')
+            return self._projects
+
+    def activity_timeline(self) -> pd.Series:
+        """Messages per day indexed by ``datetime.date``, like ``groupby(date.dt.date).size()``"""
+        daily = self.daily
+        return pd.Series(daily.to_numpy(), index=pd.Index(daily.index.date, name='date'), dtype='int64')
+
+    def trending_projects(self, limit: int = 10) -> pd.DataFrame:
+        # При равном числе упоминаний проекты идут по алфавиту
+        counts = self.project_mentions.sort_values(ascending=False, kind='stable')
+        counts = counts.rename_axis('project').reset_index(name='mentions')
+        return counts.head(limit)
+
+    def trending_count(self, threshold: int = 3) -> int:
+        return int((self.project_mentions > threshold).sum())
+
+    def total_projects(self) -> int:
+        return len(self.project_mentions)
+
+
+# Агрегаты по каждому хранилищу процесса
+_rollups = FollowerRegistry(MessageRollups)
+
+
+def get_rollups(storage=None) -> MessageRollups:
+    """Up-to-date rollups for the given (or configured) storage"""
+    return _rollups.get(storage)
@@ -0,0 +1,53 @@
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    TEXT_DTYPE = pd.StringDtype('pyarrow')
+except ImportError:  # без pyarrow тексты хранятся обычными строками pandas
+    TEXT_DTYPE = pd.StringDtype()
+
+# Схема таблицы сообщений: повторяющиеся строки - категории, счётчики -
+# 32-битные целые с пропусками (в Telegram API они 32-битные), дата - UTC
+MESSAGE_SCHEMA = {
+    'channel': 'category',
+    'channel_id': 'category',
+    'date': 'datetime64[ns, UTC]',
+    'text': TEXT_DTYPE,
+    'project_name': 'category',
+    'price': 'float64',
+    'message_id': 'Int32',
+    'views': 'Int32',
+    'forwards': 'Int32',
+}
+
+MESSAGE_COLUMNS = list(MESSAGE_SCHEMA)
+
+
+def utc_dates(values: pd.Series) -> pd.Series:
+    """Dates as tz-aware UTC datetimes, without re-parsing columns that already are"""
+    if isinstance(values.dtype, pd.DatetimeTZDtype) and str(values.dtype.tz) == 'UTC':
+        return values
+    return pd.to_datetime(values, utc=True)
+
+
+def _cast(values: pd.Series, dtype) -> pd.Series:
+    if dtype == 'category':
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            return values
+        # Категории - строки, даже если в CSV значения выглядят как числа
+        return values.astype(TEXT_DTYPE).astype('category')
+    if str(dtype).startswith('datetime64'):
+        return pd.to_datetime(values, utc=True).astype(dtype)
+    if str(dtype) == 'Int32':
+        return pd.to_numeric(values, errors='coerce').round().astype(dtype)
+    return values.astype(dtype)
+
+
+def apply_schema(data: pd.DataFrame) -> pd.DataFrame:
+    """Cast the known message columns of ``data`` to the compact schema (in a copy)"""
+    data = data.copy()
+    for column, dtype in MESSAGE_SCHEMA.items():
+        if column in data.columns and data[column].dtype != dtype:
+            data[column] = _cast(data[column], dtype)
+    return data
+
@@ -0,0 +1,124 @@
+import json
+import re
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+LEXICON_FILE = 'sentiment_lexicon.json'
+
+# Простые ключевые слова для определения настроения
+POSITIVE_WORDS = [
+    'отличн', 'круто', 'супер', 'классн', 'amazing', 'great', 'awesome',
+    'крипто-луна', 'moon', 'pump', 'рост', 'выгодн', 'успешн', 'халяв',
+    'бесплатн', 'airdrop', 'giveaway', 'выигр', 'win', 'перспектив',
+    'потенциал', 'прибыль', 'доход', 'сильн', 'лучш', 'up'
+]
+
+NEGATIVE_WORDS = [
+    'плох', 'ужасн', 'bad', 'terrible', 'scam', 'скам', 'обман', 'развод',
+    'хуже', 'потер', 'dump', 'падени', 'упад', 'опасн', 'рискован', 'потер',
+    'ошибк', 'проблем', 'down', 'медвеж', 'bear'
+]
+
+POSITIVE = "Позитивное"
+NEGATIVE = "Негативное"
+NEUTRAL = "Нейтральное"
+
+
+class SentimentEngine:
+    """Keyword sentiment scoring with the whole lexicon compiled into one matcher
+
+    A message "contains" a keyword if the keyword occurs anywhere in its
+    lowercased text. A group of messages scores every keyword found in any of
+    them once; a keyword listed twice in a list counts twice.
+    """
+
+    def __init__(self, positive_words: Optional[Iterable[str]] = None,
+                 negative_words: Optional[Iterable[str]] = None):
+        self.positive_words = [w.lower() for w in (POSITIVE_WORDS if positive_words is None else positive_words)]
+        self.negative_words = [w.lower() for w in (NEGATIVE_WORDS if negative_words is None else negative_words)]
+
+        keywords = sorted(set(self.positive_words + self.negative_words), key=len, reverse=True)
+        self._weights = pd.DataFrame({
+            'positive': [self.positive_words.count(k) for k in keywords],
+            'negative': [self.negative_words.count(k) for k in keywords],
+        }, index=pd.Index(keywords, name='keyword'))
+
+        # Опережающая проверка находит самое длинное слово в каждой позиции текста,
+        # в том числе внутри или поверх других совпадений
+        self._pattern = re.compile('(?=(' + '|'.join(map(re.escape, keywords)) + '))') if keywords else None
+        # Слова лексикона, которые содержатся в найденном слове (например 'up' в 'pump')
+        self._contained = {k: [other for other in keywords if other in k] for k in keywords}
+
+    def message_keywords(self, texts: pd.Series) -> pd.DataFrame:
+        """Return unique (row label, keyword) hits for every message"""
+        if self._pattern is None:
+            return pd.DataFrame({'row': pd.Series(dtype=texts.index.dtype), 'keyword': pd.Series(dtype=object)})
+        found = texts.dropna().str.lower().str.findall(self._pattern).explode().dropna()
+        keywords = found.map(self._contained).explode()
+        hits = pd.DataFrame({'row': keywords.index, 'keyword': keywords.to_numpy(dtype=object)})
+        return hits.drop_duplicates().reset_index(drop=True)
+
+    @property
+    def keywords(self) -> List[str]:
+        return list(self._weights.index)
+
+    def indexed_keywords(self, texts: pd.Series, lookup) -> pd.DataFrame:
+        """Same hits as ``message_keywords``, with rows taken from a text index
+
+        ``lookup(keyword)`` returns the positions of the messages containing
+        the keyword, or None if the index cannot answer (e.g. the keyword
+        spans several words); such keywords are searched in ``texts``.
+        """
+        hits = []
+        lowered = None
+        for keyword in self.keywords:
+            rows = lookup(keyword)
+            if rows is None:
+                if lowered is None:
+                    lowered = texts.reset_index(drop=True).str.lower()
+                rows = np.flatnonzero(lowered.str.contains(keyword, regex=False, na=False).to_numpy())
+            hits.append(pd.DataFrame({'row': rows, 'keyword': keyword}))
+        if not hits:
+            return pd.DataFrame({'row': pd.Series(dtype='int64'), 'keyword': pd.Series(dtype=object)})
+        return pd.concat(hits, ignore_index=True).sort_values('row', kind='stable').reset_index(drop=True)
+
+    def score_groups(self, hits: pd.DataFrame, keys: pd.Series) -> pd.DataFrame:
+        """Positive/negative keyword counts per group of messages
+
+        ``hits`` comes from ``message_keywords``; ``keys`` maps row labels to
+        group keys (for example the project name of every message).
+        """
+        grouped = hits.assign(group=keys.reindex(hits['row']).to_numpy()).dropna(subset=['group'])
+        grouped = grouped.drop_duplicates(['group', 'keyword'])
+        weights = self._weights.reindex(grouped['keyword']).to_numpy()
+        scores = pd.DataFrame(weights, columns=['positive', 'negative'], index=grouped['group'])
+        return scores.groupby(level=0, sort=False).sum()
+
+    def label(self, positive_count, negative_count):
+        """Map keyword counts to a sentiment label (works on scalars and arrays)"""
+        labels = np.select(
+            [positive_count > negative_count * 1.5, negative_count > positive_count * 1.2],
+            [POSITIVE, NEGATIVE],
+            default=NEUTRAL
+        )
+        return labels.item() if labels.ndim == 0 else labels
+
+    def analyze(self, texts: pd.Series) -> str:
+        """Sentiment label for a set of messages taken together"""
+        hits = self.message_keywords(texts)
+        if hits.empty:
+            return NEUTRAL
+        counts = self._weights.loc[hits['keyword'].unique()].sum()
+        return self.label(counts['positive'], counts['negative'])
+
+
+def load_sentiment_engine(path: str = LEXICON_FILE) -> SentimentEngine:
+    """Build the engine from a JSON lexicon {"positive": [...], "negative": [...]}"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            lexicon = json.load(f)
+        return SentimentEngine(lexicon.get('positive'), lexicon.get('negative'))
+    except:
+        return SentimentEngine()
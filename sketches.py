@@ -0,0 +1,280 @@
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from data_analyzer import GIFT_PATTERN, GIFT_PATTERN_GENERAL, NFTAnalyzer
+from storage import FollowerRegistry, SeenMessages, StorageFollower
+
+SOURCE_COLUMNS = ['date', 'channel', 'project_name', 'text', 'channel_id', 'message_id']
+
+# Нечётные множители для независимых хэшей строк Count-Min
+_ROW_MULTIPLIERS = [0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9,
+                    0xD6E8FEB86659FD93, 0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53]
+# Сколько проектов запоминается для каждого отслеживаемого получателя подарков
+PROJECTS_PER_RECEIVER = 5
+
+
+def hash_values(values) -> np.ndarray:
+    """64-bit hashes of values (stable between runs and processes)"""
+    values = pd.Series(values).dropna().astype(str).to_numpy(dtype=object)
+    # Без факторизации: для почти уникальных значений (пользователи) она в разы медленнее
+    return pd.util.hash_array(values, categorize=False)
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    # frexp точен только до 2^53, поэтому старшие биты проверяются отдельно
+    high = (values >> np.uint64(11)).astype(np.float64)
+    low = (values & np.uint64(0x7FF)).astype(np.float64)
+    return np.where(high > 0, np.frexp(high)[1] + 11, np.frexp(low)[1])
+
+
+class HyperLogLog:
+    """Distinct count with relative error about 1.04 / sqrt(2 ** precision)
+
+    Memory is 2 ** precision bytes regardless of the number of values
+    (16 KB and ~0.8% error at the default precision).
+    """
+
+    def __init__(self, precision: int = 14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values) -> None:
+        self.add_hashes(hash_values(values))
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        if not len(hashes):
+            return
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - p)) - 1)
+        rank = ((64 - p) - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: 'HyperLogLog') -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Малые множества: линейный подсчёт по пустым регистрам точнее
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class CountMinSketch:
+    """Frequency estimates that never undercount
+
+    With ``width`` w and ``depth`` d an estimate exceeds the true count by at
+    most e / w of the total with probability 1 - exp(-d).
+    """
+
+    def __init__(self, width: int = 1 << 14, depth: int = 4):
+        self.width = width
+        self.depth = min(depth, len(_ROW_MULTIPLIERS))
+        self.table = np.zeros((self.depth, width), dtype=np.int64)
+        self.total = 0
+
+    def _columns(self, hashes: np.ndarray) -> np.ndarray:
+        with np.errstate(over='ignore'):
+            return np.stack([
+                ((hashes * np.uint64(multiplier)) >> np.uint64(32)) % np.uint64(self.width)
+                for multiplier in _ROW_MULTIPLIERS[:self.depth]
+            ]).astype(np.int64)
+
+    def add(self, values, counts=None) -> None:
+        values = pd.Series(values)
+        counts = np.ones(len(values), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        present = values.notna().to_numpy()
+        hashes = hash_values(values)
+        counts = counts[present]
+        columns = self._columns(hashes)
+        for row in range(self.depth):
+            np.add.at(self.table[row], columns[row], counts)
+        self.total += int(counts.sum())
+
+    def estimate(self, values) -> np.ndarray:
+        columns = self._columns(hash_values(values))
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0)
+
+
+class BloomFilter:
+    """Set membership in fixed memory, with false positives but no false negatives
+
+    With ``size`` bits, ``hashes`` hash functions and n added values the
+    false positive rate is about (1 - exp(-hashes * n / size)) ** hashes.
+    """
+
+    def __init__(self, size: int = 1 << 22, hashes: int = 4):
+        self.size = size
+        self.hashes = min(hashes, len(_ROW_MULTIPLIERS))
+        self.bits = np.zeros(size, dtype=bool)
+
+    def add_hashes(self, hashes: np.ndarray) -> np.ndarray:
+        """Add unique hashed values; returns the mask of values that were not present before"""
+        with np.errstate(over='ignore'):
+            positions = np.stack([
+                ((hashes * np.uint64(multiplier)) >> np.uint64(32)) % np.uint64(self.size)
+                for multiplier in _ROW_MULTIPLIERS[:self.hashes]
+            ]).astype(np.int64)
+        new = ~self.bits[positions].all(axis=0)
+        self.bits[positions[:, new].ravel()] = True
+        return new
+
+
+class SpaceSaving:
+    """Top-k heavy hitters in fixed memory (``capacity`` counters)
+
+    Batches are pre-aggregated and merged: a new item takes the place of the
+    smallest counter and inherits its count as error, so every estimate lies
+    in [count - error, count] and any item with more than total / capacity
+    occurrences is guaranteed to be kept.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.counters = pd.DataFrame({'count': pd.Series(dtype='int64'), 'error': pd.Series(dtype='int64')})
+        self.total = 0
+
+    def update(self, values) -> None:
+        counts = pd.Series(values).dropna().value_counts()
+        counts = counts[counts > 0]
+        if counts.empty:
+            return
+        self.total += int(counts.sum())
+
+        full = len(self.counters) >= self.capacity
+        floor = int(self.counters['count'].min()) if full else 0
+        known = counts.index.isin(self.counters.index)
+        merged = self.counters.copy()
+        merged.loc[counts.index[known], 'count'] += counts[known].to_numpy()
+        # Новые элементы могли встречаться раньше не более floor раз
+        new = pd.DataFrame({'count': counts[~known].to_numpy() + floor, 'error': floor},
+                           index=counts.index[~known])
+        merged = pd.concat([merged, new]) if not merged.empty else new
+        self.counters = merged.sort_values('count', ascending=False, kind='stable').head(self.capacity)
+
+    def top(self, k: int = 10) -> pd.DataFrame:
+        """Most frequent items with their estimated count and maximal overcount"""
+        return self.counters.head(k).rename_axis('item').reset_index()
+
+
+class MessageSketches(StorageFollower):
+    """Fixed-memory summaries of a storage for approximate analytics
+
+    Cardinalities (projects, channels, gift receivers) use HyperLogLog;
+    project and receiver frequencies use Count-Min and Space-Saving. Channels
+    per project are counted in one Count-Min sketch that is fed each
+    (project, channel) pair once, the first time a Bloom filter sees it.
+    Projects of gift receivers are kept only for the receivers tracked by
+    Space-Saving. The summaries grow neither with the number of messages nor
+    with the number of projects; only the IDs of counted messages, kept to
+    count every message once, take 4 bytes per message (``SeenMessages``).
+    """
+
+    source_columns = SOURCE_COLUMNS
+
+    def __init__(self, precision: int = 14, top_capacity: int = 256):
+        super().__init__()
+        self.precision = precision
+        self.top_capacity = top_capacity
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.projects = HyperLogLog(self.precision)
+            self.channels = HyperLogLog(self.precision)
+            self.project_channels = CountMinSketch()
+            self.project_channel_pairs = BloomFilter()
+            self.project_counts = CountMinSketch()
+            self.top_projects = SpaceSaving(self.top_capacity)
+            # Получатели из сообщений о победителях и из общих сообщений о подарках
+            self.winners = {'winners': SpaceSaving(self.top_capacity), 'general': SpaceSaving(self.top_capacity)}
+            self.receivers = {'winners': HyperLogLog(self.precision), 'general': HyperLogLog(self.precision)}
+            self.last_received: Dict[str, pd.Timestamp] = {}
+            self.receiver_projects: Dict[str, List[str]] = {}
+            self._seen = SeenMessages()
+
+    def observe_frame(self, data: pd.DataFrame) -> None:
+        """Add a batch of stored messages to the summaries"""
+        with self._lock:
+            data = data[self._seen.unseen(data)]
+            if data.empty:
+                return
+
+            if 'channel' in data.columns:
+                self.channels.add(data['channel'])
+            if 'project_name' in data.columns:
+                projects = data['project_name']
+                self.projects.add(projects)
+                self.project_counts.add(projects)
+                self.top_projects.update(projects)
+                if 'channel' in data.columns:
+                    pairs = data[['project_name', 'channel']].dropna().drop_duplicates()
+                    pairs = pairs.astype(str).reset_index(drop=True)
+                    new = self.project_channel_pairs.add_hashes(hash_values(pairs['project_name'] + '\x1f' + pairs['channel']))
+                    self.project_channels.add(pairs['project_name'][new])
+
+            if 'text' in data.columns:
+                for kind, pattern in (('winners', GIFT_PATTERN), ('general', GIFT_PATTERN_GENERAL)):
+                    gift_messages = data[data['text'].str.contains(pattern, na=False)].reset_index(drop=True)
+                    if gift_messages.empty:
+                        continue
+                    winners = NFTAnalyzer.find_winners(gift_messages['text'])
+                    self.winners[kind].update(winners['user'])
+                    self.receivers[kind].add(winners['user'])
+                    positions = winners['position'].to_numpy()
+                    if 'date' in gift_messages.columns:
+                        dates = gift_messages['date'].iloc[positions].to_numpy()
+                        latest = pd.Series(dates, index=winners['user'].to_numpy()).groupby(level=0).max()
+                        for user in latest.index.intersection(self.winners[kind].counters.index):
+                            previous = self.last_received.get(user)
+                            if previous is None or latest[user] > previous:
+                                self.last_received[user] = latest[user]
+                    if 'project_name' in gift_messages.columns:
+                        projects = gift_messages['project_name'].astype(object)
+                        projects = projects.where(projects.notna(), "Неизвестно").iloc[positions].to_numpy()
+                    else:
+                        projects = np.full(len(winners), "Неизвестно", dtype=object)
+                    tracked = self.winners[kind].counters.index
+                    received = pd.DataFrame({'user': winners['user'].to_numpy(), 'project': projects})
+                    received = received[received['user'].isin(tracked)].drop_duplicates()
+                    for user, project in received.itertuples(index=False):
+                        user_projects = self.receiver_projects.setdefault(user, [])
+                        if project not in user_projects and len(user_projects) < PROJECTS_PER_RECEIVER:
+                            user_projects.append(project)
+                # Даты и проекты храним только для отслеживаемых получателей
+                tracked = set(self.winners['winners'].counters.index) | set(self.winners['general'].counters.index)
+                self.last_received = {user: day for user, day in self.last_received.items() if user in tracked}
+                self.receiver_projects = {user: projects for user, projects in self.receiver_projects.items()
+                                          if user in tracked}
+
+    def total_projects(self) -> int:
+        return self.projects.count()
+
+    def project_channel_count(self, project: str) -> int:
+        return int(self.project_channels.estimate([project])[0])
+
+    def gift_givers(self, limit: int = 20) -> pd.DataFrame:
+        """Approximate top gift receivers, same columns as ``NFTAnalyzer.get_gift_givers``"""
+        # Как и в точном расчёте: общие сообщения о подарках, только если нет сообщений о победителях
+        summary = self.winners['winners'] if self.winners['winners'].total else self.winners['general']
+        top = summary.top(limit)
+        return pd.DataFrame({
+            'Пользователь': top['item'],
+            'Получено подарков': top['count'],
+            'Проекты': [', '.join(self.receiver_projects.get(user, [])) or None for user in top['item']],
+            'Последнее получение': [self.last_received.get(user) for user in top['item']]
+        })
+
+
+_sketches = FollowerRegistry(MessageSketches)
+
+
+def get_sketches(storage=None) -> MessageSketches:
+    """Up-to-date sketches for the given (or configured) storage"""
+    return _sketches.get(storage)
@@ -0,0 +1,496 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from projects import canonical_project_name
+from schema import apply_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow не установлен - доступно только CSV-хранилище
+    pa = ds = pq = None
+
+CSV_FILE = 'nft_data.csv'
+STORE_DIR = 'nft_store'
+
+# Схема Parquet-сегментов: строки без словарей, чтобы сегменты с разными наборами
+# категорий (и старые сегменты без части колонок) читались одним набором данных
+SEGMENT_SCHEMA = pa.schema([
+    ('channel', pa.string()),
+    ('channel_id', pa.string()),
+    ('message_id', pa.int32()),
+    ('date', pa.timestamp('ns', tz='UTC')),
+    ('text', pa.large_string()),
+    ('project_name', pa.string()),
+    ('price', pa.float64()),
+    ('views', pa.int32()),
+    ('forwards', pa.int32()),
+]) if pa is not None else None
+
+# Наблюдатели изменений хранилища: observer(storage, data, previous_fingerprint).
+# data - добавленные сообщения или None, если содержимое заменено целиком
+_observers = []
+
+
+def add_observer(observer) -> None:
+    """Call ``observer`` after every change of any storage"""
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def remove_observer(observer) -> None:
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def _previous_fingerprint(storage) -> Optional[Tuple]:
+    # Отпечаток до изменения нужен наблюдателям, только если они есть
+    return storage.fingerprint() if _observers else None
+
+
+def _notify(storage, data: Optional[pd.DataFrame], previous: Optional[Tuple]) -> None:
+    for observer in list(_observers):
+        try:
+            observer(storage, data, previous)
+        except Exception as e:
+            print(f"Ошибка обработчика изменений хранилища: {str(e)}")
+
+
+def normalize_types(data: pd.DataFrame) -> pd.DataFrame:
+    """Cast known message columns to their storage types (the message schema)
+
+    Project names are brought to their canonical form as well, so messages
+    stored before canonicalisation (or imported from old CSV files) group
+    under the same project as newly extracted ones.
+    """
+    return canonical_projects(apply_schema(data))
+
+
+def canonical_projects(data: pd.DataFrame) -> pd.DataFrame:
+    """Replace project names with their canonical names (in place, returns ``data``)"""
+    if 'project_name' not in data.columns:
+        return data
+    projects = data['project_name']
+    if not isinstance(projects.dtype, pd.CategoricalDtype):
+        data['project_name'] = projects.map(canonical_project_name, na_action='ignore')
+        return data
+    # Имена приводятся по категориям: их намного меньше, чем сообщений
+    categories = projects.cat.categories
+    canonical = [canonical_project_name(name) for name in categories]
+    if canonical == list(categories):
+        return data
+    mapping, names = pd.factorize(pd.Index(canonical, dtype=categories.dtype))
+    codes = projects.cat.codes.to_numpy()
+    data['project_name'] = pd.Categorical.from_codes(np.where(codes >= 0, mapping[codes], -1), categories=names)
+    return data
+
+
+def drop_duplicate_messages(data: pd.DataFrame) -> pd.DataFrame:
+    """Keep only the latest copy of every (channel_id, message_id) pair"""
+    if 'message_id' not in data.columns or 'channel_id' not in data.columns:
+        return data
+    duplicated = data.duplicated(subset=['channel_id', 'message_id'], keep='last')
+    return data[~(duplicated & data['message_id'].notna())].reset_index(drop=True)
+
+
+class SeenMessages:
+    """IDs of the messages a follower has already counted, per channel
+
+    Unlike a high-water mark this also lets through messages older than
+    anything counted so far (a backfill of an earlier date range, a late
+    edit of a message that was never stored), while re-saved copies of
+    counted messages are still skipped. IDs are kept as sorted 32-bit
+    arrays, 4 bytes per counted message.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, np.ndarray] = {}
+
+    def unseen(self, data: pd.DataFrame) -> pd.Series:
+        """Mask of messages not counted yet (each ID once), remembering them as counted"""
+        if 'message_id' not in data.columns or 'channel_id' not in data.columns:
+            return pd.Series(True, index=data.index)
+        message_ids = pd.to_numeric(data['message_id'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        unseen = np.isnan(message_ids)
+        positions = np.flatnonzero(~unseen)
+        channels = data['channel_id'].astype(str).to_numpy()[positions]
+        for channel, local in pd.Series(channels).groupby(channels).indices.items():
+            ids = message_ids[positions[local]].astype(np.int32)
+            seen = self._ids.get(channel, np.zeros(0, dtype=np.int32))
+            new_ids, first = np.unique(ids, return_index=True)
+            new = ~np.isin(new_ids, seen, assume_unique=True)
+            unseen[positions[local[first[new]]]] = True
+            if new.any():
+                self._ids[channel] = np.union1d(seen, new_ids[new]).astype(np.int32)
+        return pd.Series(unseen, index=data.index)
+
+
+def _filter_dates(data: pd.DataFrame, start_date: Optional[date], end_date: Optional[date]) -> pd.DataFrame:
+    if 'date' not in data.columns or (start_date is None and end_date is None):
+        return data
+    days = data['date'].dt.date
+    mask = pd.Series(True, index=data.index)
+    if start_date is not None:
+        mask &= days >= start_date
+    if end_date is not None:
+        mask &= days <= end_date
+    return data[mask]
+
+
+class CSVStorage:
+    """Single CSV file storage, compatible with the original nft_data.csv"""
+
+    def __init__(self, path: str = CSV_FILE):
+        self.path = path
+
+    def write(self, data: pd.DataFrame) -> None:
+        """Replace the stored dataset"""
+        previous = _previous_fingerprint(self)
+        data.to_csv(self.path, index=False)
+        _notify(self, None, previous)
+
+    def clear(self) -> None:
+        """Remove all stored messages"""
+        previous = _previous_fingerprint(self)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        _notify(self, None, previous)
+
+    def append(self, data: pd.DataFrame) -> None:
+        """Append new messages to the file; duplicates are resolved on read"""
+        if data is None or data.empty:
+            return
+        previous = _previous_fingerprint(self)
+        data = normalize_types(data)
+        try:
+            header = list(pd.read_csv(self.path, nrows=0).columns)
+        except Exception:
+            header = None
+        if header is None:
+            data.to_csv(self.path, index=False)
+        elif set(data.columns) <= set(header):
+            # Дописываем строки в конец файла в порядке его колонок
+            data.reindex(columns=header).to_csv(self.path, mode='a', header=False, index=False)
+        else:
+            # Новые колонки - файл приходится переписать один раз с расширенным заголовком
+            pd.concat([self.read(), data], ignore_index=True).to_csv(self.path, index=False)
+        _notify(self, data, previous)
+
+    def staging(self) -> 'CSVStorage':
+        """Empty storage next to this one, to be filled and swapped in with ``replace``"""
+        directory, name = os.path.split(os.path.abspath(self.path))
+        fd, path = tempfile.mkstemp(prefix=f'{name}.staging-', suffix='.csv', dir=directory)
+        os.close(fd)
+        os.remove(path)
+        return CSVStorage(path)
+
+    def replace(self, staging: 'CSVStorage') -> None:
+        """Replace the stored dataset with the contents of a staging storage"""
+        previous = _previous_fingerprint(self)
+        os.replace(staging.path, self.path)
+        _notify(self, None, previous)
+
+    def discard(self) -> None:
+        """Remove a staging storage that was not swapped in"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def fingerprint(self) -> Tuple:
+        """Cheap dataset version: changes whenever the file is rewritten"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return (self.path, None)
+        return (self.path, stat.st_mtime_ns, stat.st_size)
+
+    def read(self, columns: Optional[List[str]] = None,
+             start_date: Optional[date] = None, end_date: Optional[date] = None,
+             with_project: bool = False) -> Optional[pd.DataFrame]:
+        """Load the stored dataset, optionally restricted to columns and a date range
+
+        With ``with_project=True`` only messages with a project name are returned.
+        """
+        try:
+            usecols = None
+            if columns is not None:
+                wanted = set(columns) | {'date', 'channel_id', 'message_id'}
+                if with_project:
+                    wanted.add('project_name')
+                usecols = lambda column: column in wanted
+            data = pd.read_csv(self.path, usecols=usecols)
+        except Exception:
+            return None
+        # Повторно скачанные сообщения дописываются в конец файла: остаётся последняя копия
+        data = normalize_types(drop_duplicate_messages(data))
+        if with_project:
+            data = data[data['project_name'].notna()] if 'project_name' in data.columns else data.iloc[:0]
+        data = _filter_dates(data, start_date, end_date)
+        if columns is not None:
+            data = data[[column for column in columns if column in data.columns]]
+        return data.reset_index(drop=True)
+
+
+class ParquetStorage:
+    """Columnar storage: typed Parquet segments partitioned by day
+
+    Layout: ``<root>/<YYYY-MM-DD>/<sequence>.parquet``, channel is a column.
+    Every append adds at most one segment per day it touches; duplicates
+    (re-fetched or edited messages) are resolved on read in favour of the
+    newest segment. The selected partitions are read as one dataset in a
+    single scan. Columns outside ``SEGMENT_SCHEMA`` are not stored.
+    """
+
+    def __init__(self, root: str = STORE_DIR, legacy_csv: Optional[str] = CSV_FILE):
+        if pq is None:
+            raise ImportError("Для ParquetStorage требуется пакет pyarrow")
+        self.root = root
+        self.legacy_csv = legacy_csv
+
+    def write(self, data: pd.DataFrame) -> None:
+        """Replace the stored dataset"""
+        self.clear()
+        self.append(data)
+
+    def clear(self) -> None:
+        """Remove all stored messages"""
+        previous = _previous_fingerprint(self)
+        if os.path.isdir(self.root):
+            shutil.rmtree(self.root)
+        # Пустой каталог означает пустое хранилище (без повторного импорта CSV)
+        os.makedirs(self.root, exist_ok=True)
+        _notify(self, None, previous)
+
+    def append(self, data: pd.DataFrame) -> None:
+        """Add new messages as new segments"""
+        if data is None or data.empty:
+            return
+        previous = _previous_fingerprint(self)
+        data = normalize_types(data)
+        days = data['date'].dt.strftime('%Y-%m-%d').fillna('unknown')
+        sequence = time.time_ns()
+        for day, segment in data.groupby(days, sort=False):
+            self._write_segment(segment, os.path.join(self.root, day, f"{sequence:020d}.parquet"))
+        _notify(self, data, previous)
+
+    @staticmethod
+    def _write_segment(data: pd.DataFrame, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        columns = data.reindex(columns=SEGMENT_SCHEMA.names)
+        pq.write_table(pa.Table.from_pandas(columns, schema=SEGMENT_SCHEMA, preserve_index=False), path)
+
+    def staging(self) -> 'ParquetStorage':
+        """Empty storage next to this one, to be filled and swapped in with ``replace``"""
+        directory, name = os.path.split(os.path.abspath(self.root))
+        return ParquetStorage(tempfile.mkdtemp(prefix=f'{name}.staging-', dir=directory), legacy_csv=None)
+
+    def replace(self, staging: 'ParquetStorage') -> None:
+        """Replace the stored dataset with the contents of a staging storage"""
+        previous = _previous_fingerprint(self)
+        # Старые данные удаляются только после того, как новые заняли их место
+        old = None
+        if os.path.isdir(self.root):
+            old = tempfile.mkdtemp(prefix=f'{os.path.basename(self.root)}.old-',
+                                   dir=os.path.dirname(os.path.abspath(self.root)))
+            os.rmdir(old)
+            os.rename(self.root, old)
+        os.rename(staging.root, self.root)
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+        _notify(self, None, previous)
+
+    def discard(self) -> None:
+        """Remove a staging storage that was not swapped in"""
+        if os.path.isdir(self.root):
+            shutil.rmtree(self.root)
+
+    def compact(self) -> None:
+        """Merge the segments of every day partition into a single file"""
+        previous = _previous_fingerprint(self)
+        for day in self._partitions():
+            directory = os.path.join(self.root, day)
+            files = self._segments(day)
+            if len(files) < 2:
+                continue
+            data = drop_duplicate_messages(self._scan(files))
+            self._write_segment(data, os.path.join(directory, f"{time.time_ns():020d}-compacted.parquet"))
+            for f in files:
+                os.remove(f)
+        # Содержимое не меняется, наблюдателям достаточно нового отпечатка
+        _notify(self, pd.DataFrame(), previous)
+
+    def fingerprint(self) -> Tuple:
+        """Cheap dataset version: segment names, sizes and modification times"""
+        if not os.path.isdir(self.root):
+            return CSVStorage(self.legacy_csv).fingerprint() if self.legacy_csv else (self.root, None)
+        segments = []
+        for day in self._partitions():
+            for path in self._segments(day):
+                stat = os.stat(path)
+                segments.append((path, stat.st_mtime_ns, stat.st_size))
+        return (self.root, len(segments), hash(tuple(segments)))
+
+    def read(self, columns: Optional[List[str]] = None,
+             start_date: Optional[date] = None, end_date: Optional[date] = None,
+             with_project: bool = False) -> Optional[pd.DataFrame]:
+        """Load only the requested columns from the requested day partitions
+
+        With ``with_project=True`` only messages with a project name are
+        returned, and the other columns are read only for those rows.
+        """
+        if not os.path.isdir(self.root):
+            if not self._import_legacy_csv():
+                return None
+
+        files = []
+        for day in self._partitions():
+            if day != 'unknown':
+                day_date = date.fromisoformat(day)
+                if start_date is not None and day_date < start_date:
+                    continue
+                if end_date is not None and day_date > end_date:
+                    continue
+            files.extend(self._segments(day))
+        if not files:
+            return None
+
+        wanted = None
+        if columns is not None:
+            # Ключи нужны для удаления дубликатов
+            wanted = list(dict.fromkeys(list(columns) + ['channel_id', 'message_id']))
+        data = normalize_types(drop_duplicate_messages(self._scan(files, wanted, with_project)))
+        if columns is not None:
+            data = data[[column for column in columns if column in data.columns]]
+        return data
+
+    @staticmethod
+    def _scan(files: List[str], columns: Optional[List[str]] = None,
+              with_project: bool = False) -> pd.DataFrame:
+        """Read segments as one dataset, rows in the order of ``files``"""
+        if columns is not None:
+            columns = [column for column in columns if column in SEGMENT_SCHEMA.names]
+        dataset = ds.dataset(files, schema=SEGMENT_SCHEMA, format='parquet')
+        if not with_project:
+            return dataset.to_table(columns=columns).to_pandas()
+        # Правка может убрать проект из сообщения, поэтому последние копии находятся
+        # по ключам всех строк, а полные строки читаются только для сообщений с проектом
+        keys = dataset.to_table(columns=['channel_id', 'message_id', 'project_name']).to_pandas()
+        keys['row'] = np.arange(len(keys))
+        latest = np.zeros(len(keys), dtype=bool)
+        latest[drop_duplicate_messages(keys)['row'].to_numpy()] = True
+        named = keys['project_name'].notna().to_numpy()
+        data = dataset.to_table(columns=columns, filter=ds.field('project_name').is_valid()).to_pandas()
+        return data[latest[named]].reset_index(drop=True)
+
+    def _import_legacy_csv(self) -> bool:
+        # Первый запуск: переносим данные из старого nft_data.csv
+        if self.legacy_csv and os.path.exists(self.legacy_csv):
+            data = CSVStorage(self.legacy_csv).read()
+            if data is not None:
+                self.write(data)
+                return True
+        return False
+
+    def _partitions(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def _segments(self, day: str) -> List[str]:
+        directory = os.path.join(self.root, day)
+        return [os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.endswith('.parquet')]
+
+
+def storage_key(storage) -> Tuple:
+    """Identity of a storage location (one per backend and path)"""
+    return (type(storage).__name__, getattr(storage, 'root', None) or getattr(storage, 'path', None))
+
+
+class StorageFollower(ABC):
+    """In-memory aggregate kept in step with a storage through its observers
+
+    Subclasses implement ``reset`` and ``observe_frame`` and list the columns
+    they need in ``source_columns``. Appends are observed incrementally; any
+    other change (including one made by another process) makes the follower
+    rebuild from the storage on the next ``ensure``.
+    """
+
+    source_columns: Optional[List[str]] = None
+
+    def __init__(self):
+        self.fingerprint: Optional[Tuple] = None
+        self._lock = threading.RLock()
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Forget everything observed so far"""
+
+    @abstractmethod
+    def observe_frame(self, data: pd.DataFrame) -> None:
+        """Add a batch of stored messages"""
+
+    def ensure(self, storage) -> 'StorageFollower':
+        """Rebuild from storage unless the follower already describes its current contents"""
+        with self._lock:
+            if self.fingerprint is None or self.fingerprint != storage.fingerprint():
+                self.reset()
+                fingerprint = storage.fingerprint()
+                data = storage.read(columns=self.source_columns)
+                if data is not None and not data.empty:
+                    self.observe_frame(data)
+                self.fingerprint = fingerprint
+        return self
+
+    def on_storage_change(self, storage, data: Optional[pd.DataFrame], previous: Optional[Tuple]) -> None:
+        """Storage observer: add appended messages, or mark the follower stale"""
+        with self._lock:
+            if data is None or self.fingerprint is None or self.fingerprint != previous:
+                # Содержимое заменено или изменено без нас - пересчёт при следующем запросе
+                self.fingerprint = None
+                return
+            if not data.empty:
+                self.observe_frame(data)
+            self.fingerprint = storage.fingerprint()
+
+
+class FollowerRegistry:
+    """One follower of a kind per storage location, updated by the storage observers"""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._followers = {}
+        self._lock = threading.Lock()
+        add_observer(self._on_storage_change)
+
+    def get(self, storage=None) -> StorageFollower:
+        """Up-to-date follower for the given (or configured) storage"""
+        storage = storage or get_storage()
+        key = storage_key(storage)
+        with self._lock:
+            follower = self._followers.get(key)
+            if follower is None:
+                follower = self._followers[key] = self.factory()
+        return follower.ensure(storage)
+
+    def _on_storage_change(self, storage, data, previous) -> None:
+        # Обновляем только те агрегаты, которые уже используются в этом процессе
+        follower = self._followers.get(storage_key(storage))
+        if follower is not None:
+            follower.on_storage_change(storage, data, previous)
+
+
+def get_storage():
+    """Return the configured storage backend (NFT_STORAGE=parquet|csv)"""
+    backend = os.environ.get('NFT_STORAGE', 'parquet' if pq is not None else 'csv')
+    if backend == 'parquet':
+        return ParquetStorage()
+    return CSVStorage()
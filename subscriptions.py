@@ -0,0 +1,221 @@
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+from telethon import functions, types, utils
+
+SUBSCRIPTIONS_FILE = 'subscriptions.json'
+# Раз в сутки список всё равно перечитывается полностью
+FULL_REFRESH_INTERVAL = 24 * 3600
+# Служебные сообщения о вступлении в чат или выходе из него
+MEMBERSHIP_ACTIONS = (
+    types.MessageActionChatAddUser, types.MessageActionChatDeleteUser, types.MessageActionChatJoinedByLink,
+    types.MessageActionChatJoinedByRequest, types.MessageActionChatCreate, types.MessageActionChannelCreate,
+)
+
+
+def chat_info(entity) -> Dict:
+    """Sidebar record for a channel or group entity"""
+    return {
+        'id': utils.get_peer_id(entity),
+        'title': entity.title,
+        'username': entity.username if hasattr(entity, 'username') else None,
+        'participants_count': entity.participants_count if hasattr(entity, 'participants_count') else 0,
+        'description': entity.about if hasattr(entity, 'about') else '',
+        'type': 'channel' if isinstance(entity, types.Channel) else 'group',
+        'is_private': not hasattr(entity, 'username')
+    }
+
+
+class TitleIndex:
+    """Trigram index over chat titles for instant case-insensitive substring filtering"""
+
+    def __init__(self, titles: List[str]):
+        self._titles = [(title or '').lower() for title in titles]
+        self._trigrams: Dict[str, Set[int]] = defaultdict(set)
+        for position, title in enumerate(self._titles):
+            for i in range(len(title) - 2):
+                self._trigrams[title[i:i + 3]].add(position)
+
+    def search(self, query: str) -> List[int]:
+        """Positions of titles containing ``query``, in original order"""
+        query = query.lower()
+        if len(query) < 3:
+            return [i for i, title in enumerate(self._titles) if query in title]
+
+        candidates = None
+        for i in range(len(query) - 2):
+            positions = self._trigrams.get(query[i:i + 3])
+            if not positions:
+                return []
+            candidates = set(positions) if candidates is None else candidates & positions
+        # Совпадение всех триграмм ещё не гарантирует вхождение подстроки
+        return sorted(i for i in candidates if query in self._titles[i])
+
+
+class SubscriptionStore:
+    """Locally persisted list of the user's channels and groups
+
+    The first refresh reads every dialog; later refreshes ask Telegram only
+    for updates since the saved update state (pts/qts/date) and apply joined
+    and left chats to the stored list. Filtering by name uses an in-memory
+    index and needs no requests at all.
+    """
+
+    def __init__(self, path: str = SUBSCRIPTIONS_FILE, full_refresh_interval: float = FULL_REFRESH_INTERVAL):
+        self.path = path
+        self.full_refresh_interval = full_refresh_interval
+        self._channels: Optional[Dict[int, Dict]] = None
+        self._state: Optional[Dict] = None
+        self._full_refresh_at = 0.0
+        self._index: Optional[TitleIndex] = None
+        self._index_ids: List[int] = []
+
+    @property
+    def channels(self) -> Dict[int, Dict]:
+        if self._channels is None:
+            self._load()
+        return self._channels
+
+    def _load(self) -> None:
+        self._channels = {}
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            self._channels = {channel['id']: channel for channel in saved['channels']}
+            self._state = saved.get('state')
+            self._full_refresh_at = saved.get('full_refresh_at', 0.0)
+        except Exception as e:
+            print(f"Ошибка чтения списка подписок: {str(e)}")
+
+    def save(self) -> None:
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'channels': list(self.channels.values()),
+                    'state': self._state,
+                    'full_refresh_at': self._full_refresh_at
+                }, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Ошибка сохранения списка подписок: {str(e)}")
+
+    def clear(self) -> None:
+        self._channels = {}
+        self._state = None
+        self._full_refresh_at = 0.0
+        self._index = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def filter(self, name_filter: Optional[str] = None) -> List[Dict]:
+        """Stored channels whose title contains ``name_filter`` (all if empty)"""
+        channels = self.channels
+        if not name_filter:
+            return list(channels.values())
+        if self._index is None:
+            self._index_ids = list(channels)
+            self._index = TitleIndex([channels[chat_id]['title'] for chat_id in self._index_ids])
+        return [channels[self._index_ids[i]] for i in self._index.search(name_filter)]
+
+    async def refresh(self, client, entity_cache=None) -> None:
+        """Bring the stored list up to date, incrementally when possible"""
+        if self._channels is None:
+            self._load()
+        full = (self._state is None
+                or time.time() - self._full_refresh_at > self.full_refresh_interval)
+        if not full:
+            try:
+                full = not await self._apply_difference(client, entity_cache)
+            except Exception as e:
+                print(f"Не удалось получить изменения подписок, полное обновление: {str(e)}")
+                full = True
+        if full:
+            await self._full_refresh(client, entity_cache)
+        self._index = None
+        self.save()
+        if entity_cache is not None:
+            entity_cache.save()
+
+    async def _full_refresh(self, client, entity_cache=None) -> None:
+        # Состояние берётся до чтения диалогов, чтобы не потерять изменения между ними
+        state = await client(functions.updates.GetStateRequest())
+        channels = {}
+        entities = []
+        async for dialog in client.iter_dialogs():
+            if dialog.is_channel or dialog.is_group:
+                # Проверяем, есть ли этот чат уже в списке
+                if dialog.id in channels:
+                    continue
+                entities.append(dialog.entity)
+                channels[dialog.id] = chat_info(dialog.entity)
+
+        if entity_cache is not None:
+            entity_cache.put_many(entities)
+        self._channels = channels
+        self._state = {'pts': state.pts, 'qts': state.qts, 'date': state.date.timestamp()}
+        self._full_refresh_at = time.time()
+
+    async def _apply_difference(self, client, entity_cache=None) -> bool:
+        """Apply joined/left chats since the saved state; False if a full refresh is needed"""
+        while True:
+            difference = await client(functions.updates.GetDifferenceRequest(
+                pts=self._state['pts'],
+                date=datetime.fromtimestamp(self._state['date'], tz=timezone.utc),
+                qts=self._state['qts']
+            ))
+            if isinstance(difference, types.updates.DifferenceTooLong):
+                return False
+            if isinstance(difference, types.updates.DifferenceEmpty):
+                self._state['date'] = difference.date.timestamp()
+                return True
+
+            # В difference.chats есть все упомянутые в обновлениях чаты (например, источники
+            # пересылок), поэтому подписки меняются только для чатов из обновлений участия
+            changed = self._membership_changes(difference)
+            for chat in difference.chats:
+                if utils.get_peer_id(chat) in changed or isinstance(chat, (types.ChatForbidden, types.ChannelForbidden)):
+                    self._apply_chat(chat)
+            if entity_cache is not None:
+                entity_cache.put_many(difference.chats)
+
+            state = (difference.intermediate_state
+                     if isinstance(difference, types.updates.DifferenceSlice) else difference.state)
+            self._state = {'pts': state.pts, 'qts': state.qts, 'date': state.date.timestamp()}
+            if isinstance(difference, types.updates.Difference):
+                return True
+
+    @staticmethod
+    def _membership_changes(difference) -> Set[int]:
+        """Peer IDs of the chats the user joined or left according to the updates"""
+        peers = set()
+        for update in difference.other_updates:
+            if isinstance(update, (types.UpdateChannel, types.UpdateChannelParticipant)):
+                peers.add(utils.get_peer_id(types.PeerChannel(update.channel_id)))
+            elif isinstance(update, (types.UpdateChatParticipantAdd, types.UpdateChatParticipantDelete)):
+                peers.add(utils.get_peer_id(types.PeerChat(update.chat_id)))
+            elif isinstance(update, types.UpdateChatParticipants):
+                peers.add(utils.get_peer_id(types.PeerChat(update.participants.chat_id)))
+        for message in difference.new_messages:
+            if isinstance(message, types.MessageService) and isinstance(message.action, MEMBERSHIP_ACTIONS):
+                peers.add(utils.get_peer_id(message.peer_id))
+        return peers
+
+    def _apply_chat(self, chat) -> None:
+        chat_id = utils.get_peer_id(chat)
+        if isinstance(chat, (types.ChatForbidden, types.ChannelForbidden)):
+            self.channels.pop(chat_id, None)
+        elif getattr(chat, 'min', False):
+            # Неполный объект без флага участия: по нему подписку не определить
+            return
+        elif isinstance(chat, (types.Channel, types.Chat)):
+            if chat.left or getattr(chat, 'deactivated', False):
+                self.channels.pop(chat_id, None)
+            else:
+                self.channels[chat_id] = chat_info(chat)
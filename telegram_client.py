@@ -0,0 +1,114 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Coroutine, Optional
+
+if TYPE_CHECKING:
+    from telethon import TelegramClient
+
+SESSION_NAME = 'nft_analyzer_session'
+# Ключи приложения Telegram (https://my.telegram.org), общие для всего процесса;
+# свои ключи задаются переменными окружения TELEGRAM_API_ID и TELEGRAM_API_HASH
+API_ID = os.environ.get('TELEGRAM_API_ID', '27578030')
+API_HASH = os.environ.get('TELEGRAM_API_HASH', '41174379fa369fe72db4d97fcbe3d1c6')
+
+
+class TelegramClientManager:
+    """One Telegram client per process, living on a dedicated event loop thread
+
+    Telethon clients are bound to the loop they were connected on, so every
+    coroutine that touches the client is submitted to this loop with ``run``
+    (blocking) or ``submit`` (fire and forget). The connection and the SQLite
+    session stay open between Streamlit reruns and button clicks.
+    """
+
+    def __init__(self, session: str = SESSION_NAME, api_id: str = API_ID, api_hash: str = API_HASH):
+        self.session = session
+        self.api_id = api_id
+        self.api_hash = api_hash
+        self.client: Optional['TelegramClient'] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._client_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Background event loop, started on first use"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._client_lock = None
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name='telegram-loop', daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule a coroutine on the background loop without waiting for it"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None):
+        """Run a coroutine on the background loop and wait for its result"""
+        if self._loop is not None and threading.current_thread() is self._thread:
+            raise RuntimeError("run() нельзя вызывать из цикла событий Telegram, используйте await")
+        return self.submit(coro).result(timeout)
+
+    async def get_client(self) -> 'TelegramClient':
+        """Return the shared connected client, creating it on first use"""
+        # Telethon импортируется только при первом обращении к Telegram
+        from telethon import TelegramClient
+
+        if asyncio.get_running_loop() is not self._loop:
+            raise RuntimeError("Клиент Telegram доступен только в фоновом цикле, используйте run()/submit()")
+        if not self.api_id or not self.api_hash:
+            raise RuntimeError("API ключи Telegram отсутствуют: задайте TELEGRAM_API_ID и TELEGRAM_API_HASH")
+        if self._client_lock is None:
+            self._client_lock = asyncio.Lock()
+
+        async with self._client_lock:
+            if self.client is None:
+                client = TelegramClient(
+                    self.session,
+                    api_id=int(self.api_id),
+                    api_hash=self.api_hash,
+                    device_model="NFT Analyzer",
+                    system_version="1.0",
+                    app_version="1.0",
+                    lang_code="ru"
+                )
+                await client.connect()
+                print("Соединение с Telegram API установлено успешно")
+                if not await client.is_user_authorized():
+                    print("Пользователь не авторизован, необходимо пройти авторизацию через интерфейс приложения")
+                else:
+                    print("Пользователь авторизован")
+                self.client = client
+            elif not self.client.is_connected():
+                await self.client.connect()
+        return self.client
+
+    def shutdown(self) -> None:
+        """Disconnect the client and stop the background loop"""
+        if self._loop is None or self._loop.is_closed():
+            return
+        if self.client is not None:
+            try:
+                self.run(self.client.disconnect(), timeout=10)
+            except Exception as e:
+                print(f"Ошибка при отключении от Telegram: {str(e)}")
+            self.client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+        self._loop.close()
+
+
+# Общий клиент процесса для интерфейса, авторизации и сборщика данных
+client_manager = TelegramClientManager()
+
+
+def run_sync(coro: Coroutine, timeout: Optional[float] = None):
+    """Run a Telegram coroutine on the shared client loop and return its result"""
+    return client_manager.run(coro, timeout)
@@ -1,54 +1,53 @@
-from telethon import TelegramClient, functions, types, errors
+from telethon import events, functions, types, errors, utils
 import pandas as pd
-from datetime import datetime
 import os
+import json
 import asyncio
-from typing import List, Dict, Set
-import re
+import weakref
+from typing import List, Dict, Set, Tuple
+from collections import deque
+
+from entity_cache import entity_cache
+from extraction import create_process_pool, extract_nft_info, extract_records
+from rate_limit import AdaptiveTokenBucket, TokenBucket
+from schema import apply_schema
+from storage import get_storage
+from subscriptions import SubscriptionStore
+from telegram_client import client_manager, run_sync
+from utils import load_fetch_state, save_fetch_state
+
+LEAVE_STATE_FILE = 'leave_state.json'
 
 class TelegramParser:
     def __init__(self):
-        # API ключи встроены напрямую в код
-        # Замените эти значения на свои реальные ключи
-        self.api_id = "12345678"  # Введите сюда ваш API ID от Telegram
-        self.api_hash = "abcdef0123456789abcdef0123456789"  # Введите сюда ваш API Hash от Telegram
+        # API ключи задаются один раз для всего процесса в telegram_client.py
         self.client = None
+        # Параметры параллельной загрузки каналов
+        self.message_limit = 1000
+        self.max_concurrency = 8
+        self.flood_wait_retries = 3
+        # Извлечение NFT-информации в пуле процессов для больших пачек сообщений;
+        # по умолчанию в текущем процессе, пул включает сборщик (collector.py --extraction-workers)
+        self.extraction_workers = 1
+        self.parallel_extraction_threshold = 500
+        self._extraction_pool = None
+        self._extraction_pool_finalizer = None
+        self.leave_max_rate = 20
+        # Кэш сущностей избавляет от повторного разрешения username
+        self.entity_cache = entity_cache
+        # Список подписок хранится локально и обновляется по изменениям
+        self.subscriptions = SubscriptionStore()
+        # Фоновая очередь присоединения к найденным чатам
+        self.join_queue = JoinQueue(self)
+        # Приём новых сообщений в реальном времени через обработчики обновлений
+        self.live = LiveIngestor(self)
 
     async def _connect(self):
-        """Initialize Telegram client connection"""
+        """Get the shared Telegram client connection"""
         if not self.client:
-            # Проверка наличия API ключей
-            if not self.api_id or not self.api_hash:
-                print("Ошибка: API ключи Telegram отсутствуют!")
-                print(f"API ID присутствует: {'Да' if self.api_id else 'Нет'}")
-                print(f"API Hash присутствует: {'Да' if self.api_hash else 'Нет'}")
-                return None
-                
             try:
-                self.client = TelegramClient(
-                    'nft_analyzer_session', 
-                    api_id=int(self.api_id), 
-                    api_hash=self.api_hash,
-                    device_model="NFT Analyzer",
-                    system_version="1.0",
-                    app_version="1.0",
-                    lang_code="ru"
-                )
-                try:
-                    await self.client.connect()
-                    print("Соединение с Telegram API установлено успешно")
-                    
-                    # Если нужно полное подключение с авторизацией
-                    if not await self.client.is_user_authorized():
-                        print("Пользователь не авторизован, необходимо пройти авторизацию через интерфейс приложения")
-                    else:
-                        print("Пользователь авторизован")
-                        
-                    return self.client
-                except Exception as conn_err:
-                    print(f"Ошибка при установке соединения: {str(conn_err)}")
-                    self.client = None
-                    return None
+                # Один клиент на процесс: соединение и сессия переиспользуются между действиями
+                self.client = await client_manager.get_client()
             except Exception as e:
                 print(f"Ошибка при подключении к Telegram API: {str(e)}")
                 if "bot" in str(e).lower():
@@ -67,8 +66,17 @@ class TelegramParser:
         
         return self.client
 
-    async def leave_all_chats(self):
-        """Leave all channels and groups that were joined previously"""
+    async def leave_all_chats(self, concurrency: int = 4, progress: 'LeaveProgress' = None,
+                              state_file: str = LEAVE_STATE_FILE) -> bool:
+        """Leave all channels and groups that were joined previously
+
+        Leaves are sent by ``concurrency`` workers paced by an adaptive token
+        bucket that speeds up while Telegram accepts requests and waits out
+        FloodWait exactly. The chats to leave and the finished ones are kept in
+        ``state_file``, so an interrupted run continues where it stopped and
+        chats that could not be left are retried by the next run. Returns
+        False unless every chat was left.
+        """
         if not self.client:
             await self._connect()
             
@@ -76,128 +84,201 @@ class TelegramParser:
             print("Не удалось подключиться к Telegram API")
             return False
             
+        progress = progress or LeaveProgress()
         try:
-            count_success = 0
-            count_failed = 0
-            
-            # Получаем диалоги пользователя
-            async for dialog in self.client.iter_dialogs():
-                if dialog.is_channel or dialog.is_group:
-                    try:
+            state = self._load_leave_state(state_file)
+            if state is None:
+                # Получаем диалоги пользователя
+                targets = []
+                async for dialog in self.client.iter_dialogs():
+                    if dialog.is_channel or dialog.is_group:
+                        entity = dialog.entity
                         # Проверяем, не является ли это личным чатом
-                        if hasattr(dialog.entity, 'username') or hasattr(dialog.entity, 'title'):
-                            chat_name = dialog.entity.username or dialog.entity.title
-                            print(f"Попытка выйти из канала/группы: {chat_name}")
-                            await self.client(functions.channels.LeaveChannelRequest(dialog.entity))
-                            print(f"Успешно покинут канал/группа: {chat_name}")
-                            count_success += 1
-                            
-                            # Добавляем задержку, чтобы избежать ограничений API
-                            await asyncio.sleep(0.5)
+                        if hasattr(entity, 'username') or hasattr(entity, 'title'):
+                            targets.append({
+                                'id': entity.id,
+                                'access_hash': getattr(entity, 'access_hash', None),
+                                'is_channel': isinstance(entity, types.Channel),
+                                'name': getattr(entity, 'username', None) or entity.title
+                            })
+                state = {'targets': targets, 'done': [], 'failed': []}
+                self._save_leave_state(state_file, state)
+            else:
+                print(f"Продолжение прерванного выхода: выполнено {len(state['done'])} из {len(state['targets'])}")
+                # Чаты, из которых не удалось выйти в прошлый раз, пробуем снова
+                state['failed'] = []
+
+            finished = set(state['done'])
+            queue = deque(target for target in state['targets'] if target['id'] not in finished)
+            progress.total = len(state['targets'])
+            progress.left = len(state['done'])
+            progress.failed = len(state['failed'])
+            limiter = AdaptiveTokenBucket(rate=2, max_rate=self.leave_max_rate)
+
+            async def worker():
+                while queue:
+                    target = queue.popleft()
+                    await limiter.acquire()
+                    print(f"Попытка выйти из канала/группы: {target['name']}")
+                    try:
+                        await self._leave(target)
+                    except errors.FloodWaitError as e:
+                        print(f"FloodWait при выходе: ожидание {e.seconds} с")
+                        limiter.record_flood_wait(e.seconds)
+                        queue.appendleft(target)
+                        continue
                     except Exception as e:
-                        print(f"Ошибка при выходе из {dialog.name}: {str(e)}")
-                        count_failed += 1
-            
-            print(f"Выход выполнен успешно из {count_success} каналов/групп, с ошибками - {count_failed}")
+                        print(f"Ошибка при выходе из {target['name']}: {str(e)}")
+                        state['failed'].append(target['id'])
+                        progress.failed += 1
+                    else:
+                        limiter.record_success()
+                        print(f"Успешно покинут канал/группа: {target['name']}")
+                        state['done'].append(target['id'])
+                        progress.left += 1
+
+                    if (progress.left + progress.failed) % 20 == 0:
+                        self._save_leave_state(state_file, state)
+
+            try:
+                await asyncio.gather(*(worker() for _ in range(concurrency)))
+            except BaseException:
+                # Сохраняем прогресс, чтобы продолжить при следующем запуске
+                self._save_leave_state(state_file, state)
+                raise
+
+            # Присоединённые чаты снова можно ставить в очередь на вступление
+            self.join_queue.forget_joined()
+            if progress.failed:
+                # Состояние остаётся: следующий запуск повторит неудачные выходы
+                self._save_leave_state(state_file, state)
+                print(f"Выход выполнен из {progress.left} каналов/групп, не удалось - {progress.failed}")
+                return False
+            if os.path.exists(state_file):
+                os.remove(state_file)
+            print(f"Выход выполнен успешно из {progress.left} каналов/групп")
             return True
         except Exception as e:
             print(f"Ошибка при выходе из каналов/групп: {str(e)}")
             return False
-    
-    async def join_chat(self, chat_id: int, username: str = None) -> bool:
-        """Join a channel or group, handling private chats and join requests"""
+
+    async def _leave(self, target: Dict) -> None:
+        """Leave one chat described by a leave-state target"""
+        if target['is_channel']:
+            channel = types.InputChannel(target['id'], target['access_hash'])
+            await self.client(functions.channels.LeaveChannelRequest(channel))
+        else:
+            # Обычные группы покидаются удалением себя из участников
+            await self.client(functions.messages.DeleteChatUserRequest(
+                chat_id=target['id'], user_id=types.InputUserSelf()
+            ))
+
+    @staticmethod
+    def _load_leave_state(state_file: str):
         try:
-            if username:
-                entity = await self.client.get_entity(username)
-            else:
-                entity = await self.client.get_entity(chat_id)
+            with open(state_file, 'r') as f:
+                return json.load(f)
+        except:
+            return None
+
+    @staticmethod
+    def _save_leave_state(state_file: str, state: Dict) -> None:
+        with open(state_file, 'w') as f:
+            json.dump(state, f, ensure_ascii=False)
+
+    async def _join_entity(self, chat_id: int, username: str = None):
+        """Join a channel or group: returns (success, entity if it was newly joined)"""
+        label = username or chat_id
+        entity = await self.entity_cache.resolve(self.client, username if username else chat_id)
+        try:
+            await self.client(functions.channels.JoinChannelRequest(entity))
+            print(f"Successfully joined {label}")
+            return True, entity
+        except errors.UserAlreadyParticipantError:
+            print(f"Already a member of {label}")
+            return True, None
+        except errors.InviteRequestSentError:
+            print(f"Join request sent to {label}")
+            return True, None
+        except errors.ChannelPrivateError:
+            print(f"Cannot join private channel/group {label} without invitation")
+            return False, None
+
+    async def _archive_and_mute(self, entities: List) -> None:
+        """Archive joined chats with a single request and mute each of them"""
+        if not entities:
+            return
 
+        # Архивирование всех чатов одним запросом
+        try:
+            folder_peers = []
+            for entity in entities:
+                folder_peers.append(types.InputFolderPeer(
+                    peer=await self.client.get_input_entity(entity),
+                    folder_id=1  # ID 1 - архивный чат
+                ))
+            await self.client(functions.folders.EditPeerFoldersRequest(folder_peers=folder_peers))
+            print(f"Archived {len(entities)} chats")
+        except Exception as archive_err:
+            print(f"Error archiving chats: {str(archive_err)}")
+
+        # Отключение звука для чатов
+        for entity in entities:
+            label = getattr(entity, 'username', None) or entity.id
             try:
-                await self.client(functions.channels.JoinChannelRequest(entity))
-                print(f"Successfully joined {username or chat_id}")
-                
-                # Архивирование чата после подписки
-                try:
-                    await self.client(functions.folders.EditPeerFoldersRequest(
-                        folder_peers=[types.InputFolderPeer(
-                            peer=entity,
-                            folder_id=1  # ID 1 - архивный чат
-                        )]
-                    ))
-                    print(f"Archived chat {username or chat_id}")
-                except Exception as archive_err:
-                    print(f"Error archiving chat {username or chat_id}: {str(archive_err)}")
-                
-                # Отключение звука для чата
-                try:
-                    await self.client(functions.account.UpdateNotifySettingsRequest(
-                        peer=entity,
-                        settings=types.InputPeerNotifySettings(
-                            mute_until=2147483647,  # Далекое будущее, отключение навсегда
-                            show_previews=True,
-                            silent=True
-                        )
-                    ))
-                    print(f"Muted chat {username or chat_id}")
-                except Exception as mute_err:
-                    print(f"Error muting chat {username or chat_id}: {str(mute_err)}")
-                
-                return True
-            except errors.UserAlreadyParticipantError:
-                print(f"Already a member of {username or chat_id}")
-                return True
-            except errors.InviteRequestSentError:
-                print(f"Join request sent to {username or chat_id}")
-                return True
-            except errors.ChannelPrivateError:
-                print(f"Cannot join private channel/group {username or chat_id} without invitation")
-                return False
+                await self.client(functions.account.UpdateNotifySettingsRequest(
+                    peer=entity,
+                    settings=types.InputPeerNotifySettings(
+                        mute_until=2147483647,  # Далекое будущее, отключение навсегда
+                        show_previews=True,
+                        silent=True
+                    )
+                ))
+                print(f"Muted chat {label}")
+            except Exception as mute_err:
+                print(f"Error muting chat {label}: {str(mute_err)}")
 
+    async def join_chat(self, chat_id: int, username: str = None) -> bool:
+        """Join a channel or group, handling private chats and join requests"""
+        try:
+            success, entity = await self._join_entity(chat_id, username)
+            if entity is not None:
+                await self._archive_and_mute([entity])
+            return success
         except Exception as e:
             print(f"Error joining {username or chat_id}: {str(e)}")
             return False
 
-    async def get_user_channels(self) -> List[Dict]:
-        """Получить список каналов и групп, на которые подписан пользователь"""
-        await self._connect()
-        
-        if not self.client:
-            print("Не удалось подключиться к Telegram API")
-            return []
-            
-        channels_list = []
-        chat_ids = set()  # Для отслеживания уникальности
-        
-        try:
-            async for dialog in self.client.iter_dialogs():
-                if dialog.is_channel or dialog.is_group:
-                    # Проверяем, есть ли этот чат уже в списке
-                    if dialog.id in chat_ids:
-                        continue
-                        
-                    chat_type = 'channel' if dialog.is_channel else 'group'
-                    chat_info = {
-                        'id': dialog.id,
-                        'title': dialog.name,
-                        'username': dialog.entity.username if hasattr(dialog.entity, 'username') else None,
-                        'participants_count': dialog.entity.participants_count if hasattr(dialog.entity, 'participants_count') else 0,
-                        'description': dialog.entity.about if hasattr(dialog.entity, 'about') else '',
-                        'type': chat_type,
-                        'is_private': not hasattr(dialog.entity, 'username')
-                    }
-                    
-                    # Добавляем в список и отмечаем как обработанный
-                    chat_ids.add(dialog.id)
-                    channels_list.append(chat_info)
-                    
-            print(f"Найдено {len(channels_list)} каналов и групп в подписках пользователя")
-            return channels_list
-        except Exception as e:
-            print(f"Ошибка при получении списка каналов пользователя: {str(e)}")
-            return []
+    async def get_user_channels(self, name_filter: str = None, refresh: bool = True) -> List[Dict]:
+        """Получить список каналов и групп, на которые подписан пользователь
+
+        The list is kept locally and refreshed incrementally; with
+        ``refresh=False`` the stored list is returned without any requests.
+        """
+        if refresh:
+            await self._connect()
+
+            if not self.client:
+                print("Не удалось подключиться к Telegram API")
+                return []
+
+            try:
+                await self.subscriptions.refresh(self.client, self.entity_cache)
+            except Exception as e:
+                print(f"Ошибка при получении списка каналов пользователя: {str(e)}")
+                return []
+
+        channels_list = self.subscriptions.filter(name_filter)
+        print(f"Найдено {len(channels_list)} каналов и групп в подписках пользователя")
+        return channels_list
     
-    async def search_nft_groups(self, limit: int = 50, name_filter: str = None) -> List[Dict]:
-        """Search for NFT-related channels and groups"""
+    async def search_nft_groups(self, limit: int = 50, name_filter: str = None,
+                                join: bool = True) -> List[Dict]:
+        """Search for NFT-related channels and groups
+
+        All search terms are queried concurrently. Found chats are returned
+        right away; joining them happens in the background join queue.
+        """
         await self._connect()
         
         if not self.client:
@@ -208,116 +289,152 @@ class TelegramParser:
         chats_list = []
         chat_ids = set()  # Используем ID для отслеживания уникальности
 
-        for term in search_terms:
+        async def _search(term):
             try:
-                result = await self.client(functions.contacts.SearchRequest(
-                    q=term,
-                    limit=limit
-                ))
+                return await self._call_with_flood_wait(
+                    lambda: self.client(functions.contacts.SearchRequest(q=term, limit=limit)), term
+                )
+            except Exception as e:
+                print(f"Error searching for term {term}: {str(e)}")
+                return None
 
-                for chat in result.chats:
-                    # Include both channels and groups
-                    if isinstance(chat, (types.Channel, types.Chat)):
-                        # Проверяем, не добавили ли мы уже этот чат
-                        if chat.id in chat_ids:
-                            continue
-                            
-                        # Проверка имени канала/группы если указан фильтр
-                        if name_filter and name_filter.lower() not in chat.title.lower():
-                            continue
-                            
-                        chat_type = 'channel' if getattr(chat, 'broadcast', False) else 'group'
-                        chat_info = {
-                            'id': chat.id,
-                            'title': chat.title,
-                            'username': chat.username if hasattr(chat, 'username') else None,
-                            'participants_count': chat.participants_count if hasattr(chat, 'participants_count') else 0,
-                            'description': chat.about if hasattr(chat, 'about') else '',
-                            'type': chat_type,
-                            'is_private': not hasattr(chat, 'username')
-                        }
-
-                        # Добавляем ID в набор для отслеживания уникальности
-                        chat_ids.add(chat.id)
-                        chats_list.append(chat_info)
+        results = await asyncio.gather(*(_search(term) for term in search_terms))
+
+        # Результаты разбираем в порядке поисковых запросов
+        for result in results:
+            if result is None:
+                continue
+
+            self.entity_cache.put_many(result.chats)
+            for chat in result.chats:
+                # Include both channels and groups
+                if isinstance(chat, (types.Channel, types.Chat)):
+                    # Проверяем, не добавили ли мы уже этот чат
+                    if chat.id in chat_ids:
+                        continue
                         
-                        # Пытаемся присоединиться к чату
-                        await self.join_chat(chat.id, chat.username if hasattr(chat, 'username') else None)
+                    # Проверка имени канала/группы если указан фильтр
+                    if name_filter and name_filter.lower() not in chat.title.lower():
+                        continue
+                        
+                    chat_type = 'channel' if getattr(chat, 'broadcast', False) else 'group'
+                    chat_info = {
+                        'id': chat.id,
+                        'title': chat.title,
+                        'username': chat.username if hasattr(chat, 'username') else None,
+                        'participants_count': chat.participants_count if hasattr(chat, 'participants_count') else 0,
+                        'description': chat.about if hasattr(chat, 'about') else '',
+                        'type': chat_type,
+                        'is_private': not hasattr(chat, 'username')
+                    }
 
-            except Exception as e:
-                print(f"Error searching for term {term}: {str(e)}")
+                    # Добавляем ID в набор для отслеживания уникальности
+                    chat_ids.add(chat.id)
+                    chats_list.append(chat_info)
+                    
+                    # Присоединение к чату выполняется в фоне
+                    if join:
+                        self.join_queue.enqueue(chat.id, chat.username if hasattr(chat, 'username') else None)
 
+        self.entity_cache.save()
         return chats_list
 
     async def _extract_nft_info(self, message: str) -> Dict:
         """Extract NFT project information from message text"""
-        info = {
-            'project_name': None,
-            'price': None,
-            'date': None
-        }
+        return extract_nft_info(message)
 
-        # Extract project name (assuming it's in caps or followed by NFT)
-        project_match = re.search(r'([A-Z]{2,}(?:\s+[A-Z]{2,})*\s*(?:NFT)?)', message)
-        if project_match:
-            info['project_name'] = project_match.group(1).strip()
-
-        # Extract price (looking for ETH/SOL/USD amounts)
-        price_match = re.search(r'(\d+(?:\.\d+)?)\s*(?:ETH|SOL|\$)', message)
-        if price_match:
-            info['price'] = float(price_match.group(1))
-
-        # Extract date
-        date_patterns = [
-            r'(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{1,2}',
-            r'\d{1,2}/\d{1,2}/\d{4}',
-            r'\d{4}-\d{2}-\d{2}'
-        ]
-        for pattern in date_patterns:
-            date_match = re.search(pattern, message)
-            if date_match:
-                try:
-                    info['date'] = datetime.strptime(date_match.group(), '%Y-%m-%d')
-                except:
-                    continue
+    async def _extract_batch(self, texts: List[str]) -> List[Dict]:
+        """Extract NFT info for a batch of messages, offloading large batches to worker processes"""
+        if self.extraction_workers > 1 and len(texts) >= self.parallel_extraction_threshold:
+            if self._extraction_pool is None:
+                self._extraction_pool = create_process_pool(self.extraction_workers)
+                # Пул останавливается при закрытии парсера или, если его не закрыли, при выходе из процесса
+                self._extraction_pool_finalizer = weakref.finalize(self, self._extraction_pool.shutdown)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._extraction_pool, extract_records, texts)
+        return extract_records(texts)
 
-        return info
+    async def _iter_channel_messages(self, channel: str, start_date, end_date,
+                                     cursors: Dict[str, Dict] = None):
+        """Yield (channel title, message) for text messages of a channel or group
 
-    async def _fetch_channel_messages(self, channel: str, start_date, end_date) -> List[Dict]:
-        """Fetch messages from a specific channel or group"""
-        messages = []
+        If ``cursors`` is given, only messages newer than the channel's stored
+        high-water mark are fetched and the mark is advanced in place once the
+        channel is exhausted.
+        """
+        # Сначала попробуем получить сущность канала
         try:
-            # Сначала попробуем получить сущность канала
+            entity = await self._call_with_flood_wait(
+                lambda: self.entity_cache.resolve(self.client, channel), channel
+            )
+            print(f"Успешно получена сущность для канала: {channel}")
+        except Exception as entity_err:
+            print(f"Ошибка получения сущности для {channel}: {str(entity_err)}")
+            return
+
+        channel_title = entity.title if hasattr(entity, 'title') else channel
+        cursor = (cursors or {}).get(channel) or {}
+        last_id = cursor.get('last_id', 0)
+        last_date = cursor.get('last_date')
+        fetched = 0
+        attempt = 0
+        while fetched < self.message_limit:
             try:
-                entity = await self.client.get_entity(channel)
-                print(f"Успешно получена сущность для канала: {channel}")
-            except Exception as entity_err:
-                print(f"Ошибка получения сущности для {channel}: {str(entity_err)}")
-                return messages
-                
-            async for message in self.client.iter_messages(
-                entity,
-                offset_date=end_date,
-                reverse=True,
-                limit=1000  # Limit the number of messages to analyze
-            ):
-                if message.date.date() < start_date:
+                async for message in self.client.iter_messages(
+                    entity,
+                    offset_date=end_date,
+                    reverse=True,
+                    min_id=last_id,
+                    limit=self.message_limit - fetched  # Limit the number of messages to analyze
+                ):
+                    if message.date.date() < start_date:
+                        break
+
+                    last_id = message.id
+                    last_date = message.date.isoformat()
+                    fetched += 1
+                    if message.text:
+                        yield channel_title, message
+                break
+            except errors.FloodWaitError as e:
+                # Продолжаем с последнего полученного сообщения после ожидания
+                attempt += 1
+                if attempt > self.flood_wait_retries:
+                    print(f"Превышено число повторов FloodWait для {channel}")
                     break
+                print(f"FloodWait для {channel}: ожидание {e.seconds} с (попытка {attempt})")
+                await asyncio.sleep(e.seconds + 1)
+
+        if cursors is not None and last_id:
+            cursors[channel] = {'last_id': last_id, 'last_date': last_date}
+
+    @staticmethod
+    def _message_record(channel: str, channel_title: str, message, info: Dict) -> Dict:
+        """Build a dataset row from a Telegram message and its extracted NFT info"""
+        return {
+            'channel': channel_title,
+            'channel_id': channel,
+            'message_id': message.id,
+            'date': message.date,
+            'text': message.text,
+            'project_name': info['project_name'],
+            'price': info['price'],
+            'views': message.views if hasattr(message, 'views') else 0,
+            'forwards': message.forwards if hasattr(message, 'forwards') else 0
+        }
+
+    async def _fetch_channel_messages(self, channel: str, start_date, end_date,
+                                      cursors: Dict[str, Dict] = None) -> List[Dict]:
+        """Fetch messages from a specific channel or group"""
+        messages = []
+        try:
+            fetched = [item async for item in self._iter_channel_messages(
+                channel, start_date, end_date, cursors
+            )]
+            infos = await self._extract_batch([message.text for _, message in fetched])
+            for (channel_title, message), info in zip(fetched, infos):
+                messages.append(self._message_record(channel, channel_title, message, info))
 
-                if message.text:
-                    info = await self._extract_nft_info(message.text)
-                    channel_title = entity.title if hasattr(entity, 'title') else channel
-                    messages.append({
-                        'channel': channel_title,
-                        'channel_id': channel,
-                        'date': message.date,
-                        'text': message.text,
-                        'project_name': info['project_name'],
-                        'price': info['price'],
-                        'views': message.views if hasattr(message, 'views') else 0,
-                        'forwards': message.forwards if hasattr(message, 'forwards') else 0
-                    })
-                    
             print(f"Получено {len(messages)} сообщений из канала {channel}")
             
         except Exception as e:
@@ -325,25 +442,477 @@ class TelegramParser:
 
         return messages
 
-    def fetch_messages(self, channels: List[str], start_date, end_date) -> pd.DataFrame:
-        """Fetch messages from multiple channels"""
-        async def _fetch_all():
-            await self._connect()
-            all_messages = []
-            for channel in channels:
+    async def _call_with_flood_wait(self, request_factory, label: str):
+        """Run a Telegram request, sleeping out FloodWait errors before retrying"""
+        attempt = 0
+        while True:
+            try:
+                return await request_factory()
+            except errors.FloodWaitError as e:
+                attempt += 1
+                if attempt > self.flood_wait_retries:
+                    raise
+                print(f"FloodWait для {label}: ожидание {e.seconds} с (попытка {attempt})")
+                await asyncio.sleep(e.seconds + 1)
+
+    def fetch_messages(self, channels: List[str], start_date, end_date,
+                       concurrent: bool = True, max_concurrency: int = None,
+                       cursors: Dict[str, Dict] = None) -> pd.DataFrame:
+        """Fetch messages from multiple channels
+
+        With ``concurrent`` enabled channels are fetched in parallel through the
+        shared client, at most ``max_concurrency`` at a time. Passing the
+        ``cursors`` mapping from ``utils.load_fetch_state`` makes the fetch
+        incremental: only messages newer than each channel's cursor are pulled.
+        """
+        max_concurrency = max_concurrency or self.max_concurrency
+
+        async def _fetch_one(channel, semaphore):
+            async with semaphore:
                 try:
-                    channel_messages = await self._fetch_channel_messages(
-                        channel, start_date, end_date
+                    return await self._fetch_channel_messages(
+                        channel, start_date, end_date, cursors
                     )
-                    all_messages.extend(channel_messages)
                 except Exception as e:
                     print(f"Error fetching messages from {channel}: {str(e)}")
-            return all_messages
+                    return []
+
+        async def _fetch_all():
+            await self._connect()
+            if not self.client:
+                print("Не удалось подключиться к Telegram API")
+                return []
+
+            semaphore = asyncio.Semaphore(max_concurrency if concurrent else 1)
+            results = await asyncio.gather(
+                *(_fetch_one(channel, semaphore) for channel in channels)
+            )
+            # Сохраняем порядок каналов как при последовательной загрузке
+            return [message for channel_messages in results for message in channel_messages]
+
+        # Выполняем в фоновом цикле общего клиента
+        messages = run_sync(_fetch_all())
+
+        return apply_schema(pd.DataFrame(messages))
+
+    async def stream_to_storage(self, channels: List[str], start_date, end_date,
+                                storage=None, cursors: Dict[str, Dict] = None,
+                                batch_size: int = 500, max_concurrency: int = None,
+                                progress: 'FetchProgress' = None) -> int:
+        """Fetch channels straight into storage with bounded memory
+
+        Channel producers feed a bounded queue of raw messages, an extraction
+        stage turns them into records, and a writer appends every
+        ``batch_size`` records to storage. At most a couple of batches are held
+        in memory regardless of the number of channels or the date range.
+        Returns the number of stored messages.
+        """
+        storage = storage or get_storage()
+        progress = progress or FetchProgress(len(channels))
+        max_concurrency = max_concurrency or self.max_concurrency
+
+        await self._connect()
+        if not self.client:
+            print("Не удалось подключиться к Telegram API")
+            return 0
+
+        raw_messages = asyncio.Queue(maxsize=batch_size * 2)
+        batches = asyncio.Queue(maxsize=2)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def produce(channel):
+            async with semaphore:
+                try:
+                    async for channel_title, message in self._iter_channel_messages(
+                        channel, start_date, end_date, cursors
+                    ):
+                        await raw_messages.put((channel, channel_title, message))
+                        progress.fetched += 1
+                except Exception as e:
+                    print(f"Ошибка получения сообщений из {channel}: {str(e)}")
+                finally:
+                    progress.channels_done += 1
+
+        async def extract():
+            # Пачки извлекаются в пуле процессов параллельно с загрузкой,
+            # в запись уходят в исходном порядке
+            in_flight = deque()
+            pending = []
+
+            async def submit(items):
+                texts = [message.text for _, _, message in items]
+                in_flight.append((items, asyncio.ensure_future(self._extract_batch(texts))))
+                while len(in_flight) > max(self.extraction_workers, 1) or (in_flight and in_flight[0][1].done()):
+                    await flush_one()
+
+            async def flush_one():
+                items, infos = in_flight.popleft()
+                records = [
+                    self._message_record(channel, channel_title, message, info)
+                    for (channel, channel_title, message), info in zip(items, await infos)
+                ]
+                await batches.put(records)
+
+            try:
+                while True:
+                    item = await raw_messages.get()
+                    if item is None:
+                        break
+                    pending.append(item)
+                    if len(pending) >= batch_size:
+                        await submit(pending)
+                        pending = []
+                if pending:
+                    await submit(pending)
+                while in_flight:
+                    await flush_one()
+            finally:
+                for _, infos in in_flight:
+                    infos.cancel()
+            await batches.put(None)
+
+        async def write():
+            loop = asyncio.get_running_loop()
+            while True:
+                batch = await batches.get()
+                if batch is None:
+                    break
+                # Запись на диск не блокирует цикл событий
+                await loop.run_in_executor(None, storage.append, pd.DataFrame(batch))
+                progress.written += len(batch)
+
+        extractor = asyncio.create_task(extract())
+        writer = asyncio.create_task(write())
+        producers = asyncio.ensure_future(asyncio.gather(*(produce(channel) for channel in channels)))
+        stages = [extractor, writer]
+
+        # Обработчик и запись завершаются раньше источников только при ошибке
+        await asyncio.wait([producers, *stages], return_when=asyncio.FIRST_COMPLETED)
+        if producers.done():
+            await raw_messages.put(None)
+            await asyncio.wait(stages, return_when=asyncio.FIRST_EXCEPTION)
+
+        failed = [task for task in stages if task.done() and task.exception()]
+        if failed:
+            for task in [producers, *stages]:
+                task.cancel()
+            await asyncio.gather(producers, *stages, return_exceptions=True)
+            raise failed[0].exception()
+
+        print(f"Сохранено {progress.written} сообщений из {len(channels)} каналов")
+        return progress.written
+
+    async def update_storage(self, channels: List[str], start_date, end_date, storage=None,
+                             incremental: bool = True, **kwargs) -> int:
+        """Fetch channels into storage and persist the fetch cursors
+
+        An incremental update appends messages newer than the saved cursors.
+        A full reload streams into a staging copy of the storage and swaps it
+        in, together with the new cursors, only if messages were fetched: a
+        failed or empty reload leaves the stored data and cursors untouched.
+        Returns the number of stored messages.
+        """
+        storage = storage or get_storage()
+        if incremental:
+            cursors = load_fetch_state()
+            written = await self.stream_to_storage(channels, start_date, end_date,
+                                                   storage=storage, cursors=cursors, **kwargs)
+            save_fetch_state(cursors)
+            return written
+
+        # Курсоры получают только каналы, загрузка которых завершилась
+        cursors = {}
+        staging = storage.staging()
+        loop = asyncio.get_running_loop()
+        try:
+            written = await self.stream_to_storage(channels, start_date, end_date,
+                                                   storage=staging, cursors=cursors, **kwargs)
+            if written:
+                await loop.run_in_executor(None, storage.replace, staging)
+                save_fetch_state(cursors)
+            else:
+                print("Сообщения не получены, сохранённые данные оставлены без изменений")
+        finally:
+            await loop.run_in_executor(None, staging.discard)
+        return written
+
+    def close(self) -> None:
+        """Shut down the extraction worker processes"""
+        if self._extraction_pool is not None:
+            self._extraction_pool_finalizer()
+            self._extraction_pool = None
 
-        # Create new event loop for async operations
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        messages = loop.run_until_complete(_fetch_all())
-        loop.close()
+    def fetch_to_storage(self, channels: List[str], start_date, end_date, **kwargs) -> int:
+        """Synchronous wrapper around ``stream_to_storage``"""
+        return run_sync(self.stream_to_storage(channels, start_date, end_date, **kwargs))
 
-        return pd.DataFrame(messages)
\ No newline at end of file
+
+class LeaveProgress:
+    """Counters of a running bulk leave, safe to poll from another thread"""
+
+    def __init__(self):
+        self.total = 0
+        self.left = 0
+        self.failed = 0
+
+    @property
+    def fraction(self) -> float:
+        if not self.total:
+            return 0.0
+        return min((self.left + self.failed) / self.total, 1.0)
+
+
+class FetchProgress:
+    """Counters of a running streaming fetch, safe to poll from another thread"""
+
+    def __init__(self, total_channels: int):
+        self.total_channels = total_channels
+        self.channels_done = 0
+        self.fetched = 0
+        self.written = 0
+
+    @property
+    def fraction(self) -> float:
+        if not self.total_channels:
+            return 1.0
+        return min(self.channels_done / self.total_channels, 1.0)
+
+
+class JoinQueue:
+    """Background queue that joins chats at a limited rate and archives them in batches
+
+    Runs on the shared client loop: ``enqueue`` starts the worker when needed
+    and the worker stops once the queue is drained.
+    """
+
+    def __init__(self, parser: TelegramParser, rate: float = 0.5,
+                 archive_batch_size: int = 50, max_flood_wait: int = 600):
+        self.parser = parser
+        self.limiter = TokenBucket(rate)
+        self.archive_batch_size = archive_batch_size
+        self.max_flood_wait = max_flood_wait
+        self.joined = 0
+        self.failed = 0
+        self._queue = deque()
+        self._queued = set()
+        self._worker = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def enqueue(self, chat_id: int, username: str = None) -> None:
+        """Queue a chat for joining (must be called on the client loop)"""
+        key = username or chat_id
+        if key in self._queued:
+            return
+        self._queued.add(key)
+        self._queue.append((chat_id, username))
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._run())
+
+    def forget_joined(self) -> None:
+        """Allow chats joined earlier to be queued again (after leaving them)"""
+        self._queued = {username or chat_id for chat_id, username in self._queue}
+
+    async def wait(self) -> None:
+        """Wait until every queued chat has been processed"""
+        while self._worker is not None and not self._worker.done():
+            await asyncio.shield(self._worker)
+
+    async def _run(self) -> None:
+        to_archive = []
+        while self._queue:
+            chat_id, username = self._queue[0]
+            await self.limiter.acquire()
+            try:
+                success, entity = await self.parser._join_entity(chat_id, username)
+            except errors.FloodWaitError as e:
+                if e.seconds > self.max_flood_wait:
+                    print(f"FloodWait {e.seconds} с при присоединении, очередь остановлена")
+                    self.failed += len(self._queue)
+                    self._queued.difference_update(username or chat_id for chat_id, username in self._queue)
+                    self._queue.clear()
+                    break
+                # Ожидание действует для всех запросов очереди, чат повторяется
+                print(f"FloodWait при присоединении: ожидание {e.seconds} с")
+                self.limiter.pause(e.seconds + 1)
+                continue
+            except Exception as e:
+                print(f"Error joining {username or chat_id}: {str(e)}")
+                success, entity = False, None
+
+            self._queue.popleft()
+            if success:
+                self.joined += 1
+            else:
+                # Неудачные чаты можно будет повторить при следующем поиске
+                self.failed += 1
+                self._queued.discard(username or chat_id)
+            if entity is not None:
+                to_archive.append(entity)
+            if len(to_archive) >= self.archive_batch_size or (to_archive and not self._queue):
+                await self.parser._archive_and_mute(to_archive)
+                to_archive = []
+
+        if to_archive:
+            await self.parser._archive_and_mute(to_archive)
+
+
+class LiveIngestor:
+    """Real-time ingestion of new and edited messages through Telethon update handlers
+
+    Runs on the shared client loop. ``start`` registers NewMessage and
+    MessageEdited handlers for the given channels; incoming messages go
+    through the same NFT extraction as fetched history and are appended to
+    storage in micro-batches every ``flush_interval`` seconds or
+    ``batch_size`` messages, so history is never re-polled. An edited message
+    is stored again and replaces its previous copy on read. A batch that
+    could not be written stays queued for the next flush; while writes keep
+    failing the queue holds at most ``max_pending`` messages and the oldest
+    ones beyond that are dropped (counted in ``dropped``, the error is kept
+    in ``last_error``).
+    """
+
+    def __init__(self, parser: TelegramParser, batch_size: int = 200,
+                 flush_interval: float = 0.5, compact_every: int = 100, max_pending: int = 10000):
+        self.parser = parser
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # Parquet-хранилище пишет сегмент на каждую пачку, поэтому периодически их объединяем
+        self.compact_every = compact_every
+        self.storage = None
+        self.received = 0
+        self.written = 0
+        self.dropped = 0
+        self.last_written_at = None
+        self.last_error = None
+        # Каналы в том виде, в каком их запросили, и те из них, что не удалось найти
+        self.requested: List[str] = []
+        self.unresolved: List[str] = []
+        self._channels: Dict[int, Tuple[str, str]] = {}
+        self._pending = []
+        self._batches = 0
+        self._wakeup = None
+        self._stopping = False
+        self._flusher = None
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None and not self._flusher.done()
+
+    @property
+    def channels(self) -> List[str]:
+        return [channel for channel, _ in self._channels.values()]
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def start(self, channels: List[str], storage=None) -> int:
+        """Listen to ``channels`` (replacing any previous set); returns how many were resolved"""
+        await self.parser._connect()
+        client = self.parser.client
+        if not client:
+            print("Не удалось подключиться к Telegram API")
+            return 0
+
+        resolved = {}
+        self.requested = list(channels)
+        self.unresolved = []
+        for channel in channels:
+            try:
+                entity = await self.parser._call_with_flood_wait(
+                    lambda: self.parser.entity_cache.resolve(client, channel), channel
+                )
+            except Exception as e:
+                print(f"Ошибка получения сущности для {channel}: {str(e)}")
+                self.unresolved.append(channel)
+                continue
+            peer_id = utils.get_peer_id(getattr(entity, 'input_entity', entity))
+            resolved[peer_id] = (channel, getattr(entity, 'title', None) or channel)
+        self._channels = resolved
+        self.storage = storage or get_storage()
+
+        if not self.running:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            client.add_event_handler(self._on_message, events.NewMessage())
+            client.add_event_handler(self._on_message, events.MessageEdited())
+            self._flusher = asyncio.ensure_future(self._run())
+        print(f"Режим реального времени: отслеживается {len(resolved)} каналов")
+        return len(resolved)
+
+    async def stop(self) -> None:
+        """Unregister the handlers and write out the messages received so far"""
+        if self.parser.client:
+            self.parser.client.remove_event_handler(self._on_message)
+        if self.running:
+            self._stopping = True
+            self._wakeup.set()
+            await self._flusher
+        self._flusher = None
+        self._channels = {}
+        self.requested = []
+        self.unresolved = []
+        if self._pending:
+            print(f"Режим реального времени остановлен, не сохранено сообщений: {len(self._pending)}")
+            self.dropped += len(self._pending)
+            self._pending = []
+
+    async def _on_message(self, event) -> None:
+        target = self._channels.get(event.chat_id)
+        if target is None or not event.message.text:
+            return
+        channel, channel_title = target
+        self._pending.append((channel, channel_title, event.message))
+        self.received += 1
+        # Только при заполнении пачки: после ошибки записи повтор идёт по таймеру, а не на каждое сообщение
+        if len(self._pending) == self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._pending:
+                await self._flush()
+            if self._stopping:
+                break
+
+    async def _flush(self) -> None:
+        items, self._pending = self._pending, []
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await self.parser._extract_batch([message.text for _, _, message in items])
+            records = [
+                TelegramParser._message_record(channel, channel_title, message, info)
+                for (channel, channel_title, message), info in zip(items, infos)
+            ]
+            # Запись на диск не блокирует цикл событий и приём обновлений
+            await loop.run_in_executor(None, self.storage.append, pd.DataFrame(records))
+        except Exception as e:
+            # Сообщения реального времени повторно не загружаются: пачка остаётся
+            # в очереди и записывается при следующем сбросе, но очередь ограничена
+            print(f"Ошибка записи сообщений в реальном времени, повтор при следующей записи: {str(e)}")
+            self.last_error = str(e)
+            self._pending = items + self._pending
+            overflow = len(self._pending) - self.max_pending
+            if overflow > 0:
+                print(f"Очередь записи переполнена, отброшено старых сообщений: {overflow}")
+                self.dropped += overflow
+                self._pending = self._pending[overflow:]
+            return
+        self.last_error = None
+        self.written += len(records)
+        self.last_written_at = max(message.date for _, _, message in items)
+        self._batches += 1
+        if self.compact_every and self._batches % self.compact_every == 0 and hasattr(self.storage, 'compact'):
+            try:
+                await loop.run_in_executor(None, self.storage.compact)
+            except Exception as e:
+                print(f"Ошибка объединения сегментов хранилища: {str(e)}")
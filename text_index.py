@@ -0,0 +1,281 @@
+import re
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from storage import FollowerRegistry, StorageFollower
+
+SOURCE_COLUMNS = ['text', 'channel_id', 'message_id']
+TOKEN_PATTERN = re.compile(r'\w+')
+QUERY_PATTERN = re.compile(r'"([^"]+)"|(\S+)')
+
+# Похожие латинские и кириллические буквы (после приведения к нижнему регистру)
+LATIN_HOMOGLYPHS = 'aeopcxykbhmt'
+CYRILLIC_HOMOGLYPHS = 'аеорсхуквнмт'
+TO_LATIN = str.maketrans(CYRILLIC_HOMOGLYPHS, LATIN_HOMOGLYPHS)
+TO_CYRILLIC = str.maketrans(LATIN_HOMOGLYPHS, CYRILLIC_HOMOGLYPHS)
+LATIN_LETTER = re.compile('[a-z]')
+CYRILLIC_LETTER = re.compile('[а-я]')
+
+# Ключ сообщения: код канала в старших битах, message_id в младших
+KEY_SHIFT = 2 ** 40
+# Начало фразы: номер документа в старших битах, позиция слова в младших
+POSITION_SHIFT = 2 ** 20
+MAX_SEGMENTS = 8
+CHUNK_ROWS = 200_000
+EMPTY = np.zeros(0, dtype=np.int64)
+
+
+def normalize_token(token: str) -> str:
+    """Index form of a lowercase token: ё -> е, mixed-script words in one alphabet
+
+    A word mixing Latin and Cyrillic letters (``аirdrop`` with a Cyrillic
+    "а", ``NFТ``) is spelled in the alphabet most of its letters use.
+    """
+    token = token.replace('ё', 'е')
+    latin = len(LATIN_LETTER.findall(token))
+    cyrillic = len(CYRILLIC_LETTER.findall(token))
+    if latin and cyrillic:
+        token = token.translate(TO_LATIN if latin >= cyrillic else TO_CYRILLIC)
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Normalised tokens of a text, in order"""
+    return [normalize_token(token) for token in TOKEN_PATTERN.findall(text.lower())]
+
+
+def _ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Concatenation of ``arange(start, end)`` for every pair"""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if not total:
+        return EMPTY
+    return np.arange(total) + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+
+
+class TextIndex(StorageFollower):
+    """Positional inverted index over message texts, kept in step with a storage
+
+    Every stored message becomes a document; its tokens (``\\w+`` runs,
+    lowercased and normalised by ``normalize_token``) are recorded with their
+    positions. Postings live in a few sorted numpy segments: each appended
+    batch adds a segment and segments are merged when there are too many, so
+    indexing is incremental and lookups are binary searches.
+
+    Lookups return sorted document numbers: ``term`` (exact token), ``prefix``
+    (tokens starting with a string), ``contains`` (tokens containing a
+    string), ``phrase`` (consecutive tokens) and ``search`` (a query combining
+    them). A message stored again (re-fetched or edited) gets a new document
+    and its older copies stop matching. ``doc_rows`` maps documents to rows of
+    a frame read from the same storage.
+    """
+
+    source_columns = SOURCE_COLUMNS
+
+    def __init__(self):
+        super().__init__()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.vocabulary: List[str] = []
+            self._term_ids: Dict[str, int] = {}
+            # Сегменты постингов (term, doc, position), отсортированные в этом порядке
+            self._segments: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+            self._channel_codes: Dict[str, int] = {}
+            self._doc_keys: List[np.ndarray] = []
+            self.documents = 0
+            self._stale = None
+            # Словарь одной строкой для поиска по подстроке и префиксу
+            self._joined = None
+            self._starts = EMPTY
+            self._lookup_cache: Dict[Tuple[str, str], np.ndarray] = {}
+
+    def observe_frame(self, data: pd.DataFrame) -> None:
+        """Index a batch of stored messages"""
+        if data is None or data.empty or 'text' not in data.columns:
+            return
+        with self._lock:
+            for start in range(0, len(data), CHUNK_ROWS):
+                self._add_documents(data.iloc[start:start + CHUNK_ROWS])
+            if len(self._segments) > MAX_SEGMENTS:
+                self._merge_segments()
+
+    def _add_documents(self, data: pd.DataFrame) -> None:
+        texts = data['text'].astype(object).where(data['text'].notna(), '')
+        tokens = [TOKEN_PATTERN.findall(str(text).lower()) for text in texts]
+        lengths = np.fromiter((len(words) for words in tokens), dtype=np.int64, count=len(tokens))
+        first_doc = self.documents
+        self.documents += len(tokens)
+        self._doc_keys.append(self._message_keys(data, register=True))
+        self._stale = None
+
+        words = list(chain.from_iterable(tokens))
+        if not words:
+            return
+        codes, uniques = pd.factorize(pd.Series(words, dtype=object), sort=False)
+        term_ids = np.fromiter((self._term_id(normalize_token(word)) for word in uniques),
+                               dtype=np.int64, count=len(uniques))
+        terms = term_ids[codes]
+        docs = np.repeat(np.arange(first_doc, self.documents, dtype=np.int64), lengths)
+        positions = np.arange(len(words)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        order = np.lexsort((positions, docs, terms))
+        self._segments.append((terms[order].astype(np.int32), docs[order].astype(np.int32),
+                               positions[order].astype(np.int32)))
+
+    def _term_id(self, token: str) -> int:
+        term_id = self._term_ids.get(token)
+        if term_id is None:
+            term_id = self._term_ids[token] = len(self.vocabulary)
+            self.vocabulary.append(token)
+            self._joined = None
+            self._lookup_cache = {}
+        return term_id
+
+    def _merge_segments(self) -> None:
+        terms, docs, positions = (np.concatenate(parts) for parts in zip(*self._segments))
+        order = np.lexsort((positions, docs, terms))
+        self._segments = [(terms[order], docs[order], positions[order])]
+
+    def _message_keys(self, data: pd.DataFrame, register: bool = False) -> np.ndarray:
+        """Key of every row (channel code and message_id), -1 if it has none"""
+        if 'channel_id' not in data.columns or 'message_id' not in data.columns:
+            return np.full(len(data), -1, dtype=np.int64)
+        channels = data['channel_id'].astype(str).where(data['channel_id'].notna())
+        if register:
+            for channel in channels.dropna().unique():
+                self._channel_codes.setdefault(channel, len(self._channel_codes))
+        codes = channels.map(self._channel_codes).fillna(-1).to_numpy(dtype=np.int64)
+        message_ids = pd.to_numeric(data['message_id'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        valid = (codes >= 0) & ~np.isnan(message_ids)
+        return np.where(valid, codes * KEY_SHIFT + np.nan_to_num(message_ids).astype(np.int64), -1)
+
+    def _stale_mask(self) -> np.ndarray:
+        """Documents superseded by a later copy of the same message"""
+        if self._stale is None or len(self._stale) != self.documents:
+            keys = np.concatenate(self._doc_keys) if self._doc_keys else EMPTY
+            docs = np.arange(len(keys))
+            latest = pd.Series(docs).groupby(keys).transform('max').to_numpy()
+            self._stale = (keys >= 0) & (latest != docs)
+        return self._stale
+
+    def _live(self, docs: np.ndarray) -> np.ndarray:
+        docs = np.unique(docs)
+        return docs[~self._stale_mask()[docs]] if len(docs) else EMPTY
+
+    def _postings(self, term_ids) -> Tuple[np.ndarray, np.ndarray]:
+        """(doc, position) pairs of the given terms over all segments"""
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        docs, positions = [EMPTY], [EMPTY]
+        for terms, segment_docs, segment_positions in self._segments:
+            selected = _ranges(np.searchsorted(terms, term_ids, 'left'), np.searchsorted(terms, term_ids, 'right'))
+            docs.append(segment_docs[selected])
+            positions.append(segment_positions[selected])
+        return np.concatenate(docs).astype(np.int64), np.concatenate(positions).astype(np.int64)
+
+    def term(self, word: str) -> np.ndarray:
+        """Documents containing the token ``word``"""
+        with self._lock:
+            term_id = self._term_ids.get(normalize_token(word.lower()))
+            if term_id is None:
+                return EMPTY
+            return self._live(self._postings([term_id])[0])
+
+    def _matching_terms(self, kind: str, text: str) -> np.ndarray:
+        """IDs of vocabulary tokens starting with (``prefix``) or containing (``contains``) ``text``"""
+        term_ids = self._lookup_cache.get((kind, text))
+        if term_ids is None:
+            if self._joined is None:
+                # Поиск по словарю одной строкой выполняется в C, а не циклом по токенам
+                self._joined = '\n'.join(self.vocabulary)
+                lengths = np.fromiter((len(token) + 1 for token in self.vocabulary), dtype=np.int64,
+                                      count=len(self.vocabulary))
+                self._starts = np.cumsum(lengths) - lengths
+            pattern = ('^' if kind == 'prefix' else '') + re.escape(text)
+            offsets = [match.start() for match in re.finditer(pattern, self._joined, re.MULTILINE)]
+            term_ids = np.unique(np.searchsorted(self._starts, offsets, 'right') - 1)
+            self._lookup_cache[(kind, text)] = term_ids
+        return term_ids
+
+    def prefix(self, start: str) -> np.ndarray:
+        """Documents with a token starting with ``start``"""
+        start = normalize_token(start.lower())
+        with self._lock:
+            return self._live(self._postings(self._matching_terms('prefix', start))[0])
+
+    def contains(self, fragment: str) -> Optional[np.ndarray]:
+        """Documents with a token containing ``fragment``; None if it spans several tokens"""
+        fragment = fragment.lower()
+        if not TOKEN_PATTERN.fullmatch(fragment):
+            return None
+        fragment = normalize_token(fragment)
+        with self._lock:
+            return self._live(self._postings(self._matching_terms('contains', fragment))[0])
+
+    def phrase(self, text: str) -> np.ndarray:
+        """Documents where the tokens of ``text`` occur consecutively"""
+        words = tokenize(text)
+        if not words:
+            return EMPTY
+        with self._lock:
+            matches = None
+            for offset, word in enumerate(words):
+                term_id = self._term_ids.get(word)
+                if term_id is None:
+                    return EMPTY
+                docs, positions = self._postings([term_id])
+                # Совпадение фразы - один и тот же документ и начальная позиция для всех слов
+                starts = docs * POSITION_SHIFT + (positions - offset)
+                matches = starts if matches is None else np.intersect1d(matches, starts)
+                if not len(matches):
+                    return EMPTY
+            return self._live(matches // POSITION_SHIFT)
+
+    def search(self, query: str) -> np.ndarray:
+        """Documents matching every part of ``query``
+
+        Parts are separated by spaces: ``"quoted text"`` is a phrase, a word
+        ending with ``*`` is a prefix and any other word is a term (a word
+        that tokenises into several tokens, like ``nft-drop``, is a phrase).
+        """
+        result = None
+        for quoted, word in QUERY_PATTERN.findall(query):
+            if quoted:
+                docs = self.phrase(quoted)
+            elif word.endswith('*') and TOKEN_PATTERN.fullmatch(word[:-1]):
+                docs = self.prefix(word[:-1])
+            elif TOKEN_PATTERN.fullmatch(word):
+                docs = self.term(word)
+            else:
+                docs = self.phrase(word)
+            result = docs if result is None else np.intersect1d(result, docs)
+            if not len(result):
+                break
+        return EMPTY if result is None else result
+
+    def doc_rows(self, data: pd.DataFrame) -> np.ndarray:
+        """Row position in ``data`` of every document, -1 if it is not there or superseded
+
+        ``data`` is a de-duplicated frame read from the indexed storage; rows
+        are matched by (channel_id, message_id).
+        """
+        with self._lock:
+            doc_keys = np.concatenate(self._doc_keys) if self._doc_keys else EMPTY
+            row_keys = pd.Series(self._message_keys(data))
+            row_keys = row_keys[(row_keys >= 0) & ~row_keys.duplicated(keep='last')]
+            rows = pd.Series(row_keys.index.to_numpy(), index=row_keys.to_numpy())
+            positions = rows.reindex(doc_keys).to_numpy(dtype=float, copy=True)
+            positions[(doc_keys < 0) | self._stale_mask()] = np.nan
+            return np.nan_to_num(positions, nan=-1).astype(np.int64)
+
+
+# Индексы по каждому хранилищу процесса
+_indexes = FollowerRegistry(TextIndex)
+
+
+def get_text_index(storage=None) -> TextIndex:
+    """Up-to-date text index for the given (or configured) storage"""
+    return _indexes.get(storage)
@@ -0,0 +1,134 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from schema import utc_dates
+from storage import FollowerRegistry, SeenMessages, StorageFollower
+
+# Окна (в часах): короткое задаёт скорость упоминаний, длинное - базовый уровень
+SHORT_WINDOW = 6.0
+LONG_WINDOW = 48.0
+SOURCE_COLUMNS = ['date', 'project_name', 'channel_id', 'message_id']
+
+
+class TrendEngine(StorageFollower):
+    """Streaming trend detection with exponentially decayed mention counts
+
+    Every project keeps one decayed count per window and the time it was last
+    updated, and each message is an O(1) update. Messages are counted once by
+    (channel_id, message_id), so the IDs of counted messages are remembered
+    as well: scores take O(1) memory per project, de-duplication O(messages)
+    (4 bytes per message, see ``SeenMessages``). Late messages (a backfill,
+    an edit of an older message) decay by their own timestamp. A mention at
+    time t contributes exp(-(now - t) / window) to a window's count, which
+    makes ``count / window`` a smoothed mentions-per-hour rate:
+
+    * velocity - the rate over the short window;
+    * acceleration - short-window rate minus long-window rate, positive while
+      a project is mentioned more often than its recent baseline.
+
+    Scores are computed at the latest observed message time by default, so
+    historical datasets rank the same way regardless of when they are viewed.
+    """
+
+    source_columns = SOURCE_COLUMNS
+
+    def __init__(self, short_window: float = SHORT_WINDOW, long_window: float = LONG_WINDOW):
+        super().__init__()
+        self.windows = np.array([short_window, long_window], dtype=float) * 3600
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            # проект -> [время последнего обновления, счётчик короткого окна, счётчик длинного окна]
+            self._state: Dict[str, List[float]] = {}
+            # Учтённые сообщения по каналам: повторно сохранённые копии не считаются
+            self._seen = SeenMessages()
+            self.latest: Optional[float] = None
+
+    def observe(self, project: str, timestamp, weight: float = 1.0) -> None:
+        """Count one mention of ``project`` at ``timestamp`` (datetime or POSIX seconds)"""
+        if isinstance(timestamp, (int, float)):
+            seconds = float(timestamp)
+        else:
+            seconds = pd.Timestamp(timestamp).timestamp()
+        self._update(project, seconds, np.full(2, weight, dtype=float))
+
+    def _update(self, project: str, seconds: float, added: np.ndarray) -> None:
+        # ``added`` - вклад новых упоминаний, уже приведённый к моменту ``seconds``
+        with self._lock:
+            state = self._state.get(project)
+            if state is None:
+                self._state[project] = [seconds, added[0], added[1]]
+            elif seconds >= state[0]:
+                decay = np.exp(-(seconds - state[0]) / self.windows)
+                self._state[project] = [seconds, state[1] * decay[0] + added[0], state[2] * decay[1] + added[1]]
+            else:
+                # Упоминание из прошлого затухает до времени последнего обновления
+                decay = np.exp(-(state[0] - seconds) / self.windows)
+                state[1] += added[0] * decay[0]
+                state[2] += added[1] * decay[1]
+            if self.latest is None or seconds > self.latest:
+                self.latest = seconds
+
+    def observe_frame(self, data: pd.DataFrame) -> int:
+        """Count every project mention in a batch of messages; returns mentions counted"""
+        if data is None or data.empty or 'project_name' not in data.columns or 'date' not in data.columns:
+            return 0
+
+        with self._lock:
+            keep = self._seen.unseen(data)
+            dates = utc_dates(data['date'])
+            keep &= data['project_name'].notna() & dates.notna()
+            if not keep.any():
+                return 0
+            mentions = pd.DataFrame({
+                'project': data['project_name'][keep],
+                'seconds': (dates[keep] - pd.Timestamp(0, tz='UTC')).dt.total_seconds()
+            })
+
+            # Вклад пачки считается относительно последнего упоминания проекта в ней
+            reference = mentions.groupby('project', observed=True)['seconds'].transform('max')
+            ages = (reference - mentions['seconds']).to_numpy()[:, None]
+            weights = pd.DataFrame(np.exp(-ages / self.windows), index=mentions.index, columns=['short', 'long'])
+            weights['project'] = mentions['project']
+            weights['reference'] = reference
+            batch = weights.groupby('project', observed=True).agg(short=('short', 'sum'), long=('long', 'sum'),
+                                                   reference=('reference', 'first'))
+            for project, short, long, reference in batch.itertuples():
+                self._update(project, reference, np.array([short, long]))
+            return len(mentions)
+
+    def scores(self, now: Optional[float] = None) -> pd.DataFrame:
+        """Decayed counts, velocity and acceleration of every project at ``now``"""
+        with self._lock:
+            if not self._state:
+                return pd.DataFrame(columns=['project', 'mentions', 'velocity', 'acceleration'])
+            now = self.latest if now is None else now
+            projects = list(self._state)
+            state = np.array(list(self._state.values()), dtype=float)
+
+        elapsed = np.maximum(now - state[:, 0], 0)[:, None]
+        counts = state[:, 1:] * np.exp(-elapsed / self.windows)
+        rates = counts / (self.windows / 3600)
+        return pd.DataFrame({
+            'project': projects,
+            'mentions': counts[:, 0],
+            'velocity': rates[:, 0],
+            'acceleration': rates[:, 0] - rates[:, 1]
+        })
+
+    def ranking(self, limit: int = 10, by: str = 'velocity', now: Optional[float] = None) -> pd.DataFrame:
+        """Top projects by ``velocity`` or ``acceleration``"""
+        scores = self.scores(now)
+        return scores.sort_values(by, ascending=False, kind='stable').head(limit).reset_index(drop=True)
+
+
+# Движки трендов по каждому хранилищу процесса
+_engines = FollowerRegistry(TrendEngine)
+
+
+def get_trend_engine(storage=None) -> TrendEngine:
+    """Up-to-date trend engine for the given (or configured) storage"""
+    return _engines.get(storage)
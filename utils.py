@@ -1,25 +1,61 @@
 import pandas as pd
 import json
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime
+from typing import Dict, List, Optional
 
-def load_channels() -> List[str]:
+from storage import CSV_FILE, CSVStorage, get_storage
+
+FETCH_STATE_FILE = 'fetch_state.json'
+CHANNELS_FILE = 'channels.json'
+
+def load_channels(path: str = CHANNELS_FILE) -> List[str]:
     """Load telegram channels from configuration"""
     try:
-        with open('channels.json', 'r') as f:
+        with open(path, 'r') as f:
             return json.load(f)
     except:
         return ["NFTCalendar", "NFTDrops", "NFTProject"]
 
+def load_fetch_state() -> Dict[str, Dict]:
+    """Load per-channel fetch cursors (last seen message id/date)"""
+    try:
+        with open(FETCH_STATE_FILE, 'r') as f:
+            return json.load(f)
+    except:
+        return {}
+
+def save_fetch_state(state: Dict[str, Dict]) -> None:
+    """Persist per-channel fetch cursors"""
+    with open(FETCH_STATE_FILE, 'w') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
 def save_data(data: pd.DataFrame) -> None:
-    """Save parsed data to CSV file"""
-    data.to_csv('nft_data.csv', index=False)
+    """Save parsed data, replacing the stored dataset"""
+    get_storage().write(data)
+
+def merge_data(data: pd.DataFrame) -> None:
+    """Merge newly fetched messages into the stored dataset"""
+    get_storage().append(data)
 
-def load_data() -> Optional[pd.DataFrame]:
-    """Load parsed data from CSV file"""
+def load_data(columns: Optional[List[str]] = None,
+              start_date: Optional[date] = None,
+              end_date: Optional[date] = None) -> Optional[pd.DataFrame]:
+    """Load parsed data, optionally only some columns and a date range"""
     try:
-        data = pd.read_csv('nft_data.csv')
-        data['date'] = pd.to_datetime(data['date'])
-        return data
+        return get_storage().read(columns=columns, start_date=start_date, end_date=end_date)
     except:
         return None
+
+def import_csv(path: str = CSV_FILE) -> bool:
+    """Import a CSV export into the configured storage"""
+    data = CSVStorage(path).read()
+    if data is None:
+        return False
+    save_data(data)
+    return True
+
+def export_csv(path: str = CSV_FILE) -> None:
+    """Export the stored dataset to CSV"""
+    data = load_data()
+    if data is not None:
+        data.to_csv(path, index=False)